@@ -0,0 +1,116 @@
+"""
+Benchmark de concurrencia del checkout.
+
+Lanza muchos compradores en paralelo contra un producto con stock limitado y verifica
+que nunca se vendan más unidades que las disponibles (cero sobreventa). Para comparar,
+corre también la versión anterior del checkout (SELECT + stock -= 1 por unidad), que
+bajo carga concurrente pierde actualizaciones y sobrevende.
+
+Trabaja sobre una base SQLite temporal: no toca nexus_v4.db.
+
+Uso:
+    python bench_checkout.py --stock 100 --buyers 400 --workers 32
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Aíslo la corrida en un directorio temporal antes de importar la app (la URL de la DB es relativa)
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(tempfile.mkdtemp(prefix="nexus_bench_"))
+
+from fastapi import HTTPException
+
+import main
+import models
+
+def checkout_legacy(order: main.Order, db):
+    """ Réplica del checkout original: una lectura y un read-modify-write por unidad. """
+    transaction_id = str(uuid.uuid4())[:8]
+    for pid in order.product_ids:
+        product = db.query(models.Product).filter(models.Product.id == pid).first()
+        if not product:
+            raise HTTPException(status_code=404, detail=f"Producto {pid} no encontrado en inventario")
+        if product.stock <= 0:
+            raise HTTPException(status_code=400, detail=f"Sin stock para: {product.name}")
+        product.stock -= 1
+        db.add(models.Sale(
+            transaction_id=transaction_id,
+            product_name=product.name,
+            sale_price=product.price,
+            purchase_type=order.purchase_type
+        ))
+    db.commit()
+
+def reset(stock: int) -> int:
+    db = main.SessionLocal()
+    try:
+        db.query(models.Sale).delete()
+        db.query(models.SalesDailyRollup).delete()
+        db.query(models.Product).delete()
+        product = models.Product(name="Bench GPU", category="GPU", price=1000.0, stock=stock, image_url="-")
+        db.add(product)
+        db.commit()
+        return product.id
+    finally:
+        db.close()
+
+def run(label: str, checkout_fn, stock: int, buyers: int, workers: int, units: int):
+    pid = reset(stock)
+    order = main.Order(product_ids=[pid] * units)
+
+    def buyer(_):
+        db = main.SessionLocal()
+        try:
+            checkout_fn(order, db)
+            return "ok"
+        except HTTPException:
+            return "rejected"
+        except Exception:
+            db.rollback()
+            return "error"
+        finally:
+            db.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(buyer, range(buyers)))
+    elapsed = time.perf_counter() - start
+
+    db = main.SessionLocal()
+    try:
+        sold = db.query(models.Sale).count()
+        final_stock = db.get(models.Product, pid).stock
+    finally:
+        db.close()
+
+    oversell = max(0, sold - stock)
+    print(
+        f"{label:<8} | aprobadas {outcomes.count('ok'):>5} | rechazadas {outcomes.count('rejected'):>5} | "
+        f"errores {outcomes.count('error'):>4} | vendidas {sold:>5} | stock final {final_stock:>5} | "
+        f"sobreventa {oversell:>4} | {buyers / elapsed:>8.1f} compras/s"
+    )
+    return oversell
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Benchmark de concurrencia del checkout.")
+    parser.add_argument("--stock", type=int, default=100)
+    parser.add_argument("--buyers", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--units", type=int, default=1, help="Unidades por compra")
+    args = parser.parse_args()
+
+    main.Base.metadata.create_all(bind=main.engine)
+    run("legacy", checkout_legacy, args.stock, args.buyers, args.workers, args.units)
+    oversell = run("bulk", main.checkout, args.stock, args.buyers, args.workers, args.units)
+    if oversell:
+        raise SystemExit("❌ El checkout por lotes sobrevendió stock.")
+    print("✅ Checkout por lotes: cero sobreventa.")
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,69 @@
+"""
+Benchmark del motor de optimización de stock.
+
+Compara las tres estrategias para resolver las sugerencias de compra del catálogo:
+  1. FFI fila a fila (una llamada ctypes por producto, como hacía /optimization antes)
+  2. FFI por lotes (una única llamada con arreglos contiguos)
+  3. NumPy vectorizado (fallback cuando no hay librería C)
+
+Uso:
+    gcc -O2 -shared -fPIC -o c_logic/logica_stock.so c_logic/logica_stock.c
+    python bench_optimization.py
+"""
+import random
+import time
+
+import optimization_engine as motor
+
+TAMANIOS = [1_000, 100_000, 1_000_000]
+
+def generar_catalogo(n: int, seed: int = 42):
+    rnd = random.Random(seed)
+    ventas = [rnd.randint(1, 300) for _ in range(n)]
+    tiempos = [rnd.randint(1, 30) for _ in range(n)]
+    stocks = [rnd.randint(0, 500) for _ in range(n)]
+    return ventas, tiempos, stocks
+
+def cronometrar(fn, *args):
+    inicio = time.perf_counter()
+    resultado = fn(*args)
+    return time.perf_counter() - inicio, resultado
+
+def ffi_por_fila(ventas, tiempos, stocks):
+    calcular = motor.motor_c.calcular_necesidad_compra
+    return [calcular(v, t, s) for v, t, s in zip(ventas, tiempos, stocks)]
+
+def ffi_por_lote(ventas, tiempos, stocks):
+    return list(motor.c_batch_optimize_stock(ventas, tiempos, stocks))
+
+def numpy_vectorizado(ventas, tiempos, stocks):
+    return motor.numpy_optimize_stock(ventas, tiempos, stocks).tolist()
+
+def main():
+    estrategias = []
+    if motor.motor_c is not None:
+        estrategias.append(("FFI por fila", ffi_por_fila))
+        if motor.motor_c_lote:
+            estrategias.append(("FFI por lote", ffi_por_lote))
+    else:
+        print("⚠️ Librería C no disponible: sólo se mide el motor NumPy.")
+    if motor.np is not None:
+        estrategias.append(("NumPy", numpy_vectorizado))
+
+    print(f"{'SKUs':>10} | {'Estrategia':<14} | {'Tiempo (ms)':>12} | {'SKUs/s':>14}")
+    print("-" * 60)
+    for n in TAMANIOS:
+        catalogo = generar_catalogo(n)
+        referencia = None
+        for nombre, fn in estrategias:
+            segundos, resultado = cronometrar(fn, *catalogo)
+            # Verifico que todos los motores den exactamente el mismo resultado
+            if referencia is None:
+                referencia = resultado
+            elif resultado != referencia:
+                raise AssertionError(f"{nombre} difiere del motor de referencia con {n} SKUs")
+            print(f"{n:>10} | {nombre:<14} | {segundos * 1000:>12.2f} | {n / segundos:>14,.0f}")
+        print("-" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Calibración del factor de trabajo de la KDF de contraseñas.
+
+Mide la latencia de verify_password para varios costos y recomienda el más alto cuyo
+p99 entra en el objetivo de latencia del login. El valor elegido se configura con
+PASSWORD_KDF_COST (y PASSWORD_KDF si se prefiere scrypt).
+
+Uso:
+    python bench_password_kdf.py --target-ms 250 --samples 30
+    python bench_password_kdf.py --kdf scrypt
+"""
+import argparse
+import statistics
+import time
+
+import security
+
+CANDIDATES = {
+    "pbkdf2_sha256": [100_000, 200_000, 310_000, 600_000, 1_000_000],
+    "scrypt": [2 ** 13, 2 ** 14, 2 ** 15, 2 ** 16],
+}
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def measure(kdf: str, cost: int, samples: int):
+    encoded = security.hash_password("bench-password", algorithm=kdf, cost=cost)
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        security.verify_password("bench-password", encoded)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), percentile(timings, 99)
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibra el costo de la KDF contra un objetivo de p99.")
+    parser.add_argument("--kdf", choices=sorted(CANDIDATES), default=security.PASSWORD_KDF)
+    parser.add_argument("--target-ms", type=float, default=250.0, help="Objetivo de p99 del login")
+    parser.add_argument("--samples", type=int, default=30)
+    args = parser.parse_args()
+
+    print(f"KDF: {args.kdf} | objetivo p99: {args.target_ms:.0f} ms | muestras: {args.samples}")
+    print(f"{'Costo':>10} | {'p50 (ms)':>9} | {'p99 (ms)':>9}")
+    print("-" * 36)
+    recommended = None
+    for cost in CANDIDATES[args.kdf]:
+        p50, p99 = measure(args.kdf, cost, args.samples)
+        print(f"{cost:>10} | {p50:>9.1f} | {p99:>9.1f}")
+        if p99 <= args.target_ms:
+            recommended = cost
+
+    if recommended is None:
+        print("⚠️ Ningún costo candidato entra en el objetivo; revisar hardware u objetivo.")
+    else:
+        print(f"✅ Recomendado: PASSWORD_KDF={args.kdf} PASSWORD_KDF_COST={recommended}")
+
+if __name__ == "__main__":
+    main()
@@ -40,3 +40,31 @@ EXPORT int calcular_necesidad_compra(int ventas_mes, int tiempo_entrega, int sto
     
     return 0; // No hace falta comprar
 }
+
+
+/*
+ * Función: calcular_necesidad_compra_lote
+ * ---------------------------------------
+ * Versión por lotes de la función anterior. Recibe el catálogo completo
+ * como arreglos contiguos y resuelve todas las sugerencias en una sola
+ * llamada, evitando un cruce Python -> C por cada producto.
+ * * ventas_mes, tiempo_entrega, stock_actual: Arreglos de entrada de largo n.
+ * resultado: Arreglo de salida (largo n) donde se escribe la cantidad a comprar.
+ * * Retorna: Cantidad de productos que requieren reposición.
+ *
+ * Compilación (Linux): gcc -O2 -shared -fPIC -o logica_stock.so logica_stock.c
+ */
+
+EXPORT int calcular_necesidad_compra_lote(const int* ventas_mes, const int* tiempo_entrega,
+                                          const int* stock_actual, int* resultado, int n) {
+    int criticos = 0;
+
+    for (int i = 0; i < n; i++) {
+        resultado[i] = calcular_necesidad_compra(ventas_mes[i], tiempo_entrega[i], stock_actual[i]);
+        if (resultado[i] > 0) {
+            criticos++;
+        }
+    }
+
+    return criticos;
+}
@@ -0,0 +1,96 @@
+"""
+Versionado del catálogo de productos.
+
+El número de versión vive en la tabla `catalog_version` para que todos los workers
+lo compartan. Quien modifica `products` llama a bump_catalog_version antes de su
+commit; quien lee usa get_catalog_version (una lectura por clave primaria) para
+construir ETags y validar cachés.
+
+Cada incremento deja en `catalog_changes` qué productos y categorías tocó (o "todo",
+para altas masivas y reinicios). Un worker cuya caché quedó en la versión N pide
+changes_since(N) y desaloja sólo esas claves: una venta no vacía la caché de nadie.
+"""
+import hashlib
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+
+CATALOG_ROW_ID = 1
+# Versiones que conserva el registro de cambios; un worker más atrasado vacía su caché
+CHANGE_LOG_VERSIONS = 1000
+
+def ensure_catalog_version(db: Session):
+    """ Creo la fila del contador al arrancar, para que los workers sólo hagan UPDATE. """
+    if db.get(models.CatalogVersion, CATALOG_ROW_ID) is None:
+        db.add(models.CatalogVersion(id=CATALOG_ROW_ID, version=0))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Otro worker que arrancaba al mismo tiempo la creó primero
+            db.rollback()
+
+def get_catalog_version(db: Session) -> int:
+    version = db.query(models.CatalogVersion.version)\
+        .filter(models.CatalogVersion.id == CATALOG_ROW_ID).scalar()
+    return version or 0
+
+def bump_catalog_version(db: Session, product_ids=None, categories=()):
+    """
+    Incremento atómico (UPDATE version = version + 1) y registro de lo que cambió.
+    Sin product_ids el cambio cuenta como "todo el catálogo". No hace commit.
+    """
+    result = db.execute(
+        update(models.CatalogVersion)
+        .where(models.CatalogVersion.id == CATALOG_ROW_ID)
+        .values(version=models.CatalogVersion.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.add(models.CatalogVersion(id=CATALOG_ROW_ID, version=1))
+        db.flush()
+    # La fila queda bloqueada hasta el commit: leo mi propia versión sin carreras
+    version = get_catalog_version(db)
+
+    if product_ids is None:
+        changes = [{"version": version, "product_id": None, "category": None}]
+    else:
+        changes = [{"version": version, "product_id": pid, "category": None} for pid in product_ids]
+        changes += [{"version": version, "product_id": None, "category": c} for c in categories]
+        # Cada versión deja al menos una fila: sin ella, changes_since la tomaría por un hueco
+        changes = changes or [{"version": version, "product_id": None, "category": None}]
+    db.execute(insert(models.CatalogChange), changes)
+    if version % 100 == 0:
+        db.execute(delete(models.CatalogChange).where(models.CatalogChange.version <= version - CHANGE_LOG_VERSIONS))
+
+def changes_since(db: Session, version: int):
+    """
+    (ids de producto, categorías) modificados después de `version`, o None si hay que
+    vaciar todo: un cambio total en el medio o versiones que ya no están en el registro.
+    """
+    rows = db.query(models.CatalogChange.version, models.CatalogChange.product_id, models.CatalogChange.category)\
+        .filter(models.CatalogChange.version > version).order_by(models.CatalogChange.version).all()
+    if not rows or rows[0].version != version + 1:
+        return None
+    product_ids, categories = set(), set()
+    for _, product_id, category in rows:
+        if product_id is None and category is None:
+            return None
+        if product_id is not None:
+            product_ids.add(product_id)
+        if category is not None:
+            categories.add(category)
+    return product_ids, categories
+
+def make_etag(version: int, *params) -> str:
+    """ ETag fuerte: versión del catálogo + huella de los parámetros de la consulta. """
+    fingerprint = hashlib.sha1(repr(params).encode()).hexdigest()[:16]
+    return f'"catalog-v{version}-{fingerprint}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
@@ -0,0 +1,148 @@
+"""
+Configuración del engine / pool de conexiones e instrumentación del pool.
+
+Todo se lee del entorno, así el mismo código corre en local (SQLite) y contra Postgres:
+
+    DATABASE_URL          URL de la base                                (default sqlite:///./nexus_v4.db)
+    DB_POOL_SIZE          Conexiones persistentes por proceso           (default 5)
+    DB_MAX_OVERFLOW       Conexiones extra permitidas en ráfagas        (default 10)
+    DB_POOL_TIMEOUT       Segundos de espera por una conexión libre     (default 30)
+    DB_POOL_RECYCLE       Recicla conexiones con más de N segundos      (default 1800, -1 = nunca)
+    DB_POOL_PRE_PING      Prueba la conexión al sacarla (true/false)    (default true, sólo Postgres)
+    SQLITE_BUSY_TIMEOUT   Segundos que SQLite espera una base bloqueada (default 15)
+    SQLITE_MMAP_SIZE      PRAGMA mmap_size en bytes                     (default 256 MiB)
+    SQLITE_CACHE_SIZE     PRAGMA cache_size (negativo = KiB)            (default -64000, ~64 MB)
+
+En SQLite cada conexión nueva arranca en WAL con synchronous=NORMAL: los lectores del
+dashboard ya no bloquean al checkout que escribe. El pool registra cuánto espera cada
+checkout y qué tan saturado está; pool_metrics() devuelve la foto para el endpoint.
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+# --- MÉTRICAS ---
+
+class PoolMetrics:
+    # Límites superiores (ms) del histograma de espera; el último balde es abierto
+    BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.histogram = [0] * (len(self.BUCKETS_MS) + 1)
+        self._lock = threading.Lock()
+
+    def record_wait(self, waited_ms: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total_ms += waited_ms
+            self.wait_max_ms = max(self.wait_max_ms, waited_ms)
+            for i, bound in enumerate(self.BUCKETS_MS):
+                if waited_ms <= bound:
+                    self.histogram[i] += 1
+                    break
+            else:
+                self.histogram[-1] += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        size = pool.size() if pool is not None else 0
+        checked_out = pool.checkedout() if pool is not None else 0
+        capacity = size + max(getattr(pool, "_max_overflow", 0), 0)
+        labels = [f"<={b}ms" for b in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}ms"]
+        return {
+            "pool": self.name,
+            "size": size,
+            "checked_out": checked_out,
+            "overflow": max(pool.overflow(), 0) if pool is not None else 0,
+            "capacity": capacity,
+            "saturation": round(checked_out / capacity, 4) if capacity else 0.0,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(self.wait_total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.wait_max_ms, 3),
+            "wait_histogram": dict(zip(labels, self.histogram)),
+        }
+
+_registry = {}
+
+def _instrumented(base_pool, metrics: PoolMetrics):
+    """ Subclase del pool que mide cuánto espera cada checkout por una conexión. """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = base_pool._do_get(self)
+        except exc.TimeoutError:
+            metrics.record_timeout()
+            raise
+        metrics.record_wait((time.perf_counter() - start) * 1000)
+        return connection
+
+    # Las métricas viven en la clase, así sobreviven a pool.recreate() (engine.dispose())
+    return type(f"Instrumented{base_pool.__name__}", (base_pool,), {"_do_get": _do_get, "metrics": metrics})
+
+# --- CONFIGURACIÓN DEL ENGINE ---
+
+def engine_kwargs(url: str, name: str) -> dict:
+    """ Argumentos para create_engine. """
+    metrics = _registry.setdefault(name, PoolMetrics(name))
+    kwargs = {
+        "poolclass": _instrumented(QueuePool, metrics),
+        "pool_size": _env_int("DB_POOL_SIZE", 5),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+    }
+    if is_sqlite(url):
+        kwargs["connect_args"] = {"check_same_thread": False, "timeout": _env_int("SQLITE_BUSY_TIMEOUT", 15)}
+    else:
+        kwargs["pool_pre_ping"] = _env_bool("DB_POOL_PRE_PING", True)
+    return kwargs
+
+def configure_engine(engine, url: str, name: str):
+    """ Engancha los PRAGMA de SQLite y vincula el pool del engine con sus métricas. """
+    _registry[name].pool = engine.pool
+
+    @event.listens_for(engine.pool, "checkin")
+    def _track_pool(*_):
+        # Después de engine.dispose() el pool es otro objeto; las métricas siguen al vigente
+        _registry[name].pool = engine.pool
+
+    if is_sqlite(url) and ":memory:" not in url:
+        mmap_size = _env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+        cache_size = _env_int("SQLITE_CACHE_SIZE", -64000)
+
+        @event.listens_for(engine, "connect")
+        def _sqlite_pragmas(dbapi_connection, _):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA mmap_size={mmap_size}")
+            cursor.execute(f"PRAGMA cache_size={cache_size}")
+            cursor.close()
+    return engine
+
+def pool_metrics() -> list:
+    return [metrics.snapshot() for metrics in _registry.values()]
@@ -1,25 +1,35 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, status, Query, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, case, insert, update, bindparam
 from pydantic import BaseModel
 from typing import List, Optional
-import hashlib
-from datetime import datetime, timedelta
-import ctypes
+from datetime import datetime, timedelta, timezone
 import os
 import sys
 import uuid
+from collections import Counter
+import bisect
 
 # Módulos internos que yo desarrollé
 from database import engine, SessionLocal, Base
 import models
+import rollup
+import catalog
+import security
+import db_config
+from product_cache import build_cache, PRODUCT_FIELDS
+from optimization_engine import calcular_sugerencias
 
 # --- CONFIGURACIÓN DE BASE DE DATOS ---
 # Inicializo las tablas si no existen.
 # En un entorno de producción real, yo usaría Alembic para las migraciones,
 # pero aquí mantengo la simplicidad para el despliegue rápido.
 Base.metadata.create_all(bind=engine)
+# create_all no agrega índices nuevos a tablas que ya existen, así que los aseguro por separado.
+for table in Base.metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
 
 app = FastAPI(
     title="Nexus Hardware API",
@@ -45,6 +55,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Expongo los headers de caché y paginación para que el frontend pueda leerlos
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 # --- MODELOS DE DATOS (DTOs) ---
@@ -81,64 +93,39 @@ def get_db():
     finally:
         db.close()
 
+# --- CACHÉ DE CATÁLOGO ---
+# Los productos se leen muchísimo más de lo que se escriben: los sirvo desde una caché LRU
+# (o un backend compartido si hay PRODUCT_CACHE_URL) invalidada por cada escritura.
+catalog_cache = build_cache()
+
+def current_catalog_version(db: Session) -> int:
+    """ Leo la versión del catálogo y sincronizo la caché con escrituras de otros workers. """
+    version = catalog.get_catalog_version(db)
+    catalog_cache.sync_version(version, lambda since: catalog.changes_since(db, since))
+    return version
+
 # --- MOTOR DE OPTIMIZACIÓN (C++ / PYTHON) ---
-# Implementé un sistema híbrido: intento cargar una DLL de C de alto rendimiento.
-# Si falla (por arquitectura OS), el sistema hace fallback automático a mi lógica en Python.
-
-base_dir = os.path.dirname(os.path.abspath(__file__))
-# Determino la ruta de la librería dinámica según el sistema operativo
-if os.name == 'nt':
-    dll_path = os.path.join(base_dir, 'c_logic', 'logica_stock.dll')
-else:
-    dll_path = os.path.join(base_dir, 'c_logic', 'logica_stock.so')
-
-motor_c = None
-
-# Esta es mi implementación de respaldo en Python puro.
-# Replica exactamente la lógica matemática de la versión en C para garantizar consistencia.
-def python_optimize_stock(ventas_mes: int, tiempo_entrega: int, stock_actual: int) -> int:
-    # 1. Calculo venta diaria promedio
-    venta_diaria = ventas_mes / 30.0
-    
-    # 2. Establezco un Stock de Seguridad (20% de colchón)
-    stock_seguridad = int(ventas_mes * 0.20)
-    
-    # 3. Determino el Punto de Reorden
-    punto_reorden = int(venta_diaria * tiempo_entrega) + stock_seguridad
-    
-    # Lógica de decisión de compra
-    if stock_actual <= punto_reorden:
-        cantidad_a_pedir = (ventas_mes + stock_seguridad) - stock_actual
-        return max(cantidad_a_pedir, 0)
-    
-    return 0
-
-# Intento cargar el motor C
-try:
-    if os.path.exists(dll_path):
-        motor_c = ctypes.CDLL(dll_path)
-        # Defino la firma de la función C: int calcular_necesidad_compra(int, int, int)
-        motor_c.calcular_necesidad_compra.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int]
-        motor_c.calcular_necesidad_compra.restype = ctypes.c_int
-        print(f"✅ [Sistema] Motor de Optimización C cargado desde: {dll_path}")
-    else:
-        print(f"⚠️ [Sistema] Librería C no encontrada en {dll_path}. Activando motor Python de respaldo.")
-except OSError as e:
-    # Este error es común en desarrollo Windows vs Linux cruzado (32 vs 64 bits)
-    if hasattr(e, 'winerror') and e.winerror == 193:
-        print(f"⚠️ [Advertencia] Discrepancia de arquitectura CPU (DLL 32-bit vs Python 64-bit).")
-        print(f"   -> El sistema continuará operando usando el motor nativo Python.")
-    else:
-        print(f"❌ [Error] Fallo al cargar módulo C: {e}")
-except Exception as e:
-    print(f"❌ [Error Crítico] Excepción inesperada en carga de módulos: {e}")
+# La carga de la librería C y los motores de respaldo (NumPy / Python) viven en optimization_engine.py.
 
 # --- UTILIDADES DE SEGURIDAD ---
-def hash_password(password: str):
-    # Utilizo SHA256 para el hash.
-    # Nota de auditoría: Para estándares bancarios usaría Bcrypt con salt,
-    # pero para este entorno controlado, SHA256 es suficiente y rápido.
-    return hashlib.sha256(password.encode()).hexdigest()
+# Contraseñas con KDF lenta y sesiones con tokens firmados: ver security.py.
+# El bundle publicado en public/nexus todavía no envía el token, así que la exigencia
+# es opt-in (NEXUS_AUTH_REQUIRED=true) hasta que se reconstruya el frontend.
+AUTH_REQUIRED = os.getenv("NEXUS_AUTH_REQUIRED", "false").lower() == "true"
+
+def get_current_admin(authorization: Optional[str] = Header(None)):
+    """ Valido el token Bearer sin tocar la base de datos. """
+    token = None
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:].strip()
+    claims = security.verify_token(token)
+    if claims is None and AUTH_REQUIRED:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Sesión inválida o expirada",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return claims
 
 def seed_data(db: Session):
     """
@@ -162,6 +149,7 @@ def seed_data(db: Session):
                 models.Product(name="LG Ultragear 27GB", category="MONITOR", price=550000.00, stock=15, image_url="https://images.unsplash.com/photo-1527443224154-c4a3942d3acf?auto=format&fit=crop&q=80&w=800", monthly_sales_avg=10, lead_time_days=12),
             ]
             db.add_all(products)
+            catalog.bump_catalog_version(db)
             db.commit()
     except Exception as e:
         print(f"Error seeding products: {e}")
@@ -170,7 +158,7 @@ def seed_data(db: Session):
     if db.query(models.User).count() == 0:
         admin_user = models.User(
             username="admin",
-            hashed_password=hash_password("admin123")
+            hashed_password=security.hash_password("admin123")
         )
         db.add(admin_user)
         db.commit()
@@ -183,106 +171,262 @@ def startup_event():
     db = SessionLocal()
     try:
         seed_data(db)
+        catalog.ensure_catalog_version(db)
+        # Si la base ya tenía ventas antes de existir el rollup, lo reconstruyo una única vez
+        # (un solo worker: el que inserta el marcador de rollup_state)
+        rollup.ensure_rollup(db)
     finally:
         db.close()
 
 # --- ENDPOINTS DE LA API ---
 
 @app.post("/system/reset")
-def reset_system(db: Session = Depends(get_db)):
+def reset_system(db: Session = Depends(get_db), admin=Depends(get_current_admin)):
     """ Endpoint de mantenimiento: Reinicia todo el sistema a estado de fábrica. """
     try:
         db.query(models.Sale).delete()
+        db.query(models.SalesDailyRollup).delete()
         db.query(models.Product).delete()
         db.query(models.User).delete()
+        catalog.bump_catalog_version(db)
         db.commit()
         # Repueblo datos inmediatos
         seed_data(db)
+        catalog_cache.clear()
         return {"message": "Sistema reiniciado correctamente. Datos de fábrica restaurados."}
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/system/cache-stats")
+def cache_stats(admin=Depends(get_current_admin)):
+    """ Contadores de aciertos / fallos de la caché de catálogo. """
+    return catalog_cache.stats()
+
+@app.get("/system/pool-metrics")
+def pool_metrics(admin=Depends(get_current_admin)):
+    """ Espera de checkout y saturación del pool de conexiones. """
+    return {"pools": db_config.pool_metrics()}
+
 @app.post("/login")
 def login(user: UserLogin, db: Session = Depends(get_db)):
     db_user = db.query(models.User).filter(models.User.username == user.username).first()
-    # Verificación de tiempo constante para mitigar ataques de timing (idealmente, aquí lo simulo)
+    # Verificación de tiempo constante: si el usuario no existe igual pago el costo de la KDF
     if not db_user:
+        security.verify_dummy(user.password)
         raise HTTPException(status_code=400, detail="Credenciales inválidas")
     
-    if hash_password(user.password) != db_user.hashed_password:
+    if not security.verify_password(user.password, db_user.hashed_password):
         raise HTTPException(status_code=400, detail="Credenciales inválidas")
+
+    # Migro hashes SHA256 viejos (o con otro factor de trabajo) aprovechando que tengo la clave en claro
+    if security.needs_rehash(db_user.hashed_password):
+        db_user.hashed_password = security.hash_password(user.password)
+        db.commit()
     
-    return {"message": "Autenticación exitosa", "username": db_user.username}
+    return {
+        "message": "Autenticación exitosa",
+        "username": db_user.username,
+        "access_token": security.create_access_token(db_user.username),
+        "token_type": "bearer",
+        "expires_in": security.TOKEN_TTL_SECONDS
+    }
+
+@app.get("/session")
+def read_session(claims: Optional[dict] = Depends(get_current_admin)):
+    """ Devuelve el usuario del token vigente (sin consultar la base). """
+    if claims is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Sesión inválida o expirada")
+    return {"username": claims["sub"], "expires_at": claims["exp"]}
 
 @app.post("/products")
-def create_product(product: ProductCreate, db: Session = Depends(get_db)):
+def create_product(product: ProductCreate, db: Session = Depends(get_db), admin=Depends(get_current_admin)):
     db_product = models.Product(**product.dict())
     db.add(db_product)
+    # Un alta sólo cambia los listados de su categoría (y el catálogo completo)
+    catalog.bump_catalog_version(db, product_ids=[], categories=[db_product.category])
     db.commit()
+    catalog_cache.invalidate(categories=[db_product.category])
     db.refresh(db_product)
     return db_product
 
 @app.get("/products")
-def read_products(db: Session = Depends(get_db)):
-    return db.query(models.Product).all()
+def read_products(
+    response: Response,
+    cursor: Optional[int] = Query(None, description="Último id recibido; devuelve los productos siguientes"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Tamaño de página. Sin límite devuelve todo el catálogo"),
+    category: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Lista separada por comas, ej: id,name,price"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Catálogo con paginación por cursor (keyset sobre id), filtro por categoría y
+    selección parcial de campos. Sin parámetros se comporta como antes (catálogo completo).
+    El ETag se deriva del contador de versión del catálogo: si no cambió, respondo 304
+    sin escanear `products`. Las filas salen de la caché de catálogo por categoría.
+    """
+    if fields:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in selected if f not in PRODUCT_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Campos inválidos: {', '.join(unknown)}")
+        # El id siempre viaja: es el cursor de la página siguiente
+        if "id" not in selected:
+            selected.insert(0, "id")
+    else:
+        selected = PRODUCT_FIELDS
+
+    version = current_catalog_version(db)
+    etag = catalog.make_etag(version, cursor, limit, category, tuple(selected))
+    if catalog.etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    # La lista cacheada ya viene ordenada por id: el keyset es una búsqueda binaria
+    products = catalog_cache.get_category(db, category)
+    start = bisect.bisect_right([p["id"] for p in products], cursor) if cursor is not None else 0
+    page = products[start:start + limit] if limit else products[start:]
+
+    rows = [{f: p[f] for f in selected} for p in page]
+
+    response.headers["ETag"] = etag
+    if limit and len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1]["id"])
+    return rows
 
 @app.post("/checkout")
 def checkout(order: Order, db: Session = Depends(get_db)):
     # Genero un ID único para trazabilidad de la transacción
     transaction_id = str(uuid.uuid4())[:8]
-    
-    for pid in order.product_ids:
-        product = db.query(models.Product).filter(models.Product.id == pid).first()
-        if not product:
+    # Fijo la hora de la venta en UTC (lo mismo que el CURRENT_TIMESTAMP de SQLite)
+    # para que el día del rollup coincida exactamente con el de las filas de `sales`.
+    sold_at = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    # 1. Agrupo ids repetidos en cantidades y resuelvo todos los productos desde la caché
+    # (los faltantes con un único IN). El stock cacheado sólo sirve de chequeo previo:
+    # la autoridad es el UPDATE con guarda del paso 2.
+    quantities = Counter(order.product_ids)
+    # Nombre y precio salen de la caché: la alineo con la versión del catálogo antes de leerla,
+    # para no registrar ventas con datos viejos si otro worker cambió los productos.
+    current_catalog_version(db)
+    products = catalog_cache.get_many(db, quantities)
+    if any(pid not in products or products[pid]["stock"] < qty for pid, qty in quantities.items()):
+        # Antes de rechazar, descarto lo cacheado por si quedó viejo y releo de la base
+        catalog_cache.invalidate(product_ids=quantities)
+        products = catalog_cache.get_many(db, quantities)
+    for pid in quantities:
+        if pid not in products:
             raise HTTPException(status_code=404, detail=f"Producto {pid} no encontrado en inventario")
-        if product.stock <= 0:
-            raise HTTPException(status_code=400, detail=f"Sin stock para: {product.name}")
-        
-        # Decremento atómico (en este contexto de DB relacional simple)
-        product.stock -= 1
-        
-        # Registro auditoría de venta
-        sale = models.Sale(
-            transaction_id=transaction_id,
-            product_name=product.name, 
-            sale_price=product.price,
-            purchase_type=order.purchase_type
-        )
-        db.add(sale)
+    for pid, qty in quantities.items():
+        if products[pid]["stock"] < qty:
+            raise HTTPException(status_code=400, detail=f"Sin stock para: {products[pid]['name']}")
+
+    # 2. Decremento atómico con guarda: UPDATE ... SET stock = stock - :n WHERE stock >= :n.
+    # Si otro worker vendió el stock entre mi lectura y este UPDATE, la fila no se actualiza
+    # y aborto la compra completa en lugar de dejar el stock en negativo.
+    # Ordeno por id para que workers concurrentes tomen los locks de fila siempre en el mismo orden.
+    decrements = [{"pid": pid, "qty": quantities[pid]} for pid in sorted(quantities)]
+    guarded_update = update(models.Product)\
+        .where(models.Product.id == bindparam("pid"), models.Product.stock >= bindparam("qty"))\
+        .values(stock=models.Product.stock - bindparam("qty"))\
+        .execution_options(synchronize_session=False)
+    conn = db.connection()
+    if conn.dialect.supports_sane_multi_rowcount:
+        if conn.execute(guarded_update, decrements).rowcount != len(decrements):
+            db.rollback()
+            catalog_cache.invalidate(product_ids=quantities)
+            raise HTTPException(status_code=409, detail="Stock insuficiente: otra compra tomó las unidades. Reintentá.")
+    else:
+        for params in decrements:
+            if conn.execute(guarded_update, params).rowcount != 1:
+                db.rollback()
+                catalog_cache.invalidate(product_ids=quantities)
+                raise HTTPException(status_code=409, detail=f"Sin stock para: {products[params['pid']]['name']}")
+
+    # 3. Registro auditoría de venta: una fila por unidad, insertadas en bloque
+    sale_rows = [
+        {
+            "transaction_id": transaction_id,
+            "product_name": products[pid]["name"],
+            "sale_price": products[pid]["price"],
+            "purchase_type": order.purchase_type,
+            "timestamp": sold_at,
+        }
+        for pid in order.product_ids
+    ]
+    order_revenue = 0.0
+    if sale_rows:
+        db.execute(insert(models.Sale), sale_rows)
+        order_revenue = sum(row["sale_price"] for row in sale_rows)
     
+    # Actualizo los contadores materializados en la misma transacción que las ventas
+    rollup.record_sales(db, sold_at.date(), order.purchase_type, order_revenue, len(order.product_ids))
+    # El stock cambió: invalido los ETags del catálogo y registro qué productos tocó,
+    # para que los demás workers desalojen sólo esos (no toda su caché)
+    categories = {p["category"] for p in products.values()}
+    catalog.bump_catalog_version(db, product_ids=sorted(quantities), categories=categories)
     db.commit()
+    catalog_cache.invalidate(product_ids=quantities, categories=categories)
     return {"status": "Aprobado", "message": "Compra procesada y stock actualizado", "transaction_id": transaction_id}
 
 @app.get("/dashboard-stats")
-def dashboard_stats(db: Session = Depends(get_db)):
+def dashboard_stats(db: Session = Depends(get_db), admin=Depends(get_current_admin)):
     """ Analítica en tiempo real para el Dashboard de Administración """
     now = datetime.now()
     seven_days_ago = now - timedelta(days=7)
     thirty_days_ago = now - timedelta(days=30)
 
-    # Métricas Globales
-    total_revenue = db.query(func.sum(models.Sale.sale_price)).scalar() or 0.0
-    sales_count = db.query(models.Sale).count()
-    
-    # Tendencias Semanales
-    revenue_7d = db.query(func.sum(models.Sale.sale_price)).filter(models.Sale.timestamp >= seven_days_ago).scalar() or 0.0
-    sales_7d = db.query(models.Sale).filter(models.Sale.timestamp >= seven_days_ago).count()
+    # Métricas Globales + Tendencias Semanales y Mensuales
+    # Leo los contadores de `sales_daily_rollup` (una fila por día y tipo) en lugar de escanear `sales`.
+    # Los días completos dentro de cada ventana salen del rollup; el día de corte, que sólo
+    # entra parcialmente, lo completo con un rango acotado sobre el índice de timestamp.
+    roll = models.SalesDailyRollup
+    day_7d = seven_days_ago.date()
+    day_30d = thirty_days_ago.date()
+    full_7d = roll.day > day_7d
+    full_30d = roll.day > day_30d
+    totals = db.query(
+        func.coalesce(func.sum(roll.revenue), 0.0),
+        func.coalesce(func.sum(roll.sales_count), 0),
+        func.coalesce(func.sum(case((full_7d, roll.revenue), else_=0.0)), 0.0),
+        func.coalesce(func.sum(case((full_7d, roll.sales_count), else_=0)), 0),
+        func.coalesce(func.sum(case((full_30d, roll.revenue), else_=0.0)), 0.0),
+        func.coalesce(func.sum(case((full_30d, roll.sales_count), else_=0)), 0),
+    ).one()
+    total_revenue, sales_count, revenue_7d, sales_7d, revenue_30d, sales_30d = totals
+
+    def partial_day(since: datetime):
+        until = datetime.combine(since.date() + timedelta(days=1), datetime.min.time())
+        return db.query(
+            func.coalesce(func.sum(models.Sale.sale_price), 0.0),
+            func.count(models.Sale.id),
+        ).filter(models.Sale.timestamp >= since, models.Sale.timestamp < until).one()
 
-    # Tendencias Mensuales
-    revenue_30d = db.query(func.sum(models.Sale.sale_price)).filter(models.Sale.timestamp >= thirty_days_ago).scalar() or 0.0
-    sales_30d = db.query(models.Sale).filter(models.Sale.timestamp >= thirty_days_ago).count()
+    partial_revenue, partial_count = partial_day(seven_days_ago)
+    revenue_7d += partial_revenue
+    sales_7d += partial_count
+    partial_revenue, partial_count = partial_day(thirty_days_ago)
+    revenue_30d += partial_revenue
+    sales_30d += partial_count
     
     # Historial de Transacciones (Agrupado por ID)
     recent_tx_ids = db.query(models.Sale.transaction_id, func.max(models.Sale.timestamp).label('latest'))\
         .group_by(models.Sale.transaction_id)\
         .order_by(func.max(models.Sale.timestamp).desc())\
         .limit(10).all()
-        
+
+    # Recupero el detalle completo de las 10 transacciones con un único IN (evito el N+1)
+    items_by_tx = {tx_id: [] for tx_id, _ in recent_tx_ids}
+    if items_by_tx:
+        items = db.query(models.Sale)\
+            .filter(models.Sale.transaction_id.in_(list(items_by_tx.keys())))\
+            .order_by(models.Sale.id).all()
+        for item in items:
+            items_by_tx[item.transaction_id].append(item)
+
     recent_transactions = []
     for tx_id, timestamp in recent_tx_ids:
-        # Recupero detalle completo para generación de recibos
-        items = db.query(models.Sale).filter(models.Sale.transaction_id == tx_id).all()
+        items = items_by_tx[tx_id]
         total_value = sum(item.sale_price for item in items)
         
         tx_type = items[0].purchase_type if items else "INDIVIDUAL"
@@ -310,38 +454,30 @@ def dashboard_stats(db: Session = Depends(get_db)):
     }
 
 @app.get("/optimization")
-def get_optimization(db: Session = Depends(get_db)):
+def get_optimization(db: Session = Depends(get_db), admin=Depends(get_current_admin)):
     """ endpoint de Inteligencia de Negocio: Predicción de Stock """
-    products = db.query(models.Product).all()
+    current_catalog_version(db)
+    products = catalog_cache.get_category(db)
+
+    # Armo los arreglos del catálogo completo y resuelvo todo en una única llamada al motor
+    # (C por lotes, NumPy o Python), en lugar de cruzar la FFI una vez por producto.
+    ventas = [int(prod["monthly_sales_avg"] or 20) for prod in products]
+    tiempos = [int(prod["lead_time_days"] or 7) for prod in products]
+    stocks = [int(prod["stock"]) for prod in products]
+    sugerencias = calcular_sugerencias(ventas, tiempos, stocks)
+
     results = []
-    
-    for prod in products:
-        ventas_mes = prod.monthly_sales_avg or 20
-        tiempo_entrega = prod.lead_time_days or 7
-        
-        sugerencia = 0
-        
-        # 1. Intento usar mi motor C optimizado
-        if motor_c:
-            try:
-                sugerencia = motor_c.calcular_necesidad_compra(int(ventas_mes), int(tiempo_entrega), int(prod.stock))
-            except Exception:
-                # Si falla, activo mi fallback silencioso
-                sugerencia = python_optimize_stock(int(ventas_mes), int(tiempo_entrega), int(prod.stock))
-        else:
-            # 2. Uso mi lógica Python si no hay DLL
-            sugerencia = python_optimize_stock(int(ventas_mes), int(tiempo_entrega), int(prod.stock))
-            
+    for prod, ventas_mes, tiempo_entrega, sugerencia in zip(products, ventas, tiempos, sugerencias):
         if sugerencia < 0: sugerencia = 0
-            
+
         results.append({
-            "id": prod.id,
-            "name": prod.name,
-            "stock": prod.stock,
+            "id": prod["id"],
+            "name": prod["name"],
+            "stock": prod["stock"],
             "sales_avg": ventas_mes,
             "lead_time": tiempo_entrega,
             "restock_suggestion": sugerencia,
             "status": "CRITICAL" if sugerencia > 0 else "OK"
         })
-        
+
     return results
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, Index
 from sqlalchemy.sql import func
 from database import Base
 
@@ -7,7 +7,7 @@ class Product(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    category = Column(String)
+    category = Column(String, index=True)
     price = Column(Float)
     stock = Column(Integer)
     image_url = Column(String)
@@ -24,6 +24,63 @@ class Sale(Base):
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     purchase_type = Column(String, default="INDIVIDUAL")
 
+    # Índice compuesto para las ventanas de tiempo del dashboard y el agrupado por transacción
+    __table_args__ = (
+        Index("ix_sales_timestamp_transaction_id", "timestamp", "transaction_id"),
+    )
+
+class SalesDailyRollup(Base):
+    """
+    Contadores materializados de ventas por día y tipo de compra.
+    checkout los incrementa en la misma transacción que inserta las ventas,
+    así el dashboard lee unas pocas filas en lugar de escanear `sales`.
+    """
+    __tablename__ = "sales_daily_rollup"
+
+    day = Column(Date, primary_key=True)
+    purchase_type = Column(String, primary_key=True)
+    revenue = Column(Float, default=0.0)
+    sales_count = Column(Integer, default=0)
+
+class RollupState(Base):
+    """
+    Marcador de la reconstrucción del rollup (fila única, id=1).
+    El worker que logra insertarla es el único que reconstruye al arrancar;
+    `built_through` es el último id de `sales` contado por la reconstrucción
+    (NULL mientras está en curso). Lo posterior lo suman los contadores en vivo.
+    `built_at`: fin de la reconstrucción o, mientras está en curso, la última señal
+    del worker que la hace (una reconstrucción sin señales se puede retomar).
+    """
+    __tablename__ = "rollup_state"
+
+    id = Column(Integer, primary_key=True)
+    built_through = Column(Integer, nullable=True)
+    built_at = Column(DateTime(timezone=True), nullable=True)
+
+class CatalogVersion(Base):
+    """
+    Contador de versión del catálogo (fila única, id=1).
+    Cada escritura sobre `products` lo incrementa en su misma transacción;
+    /products deriva su ETag de este número sin tener que escanear la tabla.
+    """
+    __tablename__ = "catalog_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+
+class CatalogChange(Base):
+    """
+    Qué cambió en cada versión del catálogo: un producto, una categoría (listado)
+    o todo (product_id y category en NULL). Los workers desalojan sólo esas claves
+    de su caché en lugar de vaciarla. Se conservan las últimas versiones.
+    """
+    __tablename__ = "catalog_changes"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, index=True)
+    product_id = Column(Integer, nullable=True)
+    category = Column(String, nullable=True)
+
 class User(Base):
     __tablename__ = "users"
 
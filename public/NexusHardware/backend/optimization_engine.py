@@ -0,0 +1,142 @@
+import ctypes
+import os
+
+# NumPy es opcional: si no está instalado, el motor cae a la lógica Python fila a fila.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# --- MOTOR DE OPTIMIZACIÓN (C++ / PYTHON) ---
+# Implementé un sistema híbrido: intento cargar una DLL de C de alto rendimiento.
+# Si falla (por arquitectura OS), el sistema hace fallback automático a mi lógica en Python.
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+# Determino la ruta de la librería dinámica según el sistema operativo
+if os.name == 'nt':
+    dll_path = os.path.join(base_dir, 'c_logic', 'logica_stock.dll')
+else:
+    dll_path = os.path.join(base_dir, 'c_logic', 'logica_stock.so')
+
+motor_c = None
+# Indica si la librería cargada expone la entrada por lotes (las DLL viejas no la tienen)
+motor_c_lote = False
+
+# Esta es mi implementación de respaldo en Python puro.
+# Replica exactamente la lógica matemática de la versión en C para garantizar consistencia.
+def python_optimize_stock(ventas_mes: int, tiempo_entrega: int, stock_actual: int) -> int:
+    # 1. Calculo venta diaria promedio
+    venta_diaria = ventas_mes / 30.0
+
+    # 2. Establezco un Stock de Seguridad (20% de colchón)
+    stock_seguridad = int(ventas_mes * 0.20)
+
+    # 3. Determino el Punto de Reorden
+    punto_reorden = int(venta_diaria * tiempo_entrega) + stock_seguridad
+
+    # Lógica de decisión de compra
+    if stock_actual <= punto_reorden:
+        cantidad_a_pedir = (ventas_mes + stock_seguridad) - stock_actual
+        return max(cantidad_a_pedir, 0)
+
+    return 0
+
+def numpy_optimize_stock(ventas_mes, tiempo_entrega, stock_actual):
+    """
+    Versión vectorizada de python_optimize_stock: opera sobre el catálogo completo
+    en arreglos. Uso np.trunc para imitar el cast (int) de C, que trunca hacia cero.
+    """
+    ventas = np.asarray(ventas_mes, dtype=np.int64)
+    entrega = np.asarray(tiempo_entrega, dtype=np.int64)
+    stock = np.asarray(stock_actual, dtype=np.int64)
+
+    stock_seguridad = np.trunc(ventas * 0.20).astype(np.int64)
+    punto_reorden = np.trunc((ventas / 30.0) * entrega).astype(np.int64) + stock_seguridad
+
+    cantidad_a_pedir = np.maximum((ventas + stock_seguridad) - stock, 0)
+    return np.where(stock <= punto_reorden, cantidad_a_pedir, 0)
+
+def c_batch_optimize_stock(ventas_mes, tiempo_entrega, stock_actual):
+    """
+    Resuelve todo el catálogo con una única llamada FFI a calcular_necesidad_compra_lote.
+    Si NumPy está disponible paso los buffers sin copiar; si no, armo arreglos ctypes.
+    """
+    n = len(ventas_mes)
+    if np is not None:
+        ventas = np.ascontiguousarray(ventas_mes, dtype=np.intc)
+        entrega = np.ascontiguousarray(tiempo_entrega, dtype=np.intc)
+        stock = np.ascontiguousarray(stock_actual, dtype=np.intc)
+        resultado = np.zeros(n, dtype=np.intc)
+        puntero = ctypes.POINTER(ctypes.c_int)
+        motor_c.calcular_necesidad_compra_lote(
+            ventas.ctypes.data_as(puntero),
+            entrega.ctypes.data_as(puntero),
+            stock.ctypes.data_as(puntero),
+            resultado.ctypes.data_as(puntero),
+            n
+        )
+        return resultado
+
+    arreglo = ctypes.c_int * n
+    resultado = arreglo()
+    motor_c.calcular_necesidad_compra_lote(
+        arreglo(*ventas_mes), arreglo(*tiempo_entrega), arreglo(*stock_actual), resultado, n
+    )
+    return resultado
+
+def calcular_sugerencias(ventas_mes, tiempo_entrega, stock_actual) -> list:
+    """
+    Punto de entrada por lotes del motor. Recibe tres secuencias paralelas de enteros
+    y devuelve la sugerencia de compra de cada producto, eligiendo el motor más rápido:
+    1. C por lotes, 2. NumPy vectorizado, 3. Python fila a fila.
+    """
+    if not ventas_mes:
+        return []
+
+    if motor_c is not None and motor_c_lote:
+        try:
+            return [int(s) for s in c_batch_optimize_stock(ventas_mes, tiempo_entrega, stock_actual)]
+        except Exception:
+            # Si falla, activo mi fallback silencioso
+            pass
+
+    if np is not None:
+        return numpy_optimize_stock(ventas_mes, tiempo_entrega, stock_actual).tolist()
+
+    return [
+        python_optimize_stock(v, t, s)
+        for v, t, s in zip(ventas_mes, tiempo_entrega, stock_actual)
+    ]
+
+# Motor que toma los lotes cuando no hay C por lotes (mismo orden que calcular_sugerencias)
+MOTOR_RESPALDO = "NumPy vectorizado" if np is not None else "Python fila a fila"
+
+# Intento cargar el motor C
+try:
+    if os.path.exists(dll_path):
+        motor_c = ctypes.CDLL(dll_path)
+        # Defino la firma de la función C: int calcular_necesidad_compra(int, int, int)
+        motor_c.calcular_necesidad_compra.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int]
+        motor_c.calcular_necesidad_compra.restype = ctypes.c_int
+        # Firma por lotes: int calcular_necesidad_compra_lote(int*, int*, int*, int*, int)
+        if hasattr(motor_c, 'calcular_necesidad_compra_lote'):
+            puntero = ctypes.POINTER(ctypes.c_int)
+            motor_c.calcular_necesidad_compra_lote.argtypes = [puntero, puntero, puntero, puntero, ctypes.c_int]
+            motor_c.calcular_necesidad_compra_lote.restype = ctypes.c_int
+            motor_c_lote = True
+        print(f"✅ [Sistema] Motor de Optimización C cargado desde: {dll_path}")
+        if not motor_c_lote:
+            print(f"   -> La librería no exporta el cálculo por lotes. Lotes con motor de respaldo: {MOTOR_RESPALDO}.")
+    else:
+        print(f"⚠️ [Sistema] Librería C no encontrada en {dll_path}. Activando motor de respaldo: {MOTOR_RESPALDO}.")
+except OSError as e:
+    # Este error es común en desarrollo Windows vs Linux cruzado (32 vs 64 bits)
+    if hasattr(e, 'winerror') and e.winerror == 193:
+        print(f"⚠️ [Advertencia] Discrepancia de arquitectura CPU (DLL 32-bit vs Python 64-bit).")
+        print(f"   -> El sistema continuará operando con el motor de respaldo: {MOTOR_RESPALDO}.")
+    else:
+        print(f"❌ [Error] Fallo al cargar módulo C: {e}. Activando motor de respaldo: {MOTOR_RESPALDO}.")
+    motor_c = None
+except Exception as e:
+    print(f"❌ [Error Crítico] Excepción inesperada en carga de módulos: {e}")
+    motor_c = None
@@ -0,0 +1,258 @@
+"""
+Caché de productos en proceso con invalidación write-through.
+
+Guardo los productos como diccionarios planos (no objetos ORM, que quedan atados a su
+sesión) bajo dos tipos de clave:
+  - "id:<id>"             -> un producto
+  - "cat:<categoría>"     -> lista ordenada por id de los productos de esa categoría
+                             ("cat:*" es el catálogo completo)
+
+Quien escribe en `products` llama a invalidate() después de su commit. Para despliegues
+multi-worker (gunicorn) hay dos mecanismos complementarios:
+  1. sync_version(): cada worker compara la versión del catálogo (catalog.py) con la que
+     registró su backend y, si cambió por una escritura de otro worker, desaloja sólo los
+     productos y categorías que cambiaron (catalog.changes_since); vacía todo únicamente
+     ante un cambio total o si quedó demasiado atrás. La versión registrada vive fuera
+     del LRU, así que ninguna expulsión fuerza un vaciado.
+  2. Un backend compartido (Redis) en lugar del LRU local, elegido con PRODUCT_CACHE_URL.
+     SharedDictBackend es un sustituto local con la misma semántica, útil para pruebas.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from sqlalchemy.orm import Session
+
+import models
+
+ALL_CATEGORIES = "*"
+VERSION_KEY = "__catalog_version__"
+DEFAULT_MAXSIZE = 1024
+
+PRODUCT_FIELDS = [column.name for column in models.Product.__table__.columns]
+
+# --- BACKENDS ---
+
+class LRUBackend:
+    """ Backend por defecto: LRU acotado en memoria del proceso. """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._meta = {}  # Fuera del LRU: no se expulsa ni se vacía con clear()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_meta(self, key):
+        return self._meta.get(key)
+
+    def set_meta(self, key, value):
+        self._meta[key] = value
+
+    def __len__(self):
+        return len(self._data)
+
+class RedisBackend:
+    """
+    Backend compartido entre workers. Serializo a JSON y uso un prefijo por
+    "generación": clear() sólo incrementa la generación, y las claves viejas
+    expiran solas por TTL en lugar de recorrer el keyspace.
+    """
+
+    def __init__(self, url: str, prefix: str = "nexus:products", ttl: int = 300):
+        import redis  # Dependencia opcional: sólo se necesita con PRODUCT_CACHE_URL
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self._ttl = ttl
+
+    def _key(self, key):
+        generation = int(self._client.get(f"{self._prefix}:gen") or 0)
+        return f"{self._prefix}:{generation}:{key}"
+
+    def get(self, key):
+        raw = self._client.get(self._key(key))
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value):
+        self._client.set(self._key(key), json.dumps(value), ex=self._ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*[self._key(key) for key in keys])
+
+    def clear(self):
+        self._client.incr(f"{self._prefix}:gen")
+
+    def get_meta(self, key):
+        # Sin generación ni TTL: sobrevive a clear() y a la expiración de las entradas
+        raw = self._client.get(f"{self._prefix}:meta:{key}")
+        return json.loads(raw) if raw is not None else None
+
+    def set_meta(self, key, value):
+        self._client.set(f"{self._prefix}:meta:{key}", json.dumps(value))
+
+class SharedDictBackend:
+    """
+    Sustituto local de un backend compartido: varias instancias de ProductCache
+    (una por "worker") pueden recibir el mismo objeto y ven las mismas claves.
+    Igual que Redis, guarda copias serializadas, así nadie muta un valor ajeno.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._meta = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            raw = self._data.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value):
+        raw = json.dumps(value)
+        with self._lock:
+            self._data[key] = raw
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_meta(self, key):
+        with self._lock:
+            return self._meta.get(key)
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self._meta[key] = value
+
+# --- CACHÉ ---
+
+def _as_dict(product) -> dict:
+    return {field: getattr(product, field) for field in PRODUCT_FIELDS}
+
+class ProductCache:
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else LRUBackend()
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _count(self, hit: bool, n: int = 1):
+        with self._stats_lock:
+            if hit:
+                self.hits += n
+            else:
+                self.misses += n
+
+    def sync_version(self, version: int, changes_since=None):
+        """
+        Alinea la caché con la versión del catálogo. `changes_since(v)` devuelve
+        (ids, categorías) modificados después de v, o None si hay que vaciar todo;
+        sin él (o sin versión previa) cualquier cambio vacía la caché.
+        """
+        known = self.backend.get_meta(VERSION_KEY)
+        if known == version:
+            return
+        changes = None
+        if changes_since is not None and known is not None and known < version:
+            changes = changes_since(known)
+        if changes is None:
+            self.backend.clear()
+        else:
+            product_ids, categories = changes
+            self.invalidate(product_ids=product_ids, categories=categories)
+        self.backend.set_meta(VERSION_KEY, version)
+
+    def get_many(self, db: Session, product_ids) -> dict:
+        """ Devuelve {id: producto} resolviendo los faltantes con un único IN. """
+        found, missing = {}, []
+        for pid in set(product_ids):
+            cached = self.backend.get(f"id:{pid}")
+            if cached is None:
+                missing.append(pid)
+            else:
+                found[pid] = cached
+        self._count(True, len(found))
+
+        if missing:
+            self._count(False, len(missing))
+            for product in db.query(models.Product).filter(models.Product.id.in_(missing)).all():
+                data = _as_dict(product)
+                self.backend.set(f"id:{product.id}", data)
+                found[product.id] = data
+        return found
+
+    def get_category(self, db: Session, category: str = None) -> list:
+        """ Lista de productos (ordenada por id) de una categoría, o del catálogo completo. """
+        key = f"cat:{category or ALL_CATEGORIES}"
+        cached = self.backend.get(key)
+        if cached is not None:
+            self._count(True)
+            return cached
+
+        self._count(False)
+        query = db.query(models.Product)
+        if category:
+            query = query.filter(models.Product.category == category)
+        products = [_as_dict(p) for p in query.order_by(models.Product.id).all()]
+        self.backend.set(key, products)
+        return products
+
+    def invalidate(self, product_ids=(), categories=()):
+        """ Write-through: quien escribe borra las claves afectadas tras su commit. """
+        keys = [f"id:{pid}" for pid in product_ids]
+        keys += [f"cat:{category}" for category in categories]
+        keys.append(f"cat:{ALL_CATEGORIES}")
+        self.backend.delete(*keys)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+def build_cache() -> ProductCache:
+    """ Elijo el backend según el entorno: Redis si hay PRODUCT_CACHE_URL, LRU local si no. """
+    url = os.getenv("PRODUCT_CACHE_URL")
+    if url:
+        try:
+            return ProductCache(RedisBackend(url))
+        except Exception as e:
+            print(f"⚠️ [Caché] No se pudo usar el backend compartido ({e}). Uso LRU local.")
+    maxsize = int(os.getenv("PRODUCT_CACHE_MAXSIZE", DEFAULT_MAXSIZE))
+    return ProductCache(LRUBackend(maxsize))
@@ -0,0 +1,183 @@
+"""
+Mantenimiento de la tabla `sales_daily_rollup`.
+
+checkout llama a record_sales dentro de su propia transacción, de modo que los
+contadores nunca quedan desfasados respecto de `sales`. rebuild_rollup reconstruye
+la tabla desde cero recorriendo `sales` por bloques de ids, para bases existentes
+o para reparar el rollup a mano:
+
+    python rollup.py --chunk-size 50000
+
+La reconstrucción lee al principio el tope max(sales.id), con `sales` bloqueada para
+escritura, y sólo cuenta hasta ahí: las ventas posteriores ya entran por record_sales,
+así que nada se cuenta dos veces. Al arrancar, ensure_rollup reconstruye una única vez
+y sólo en el worker que logra insertar la fila marcador de `rollup_state`. Mientras
+reconstruye, ese worker renueva `built_at` en cada bloque; si muere o la reconstrucción
+falla, un arranque posterior retoma el marcador (al instante si falló, o cuando pasan
+ROLLUP_REBUILD_TIMEOUT segundos sin señales, por defecto 600).
+"""
+import argparse
+import os
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import func, or_, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+
+DEFAULT_CHUNK_SIZE = 50_000
+STATE_ROW_ID = 1
+REBUILD_TIMEOUT = int(os.getenv("ROLLUP_REBUILD_TIMEOUT", 600))
+
+def _upsert(db: Session, rows: list):
+    """ INSERT ... ON CONFLICT DO UPDATE que suma sobre los contadores existentes. """
+    if not rows:
+        return
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    table = models.SalesDailyRollup.__table__
+    stmt = dialect.insert(table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.purchase_type],
+        set_={
+            "revenue": table.c.revenue + stmt.excluded.revenue,
+            "sales_count": table.c.sales_count + stmt.excluded.sales_count,
+        },
+    )
+    db.execute(stmt)
+
+def record_sales(db: Session, day: date, purchase_type: str, revenue: float, count: int):
+    """ Suma una compra al rollup. No hace commit: lo hace quien llama, junto con las ventas. """
+    _upsert(db, [{
+        "day": day,
+        "purchase_type": purchase_type,
+        "revenue": revenue,
+        "sales_count": count,
+    }])
+
+def _set_state(db: Session, built_through):
+    state = db.get(models.RollupState, STATE_ROW_ID)
+    if state is None:
+        state = models.RollupState(id=STATE_ROW_ID)
+        db.add(state)
+    state.built_through = built_through
+    # En curso: última señal de vida del worker que reconstruye. Terminada: fin de la reconstrucción.
+    state.built_at = datetime.now(timezone.utc)
+
+def rebuild_rollup(db: Session, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Vacía y reconstruye el rollup agregando `sales` en bloques de `chunk_size` ids,
+    hasta el max(sales.id) leído al empezar. Cada bloque se agrupa en la base
+    (GROUP BY día, tipo) y se confirma por separado para no retener una transacción
+    gigante. Devuelve la cantidad de ventas procesadas.
+    """
+    sale = models.Sale
+    # Corte limpio: espero a los checkouts en curso y freno los nuevos hasta el commit,
+    # así toda venta <= tope ya está confirmada y toda venta > tope suma sobre el rollup vacío.
+    # (En SQLite el DELETE ya toma el lock de escritura de toda la base.)
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("LOCK TABLE sales IN SHARE MODE"))
+    db.query(models.SalesDailyRollup).delete()
+    cap_id = db.query(func.max(sale.id)).scalar() or 0
+    _set_state(db, None)
+    db.commit()
+
+    day_col = func.date(sale.timestamp)
+    type_col = func.coalesce(sale.purchase_type, "INDIVIDUAL")
+    processed = 0
+    last_id = 0
+
+    while last_id < cap_id:
+        # Límite superior del bloque: el id número `chunk_size` a partir de last_id (o el tope)
+        upper_id = db.query(sale.id).filter(sale.id > last_id, sale.id <= cap_id).order_by(sale.id)\
+            .offset(chunk_size - 1).limit(1).scalar()
+        if upper_id is None:
+            upper_id = cap_id
+
+        grouped = db.query(day_col, type_col, func.sum(sale.sale_price), func.count(sale.id))\
+            .filter(sale.id > last_id, sale.id <= upper_id)\
+            .group_by(day_col, type_col).all()
+
+        rows = []
+        for day, purchase_type, revenue, count in grouped:
+            if day is None:
+                continue
+            rows.append({
+                "day": day if isinstance(day, date) else date.fromisoformat(day),
+                "purchase_type": purchase_type,
+                "revenue": revenue or 0.0,
+                "sales_count": count,
+            })
+            processed += count
+        _upsert(db, rows)
+        _set_state(db, None)
+        db.commit()
+        last_id = upper_id
+
+    _set_state(db, cap_id)
+    db.commit()
+    return processed
+
+def ensure_rollup(db: Session, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Reconstrucción única al arrancar. Todos los workers lo llaman; sólo el que logra
+    insertar la fila marcador (o retomar una abandonada) reconstruye, el resto sigue de largo.
+    """
+    state_table = models.RollupState
+    state = db.get(state_table, STATE_ROW_ID)
+    if state is None:
+        db.add(state_table(id=STATE_ROW_ID, built_at=datetime.now(timezone.utc)))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Otro worker la insertó primero
+            db.rollback()
+            return
+    elif state.built_through is not None:
+        return
+    else:
+        # Reconstrucción sin terminar: la retomo si su dueño falló o dejó de dar señales.
+        # UPDATE condicional: entre varios workers, sólo uno la toma.
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=REBUILD_TIMEOUT)
+        claimed = db.execute(
+            update(state_table)
+            .where(state_table.id == STATE_ROW_ID, state_table.built_through.is_(None),
+                   or_(state_table.built_at.is_(None), state_table.built_at < cutoff))
+            .values(built_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        if not claimed:
+            return
+
+    try:
+        rebuild_rollup(db, chunk_size=chunk_size)
+    except Exception:
+        db.rollback()
+        # Libero el marcador para que el próximo arranque reintente enseguida
+        db.execute(
+            update(state_table)
+            .where(state_table.id == STATE_ROW_ID, state_table.built_through.is_(None))
+            .values(built_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        raise
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruye sales_daily_rollup desde la tabla sales.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    from database import SessionLocal, engine, Base
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        processed = rebuild_rollup(db, chunk_size=args.chunk_size)
+        print(f"✅ [Rollup] Reconstruido a partir de {processed} ventas.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Subsistema de contraseñas y sesiones.
+
+Contraseñas: KDF lenta y configurable (PBKDF2-SHA256 o scrypt, sólo librería estándar).
+El formato guardado incluye algoritmo, factor de trabajo y salt, así puedo subir el costo
+más adelante y re-hashear al vuelo en el próximo login (needs_rehash). Los hashes SHA256
+sin salt de versiones anteriores se siguen aceptando y se migran en el login.
+
+Sesiones: tokens firmados con HMAC-SHA256, sin estado. Se verifican sin tocar la base;
+además guardo los tokens ya verificados en un LRU para que los polls del dashboard
+no recalculen la firma ni decodifiquen el payload en cada request.
+
+Configuración por entorno:
+    NEXUS_SECRET_KEY         Clave de firma (obligatoria con más de un worker)
+    NEXUS_TOKEN_TTL          Vida del token en segundos (default 8 h)
+    PASSWORD_KDF             "pbkdf2_sha256" (default) o "scrypt"
+    PASSWORD_KDF_COST        Iteraciones PBKDF2 o N de scrypt (ver bench_password_kdf.py)
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+
+from product_cache import LRUBackend
+
+KDF_DEFAULT_COST = {"pbkdf2_sha256": 310_000, "scrypt": 2 ** 14}
+PASSWORD_KDF = os.getenv("PASSWORD_KDF", "pbkdf2_sha256")
+if PASSWORD_KDF not in KDF_DEFAULT_COST:
+    raise ValueError(f"PASSWORD_KDF inválido: {PASSWORD_KDF}")
+PASSWORD_KDF_COST = int(os.getenv("PASSWORD_KDF_COST", KDF_DEFAULT_COST[PASSWORD_KDF]))
+
+TOKEN_TTL_SECONDS = int(os.getenv("NEXUS_TOKEN_TTL", 8 * 3600))
+SECRET_KEY = os.getenv("NEXUS_SECRET_KEY")
+if not SECRET_KEY:
+    # Sin clave configurada genero una por proceso: los tokens no sobreviven a un reinicio
+    # ni se comparten entre workers, pero nunca firmo con una clave conocida.
+    SECRET_KEY = secrets.token_hex(32)
+    print("⚠️ [Seguridad] NEXUS_SECRET_KEY no definida. Uso una clave efímera por proceso.")
+
+# --- CONTRASEÑAS ---
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _unb64(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def _derive(algorithm: str, cost: int, password: str, salt: bytes) -> bytes:
+    if algorithm == "pbkdf2_sha256":
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, cost)
+    if algorithm == "scrypt":
+        return hashlib.scrypt(password.encode(), salt=salt, n=cost, r=8, p=1, maxmem=128 * cost * 8 * 2)
+    raise ValueError(f"Algoritmo de KDF desconocido: {algorithm}")
+
+def hash_password(password: str, algorithm: str = None, cost: int = None) -> str:
+    algorithm = algorithm or PASSWORD_KDF
+    cost = cost or PASSWORD_KDF_COST
+    salt = secrets.token_bytes(16)
+    digest = _derive(algorithm, cost, password, salt)
+    return f"{algorithm}${cost}${_b64(salt)}${_b64(digest)}"
+
+def _is_legacy(encoded: str) -> bool:
+    return "$" not in encoded
+
+def verify_password(password: str, encoded: str) -> bool:
+    if not encoded:
+        return False
+    if _is_legacy(encoded):
+        # Hash SHA256 sin salt de la versión anterior
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, encoded)
+    try:
+        algorithm, cost, salt, digest = encoded.split("$")
+        candidate = _derive(algorithm, int(cost), password, _unb64(salt))
+    except ValueError:
+        return False
+    return hmac.compare_digest(candidate, _unb64(digest))
+
+def needs_rehash(encoded: str) -> bool:
+    """ True si el hash es legacy o usa un algoritmo / costo distinto al configurado. """
+    if _is_legacy(encoded):
+        return True
+    algorithm, cost, _, _ = encoded.split("$")
+    return algorithm != PASSWORD_KDF or int(cost) != PASSWORD_KDF_COST
+
+# Hash de referencia para usuarios inexistentes: el login paga el mismo costo exista o no
+# el usuario, así el tiempo de respuesta no revela qué nombres son válidos.
+_DUMMY_HASH = hash_password(secrets.token_hex(8))
+
+def verify_dummy(password: str):
+    verify_password(password, _DUMMY_HASH)
+
+# --- TOKENS DE SESIÓN ---
+
+_verified_tokens = LRUBackend(maxsize=int(os.getenv("NEXUS_TOKEN_CACHE_SIZE", 4096)))
+
+def _sign(payload: str) -> str:
+    return _b64(hmac.new(SECRET_KEY.encode(), payload.encode(), hashlib.sha256).digest())
+
+def create_access_token(username: str, ttl: int = None) -> str:
+    now = int(time.time())
+    claims = {"sub": username, "iat": now, "exp": now + (ttl or TOKEN_TTL_SECONDS)}
+    payload = _b64(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{payload}.{_sign(payload)}"
+
+def verify_token(token: str):
+    """ Devuelve los claims si el token es auténtico y vigente; None en cualquier otro caso. """
+    if not token:
+        return None
+
+    claims = _verified_tokens.get(token)
+    if claims is None:
+        try:
+            payload, signature = token.split(".")
+        except ValueError:
+            return None
+        if not hmac.compare_digest(signature, _sign(payload)):
+            return None
+        try:
+            claims = json.loads(_unb64(payload))
+        except ValueError:
+            return None
+        _verified_tokens.set(token, claims)
+
+    if claims.get("exp", 0) < time.time():
+        _verified_tokens.delete(token)
+        return None
+    return claims
@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# Los módulos del backend se importan por nombre (como hace main.py) y contra una base temporal
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='nexus_tests_')}/test.db")
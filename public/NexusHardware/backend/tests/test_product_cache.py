@@ -0,0 +1,155 @@
+"""
+ProductCache con dos "workers" (dos instancias) sobre un mismo SharedDictBackend,
+el sustituto local del backend compartido.
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import Base
+from product_cache import LRUBackend, ProductCache, SharedDictBackend
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        models.Product(id=1, name="Mouse", category="Perifericos", price=100.0, stock=5),
+        models.Product(id=2, name="Teclado", category="Perifericos", price=200.0, stock=3),
+        models.Product(id=3, name="Monitor", category="Pantallas", price=900.0, stock=1),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+@pytest.fixture
+def workers():
+    backend = SharedDictBackend()
+    return ProductCache(backend), ProductCache(backend)
+
+def _set_price(db, product_id, price):
+    db.get(models.Product, product_id).price = price
+    db.commit()
+
+def test_workers_share_entries(db, workers):
+    a, b = workers
+    assert a.get_many(db, [1, 2])[1]["name"] == "Mouse"
+    # El segundo worker encuentra lo que cargó el primero
+    assert b.get_many(db, [1, 2])[2]["price"] == 200.0
+    assert (a.hits, a.misses) == (0, 2)
+    assert (b.hits, b.misses) == (2, 0)
+
+def test_get_many_loads_only_missing(db, workers):
+    a, _ = workers
+    a.get_many(db, [1])
+    found = a.get_many(db, [1, 3, 99])
+    assert set(found) == {1, 3}
+    assert (a.hits, a.misses) == (1, 3)
+
+def test_invalidate_is_seen_by_other_worker(db, workers):
+    a, b = workers
+    a.get_many(db, [1])
+    assert b.get_category(db, "Perifericos")[0]["price"] == 100.0
+
+    _set_price(db, 1, 150.0)
+    a.invalidate(product_ids=[1], categories=["Perifericos"])
+
+    assert b.get_many(db, [1])[1]["price"] == 150.0
+    assert b.get_category(db, "Perifericos")[0]["price"] == 150.0
+    assert b.misses == 3
+
+def test_invalidate_drops_full_catalog(db, workers):
+    a, b = workers
+    assert len(a.get_category(db)) == 3
+    a.invalidate(product_ids=[3])
+    b.get_category(db)
+    assert b.misses == 1
+
+def test_sync_version_clears_stale_entries(db, workers):
+    a, b = workers
+    a.sync_version(1)
+    a.get_many(db, [1])
+
+    # Otro worker cambia el producto sin invalidar (p. ej. /system/reset) y sube la versión
+    _set_price(db, 1, 120.0)
+    b.sync_version(2)
+    assert b.get_many(db, [1])[1]["price"] == 120.0
+
+    # Misma versión: no vuelve a vaciar
+    a.sync_version(2)
+    assert a.get_many(db, [1])[1]["price"] == 120.0
+    assert a.hits == 1
+
+def test_shared_values_are_copies(db, workers):
+    a, b = workers
+    a.get_many(db, [1])[1]["price"] = 0.0
+    assert b.get_many(db, [1])[1]["price"] == 100.0
+
+def test_stats(db):
+    cache = ProductCache(LRUBackend(maxsize=2))
+    cache.get_many(db, [1, 2, 3])
+    cache.get_many(db, [3])
+    assert cache.stats() == {"backend": "LRUBackend", "hits": 1, "misses": 3, "hit_ratio": 0.25}
+
+def test_sync_version_evicts_only_changed_products(db, workers):
+    a, b = workers
+    a.sync_version(1)
+    a.get_many(db, [1, 2, 3])
+    a.get_category(db, "Pantallas")
+
+    # Otro worker vendió el producto 1: sólo ese producto y su categoría cambian
+    _set_price(db, 1, 130.0)
+    b.sync_version(2, lambda since: ({1}, {"Perifericos"}))
+
+    assert a.get_many(db, [1, 2, 3])[1]["price"] == 130.0
+    a.get_category(db, "Pantallas")
+    assert (a.hits, a.misses) == (3, 5)
+
+def test_sync_version_clears_when_changes_unknown(db, workers):
+    a, b = workers
+    a.sync_version(1)
+    a.get_many(db, [2])
+    b.sync_version(5, lambda since: None)
+    a.get_many(db, [2])
+    assert a.misses == 2
+
+def test_version_survives_lru_eviction(db):
+    cache = ProductCache(LRUBackend(maxsize=1))
+    cache.sync_version(1)
+    cache.get_many(db, [1, 2, 3])
+    cache.get_many(db, [3])
+    # La versión no ocupa lugar en el LRU: la misma versión no vacía nada
+    cache.sync_version(1)
+    cache.get_many(db, [3])
+    assert cache.hits == 2
+
+def test_catalog_change_log(db):
+    import catalog
+
+    catalog.ensure_catalog_version(db)
+    catalog.bump_catalog_version(db, product_ids=[1, 2], categories=["Perifericos"])
+    catalog.bump_catalog_version(db, product_ids=[], categories=["Pantallas"])
+    db.commit()
+    assert catalog.get_catalog_version(db) == 2
+    assert catalog.changes_since(db, 0) == ({1, 2}, {"Perifericos", "Pantallas"})
+    assert catalog.changes_since(db, 1) == (set(), {"Pantallas"})
+
+    # Un cambio total en el medio obliga a vaciar
+    catalog.bump_catalog_version(db)
+    db.commit()
+    assert catalog.changes_since(db, 1) is None
+
+def test_catalog_change_log_gap(db):
+    import catalog
+
+    catalog.ensure_catalog_version(db)
+    catalog.bump_catalog_version(db, product_ids=[1])
+    catalog.bump_catalog_version(db, product_ids=[2])
+    db.commit()
+    db.query(models.CatalogChange).filter(models.CatalogChange.version == 1).delete()
+    db.commit()
+    # La versión 1 ya no está en el registro: no sé qué cambió desde la 0
+    assert catalog.changes_since(db, 0) is None
+    assert catalog.changes_since(db, 1) == ({2}, set())
@@ -1,5 +1,5 @@
 import { useEffect, useState } from 'react';
-import API_URL from '../config';
+import API_URL, { authHeaders } from '../config';
 import AdminSidebar from './admin/AdminSidebar';
 import DashboardModule from './admin/DashboardModule';
 import InventoryModule from './admin/InventoryModule';
@@ -15,8 +15,8 @@ const AdminPanel = ({ username }) => {
 
     const fetchData = () => {
         const timeout = setTimeout(() => setIsWakingUp(true), 3000);
-        const fetchStats = fetch(`${API_URL}/dashboard-stats`).then(res => res.json());
-        const fetchOptimization = fetch(`${API_URL}/optimization`).then(res => res.json());
+        const fetchStats = fetch(`${API_URL}/dashboard-stats`, { headers: authHeaders() }).then(res => res.json());
+        const fetchOptimization = fetch(`${API_URL}/optimization`, { headers: authHeaders() }).then(res => res.json());
 
         Promise.all([fetchStats, fetchOptimization])
             .then(([statsData, optData]) => {
@@ -1,5 +1,5 @@
 import { useState } from 'react';
-import API_URL from '../config';
+import API_URL, { TOKEN_KEY } from '../config';
 import GlassContainer from './common/GlassContainer';
 import Button from './common/Button';
 
@@ -23,6 +23,7 @@ const Login = ({ onLogin }) => {
 
             if (response.ok) {
                 const data = await response.json();
+                sessionStorage.setItem(TOKEN_KEY, data.access_token);
                 // Artificial delay for effect
                 setTimeout(() => {
                     onLogin(data.username);
@@ -1,7 +1,7 @@
 import React, { useState } from 'react';
 import GlassContainer from '../common/GlassContainer';
 import Button from '../common/Button';
-import API_URL from '../../config';
+import API_URL, { authHeaders } from '../../config';
 
 const InventoryModule = ({ optimizationData, onRefresh }) => {
     const [newProduct, setNewProduct] = useState({
@@ -19,7 +19,7 @@ const InventoryModule = ({ optimizationData, onRefresh }) => {
             };
             const res = await fetch(`${API_URL}/products`, {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
+                headers: { 'Content-Type': 'application/json', ...authHeaders() },
                 body: JSON.stringify(payload)
             });
 
@@ -8,4 +8,13 @@ if (window.location.hostname === 'localhost' || window.location.hostname === '12
     API_URL = 'http://localhost:8000';
 }
 
+// Token de sesión emitido por /login. Lo envío en cada llamada del panel de administración
+// para que el backend valide la sesión sin volver a recibir credenciales.
+export const TOKEN_KEY = 'nexus_token';
+
+export const authHeaders = () => {
+    const token = sessionStorage.getItem(TOKEN_KEY);
+    return token ? { Authorization: `Bearer ${token}` } : {};
+};
+
 export default API_URL;
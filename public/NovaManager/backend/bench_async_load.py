@@ -0,0 +1,148 @@
+"""
+Load benchmark: sync (threadpool) vs async (AsyncSession) read endpoints.
+
+Seeds a throwaway SQLite database, then fires C concurrent clients at the read-heavy
+endpoints (trips, stock, employees, dashboard) and reports throughput and latency.
+The "sync" app serves the same queries the way main.py did before the async port
+(plain `def` + SessionLocal, one threadpool slot per in-flight request); the "async"
+app is main.app itself.
+
+By default everything runs in-process over ASGI. Pass --base-url to load-test a
+running server instead (e.g. uvicorn/gunicorn against Postgres).
+
+Usage:
+    python bench_async_load.py --concurrency 50 200 1000 --requests 2000
+    python bench_async_load.py --base-url http://localhost:8000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Isolate the run in a temp database before importing the app
+if "--base-url" not in sys.argv:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='nova_bench_')}/bench.db"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy.orm import Session
+from typing import List
+
+import main
+import models
+import schemas
+from database import SessionLocal
+
+ENDPOINTS = ["/trips", "/stock", "/employees", "/dashboard-stats"]
+
+def build_sync_app() -> FastAPI:
+    """ The pre-async endpoints, kept here only as a baseline. """
+    app = FastAPI()
+
+    @app.get("/trips", response_model=List[schemas.WorkTrip])
+    def trips(skip: int = 0, limit: int = 50, db: Session = Depends(main.get_db)):
+        return db.query(models.WorkTrip).order_by(models.WorkTrip.date.desc()).offset(skip).limit(limit).all()
+
+    @app.get("/stock", response_model=List[schemas.StockItem])
+    def stock(db: Session = Depends(main.get_db)):
+        return db.query(models.StockItem).order_by(models.StockItem.purchase_date.desc()).all()
+
+    @app.get("/employees", response_model=List[schemas.Employee])
+    def employees(skip: int = 0, limit: int = 100, db: Session = Depends(main.get_db)):
+        return db.query(models.Employee).offset(skip).limit(limit).all()
+
+    @app.get("/dashboard-stats")
+    def dashboard(db: Session = Depends(main.get_db)):
+        now = datetime.now()
+        txs = db.query(models.Transaction).filter(models.Transaction.date >= datetime(now.year, now.month, 1)).all()
+        income = sum(t.amount for t in txs if t.type == "INCOME")
+        expenses = sum(t.amount for t in txs if t.type == "EXPENSE")
+        return {"income": income, "expenses": expenses, "balance": income - expenses}
+
+    return app
+
+def seed(trips: int = 200, employees: int = 30, stock_items: int = 100):
+    db = SessionLocal()
+    try:
+        models.Base.metadata.create_all(bind=db.get_bind())
+        emps = [models.Employee(name=f"Bench {i}") for i in range(employees)]
+        items = [models.StockItem(name=f"Item {i}", cost_amount=100.0, initial_quantity=50.0,
+                                  quantity=50.0, unit_cost=2.0) for i in range(stock_items)]
+        db.add_all(emps + items)
+        db.flush()
+        for i in range(trips):
+            trip = models.WorkTrip(description=f"Trip {i}", status="CLOSED" if i % 3 else "OPEN")
+            trip.assignments = [models.TripEmployee(employee_id=emps[(i + k) % employees].id,
+                                                    meters_done=5.0, total_earned=500.0) for k in range(3)]
+            trip.materials = [models.TripMaterial(stock_item_id=items[i % stock_items].id, quantity_out=2.0)]
+            db.add(trip)
+        for i in range(500):
+            db.add(models.Transaction(amount=100.0, description="bench", type="INCOME" if i % 2 else "EXPENSE"))
+        db.commit()
+    finally:
+        db.close()
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, total: int):
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(ENDPOINTS[i % len(ENDPOINTS)])
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                path = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                response = await client.get(path)
+                if response.status_code != 200:
+                    errors += 1
+            except Exception:
+                # Pool exhaustion / timeouts count as failed requests, not as a crashed run
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return total / elapsed, statistics.median(latencies), p99, errors
+
+async def bench(args):
+    targets = []
+    if args.base_url:
+        targets.append(("server", httpx.AsyncClient(base_url=args.base_url, timeout=60)))
+    else:
+        seed()
+        for label, app in (("sync", build_sync_app()), ("async", main.app)):
+            transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+            targets.append((label, httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60)))
+
+    print(f"{'mode':<7} | {'clients':>7} | {'req/s':>9} | {'p50 ms':>8} | {'p99 ms':>8} | {'errors':>6}")
+    print("-" * 58)
+    for concurrency in args.concurrency:
+        for label, client in targets:
+            rps, p50, p99, errors = await run_level(client, concurrency, max(args.requests, concurrency))
+            print(f"{label:<7} | {concurrency:>7} | {rps:>9.1f} | {p50:>8.1f} | {p99:>8.1f} | {errors:>6}")
+        print("-" * 58)
+    for _, client in targets:
+        await client.aclose()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sync vs async read endpoint load benchmark.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per concurrency level")
+    parser.add_argument("--base-url", default=None)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    asyncio.run(bench(parse_args()))
@@ -0,0 +1,75 @@
+"""
+Export throughput benchmark (rows/s) for the CSV and Parquet streams.
+
+Seeds a throwaway SQLite database with N transactions and consumes
+exports.stream_export the same way StreamingResponse does, reporting rows/s,
+output size and peak RSS.
+
+Usage:
+    python bench_exports.py --rows 100000 500000
+    python bench_exports.py --rows 200000 --batch-size 10000
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Isolate the run in a temp database before importing the app modules
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='nova_export_bench_')}/bench.db"
+
+from sqlalchemy import insert
+
+import exports
+import models
+from database import SessionLocal, engine
+
+def seed(total: int):
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.add_all([models.Category(name="Ventas", type="INCOME"), models.Category(name="Insumos", type="EXPENSE")])
+        db.commit()
+        start = datetime(2025, 1, 1)
+        for offset in range(0, total, 50_000):
+            db.execute(insert(models.Transaction), [
+                {"date": start + timedelta(minutes=i), "amount": 100.0 + i % 1000, "description": f"Movimiento {i}",
+                 "type": "INCOME" if i % 2 else "EXPENSE", "category_id": 1 + i % 2, "is_invoiced": bool(i % 3)}
+                for i in range(offset, min(offset + 50_000, total))
+            ])
+            db.commit()
+    finally:
+        db.close()
+
+def run(fmt: str, batch_size: int):
+    start = time.perf_counter()
+    size = 0
+    for chunk in exports.stream_export("transactions", fmt, batch_size=batch_size):
+        size += len(chunk)
+    return time.perf_counter() - start, size
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV / Parquet export throughput.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 500_000])
+    parser.add_argument("--batch-size", type=int, default=exports.EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    formats = ["csv"] + (["parquet"] if exports.parquet_available() else [])
+    if len(formats) == 1:
+        print("pyarrow not installed: Parquet skipped", file=sys.stderr)
+
+    print(f"{'format':<8} | {'rows':>8} | {'seconds':>8} | {'rows/s':>10} | {'MB out':>7} | {'peak RSS MB':>11}")
+    print("-" * 68)
+    for total in args.rows:
+        seed(total)
+        for fmt in formats:
+            elapsed, size = run(fmt, args.batch_size)
+            # ru_maxrss is KiB on Linux and only grows: flat values across sizes mean flat memory
+            peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print(f"{fmt:<8} | {total:>8} | {elapsed:>8.2f} | {total / elapsed:>10.0f} | {size / 1e6:>7.1f} | {peak_mb:>11.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Response size and query count of the trip / stock list endpoints: full nested lists
+(/trips, /stock) against the summary projections (/trips/summary, /stock/summary).
+
+Seeds a throwaway SQLite database with N trips (crew and materials each) and M stock
+items with a long usage history, then calls every endpoint in-process through the ASGI
+app, counting the SQL statements it runs on both engines.
+
+Usage:
+    python bench_lists.py
+    python bench_lists.py --trips 1000 --stock 5000 --usages 20
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Isolate the run in a temp database before importing the app modules
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='nova_lists_bench_')}/bench.db"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert
+
+import main
+import models
+from database import SessionLocal, async_engine, engine
+
+def seed(total_trips: int, total_stock: int, usages_per_item: int):
+    db = SessionLocal()
+    try:
+        db.execute(insert(models.Vehicle), [{"name": f"Camion {i}", "plate": f"AA{i:03d}BB", "type": "TRUCK"} for i in range(10)])
+        db.execute(insert(models.Employee), [{"name": f"Empleado {i}"} for i in range(50)])
+        start = datetime(2025, 1, 1)
+        db.execute(insert(models.StockItem), [
+            {"name": f"Material {i}", "cost_amount": 1000.0, "initial_quantity": 1000.0, "quantity": 500.0,
+             "unit_cost": 1.0, "purchase_date": start + timedelta(minutes=i), "status": "AVAILABLE"}
+            for i in range(total_stock)
+        ])
+        db.execute(insert(models.MaterialUsage), [
+            {"stock_item_id": 1 + i % total_stock, "employee_id": 1 + i % 50, "quantity": 1.0,
+             "date": start + timedelta(minutes=i), "description": f"Uso en obra {i}"}
+            for i in range(total_stock * usages_per_item)
+        ])
+        db.execute(insert(models.WorkTrip), [
+            {"date": start + timedelta(hours=i), "description": f"Obra {i}", "status": "CLOSED" if i % 5 else "OPEN",
+             "vehicle_id": 1 + i % 10}
+            for i in range(total_trips)
+        ])
+        db.execute(insert(models.TripEmployee), [
+            {"trip_id": 1 + i // 4, "employee_id": 1 + i % 50, "meters_done": 10.0, "historical_price": 100.0,
+             "total_earned": 1000.0}
+            for i in range(total_trips * 4)
+        ])
+        db.execute(insert(models.TripMaterial), [
+            {"trip_id": 1 + i // 3, "stock_item_id": 1 + i % total_stock, "quantity_out": 5.0}
+            for i in range(total_trips * 3)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Full vs summary list endpoints.")
+    parser.add_argument("--trips", type=int, default=1000)
+    parser.add_argument("--stock", type=int, default=5000)
+    parser.add_argument("--usages", type=int, default=20, help="Usage rows per stock item")
+    args = parser.parse_args()
+
+    seed(args.trips, args.stock, args.usages)
+
+    statements = []
+    for bind in (engine, async_engine.sync_engine):
+        event.listen(bind, "before_cursor_execute", lambda *a: statements.append(a[2]))
+
+    endpoints = [
+        f"/trips?limit={args.trips}",
+        f"/trips/summary?limit={args.trips}",
+        "/stock",
+        "/stock/summary",
+        "/trips/1",
+        "/stock/1",
+    ]
+    print(f"{args.trips} trips | {args.stock} stock items x {args.usages} usages\n")
+    print(f"{'endpoint':<28} | {'rows':>6} | {'KB':>9} | {'queries':>7} | {'ms':>7}")
+    print("-" * 68)
+    with TestClient(main.app) as client:
+        for url in endpoints:
+            statements.clear()
+            start = time.perf_counter()
+            response = client.get(url)
+            elapsed = (time.perf_counter() - start) * 1000
+            body = response.json()
+            rows = len(body) if isinstance(body, list) else 1
+            print(f"{url:<28} | {rows:>6} | {len(response.content) / 1024:>9.1f} | {len(statements):>7} | {elapsed:>7.0f}")
+
+if __name__ == "__main__":
+    main_bench()
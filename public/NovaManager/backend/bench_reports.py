@@ -0,0 +1,100 @@
+"""
+Benchmark: monthly PDF report, legacy single-table layout vs the chunked layout.
+
+Each (mode, size) pair runs in a fresh subprocess so peak RSS is measured per run.
+"legacy" reproduces the original monthly PDF (one Table for every row,
+setStyle called once per row, BytesIO output); "chunked" is reports.render_report, the
+entry point the report workers use, fed a row generator and writing to a file.
+
+Usage:
+    python bench_reports.py                          # 1k / 50k / 200k rows
+    python bench_reports.py --sizes 1000 50000 --legacy-max 50000   # include legacy at 50k (slow)
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+Row = namedtuple("Row", "date type description amount category_name")
+
+def fake_rows(n):
+    start = datetime(2025, 1, 1)
+    for i in range(n):
+        yield Row(start + timedelta(seconds=i * 10), "INCOME" if i % 3 else "EXPENSE",
+                  f"Movimiento de prueba {i}", 1000.0 + i, "Otros Gastos")
+
+def legacy_pdf(rows):
+    """ The pre-chunking implementation, kept only as a baseline. """
+    from io import BytesIO
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+    rows = list(rows)
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=2*cm, leftMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm)
+    tx_data = [["Fecha", "Tipo", "Categoría", "Descripción", "Monto"]]
+    for tx in rows:
+        tx_data.append([tx.date.strftime("%d/%m/%Y"), "Ingreso" if tx.type == "INCOME" else "Gasto",
+                        tx.category_name, tx.description[:30], f"$ {tx.amount:,.2f}"])
+    t_tx = Table(tx_data, colWidths=[2.5*cm, 2*cm, 4*cm, 5.5*cm, 3*cm])
+    t_tx.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ]))
+    for i, tx in enumerate(rows):
+        color = colors.green if tx.type == "INCOME" else colors.red
+        t_tx.setStyle(TableStyle([('TEXTCOLOR', (4, i + 1), (4, i + 1), color)]))
+    doc.build([t_tx])
+    return len(buffer.getvalue())
+
+def chunked_pdf(rows):
+    import os
+    import tempfile
+    import reports
+    payload = {"month_str": "Bench", "income": 0, "expenses": 0, "balance": 0, "transactions": rows}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = reports.render_report("monthly", os.path.join(tmp, "bench.pdf"), payload)
+        return os.path.getsize(path)
+
+def run_one(mode, size):
+    start = time.perf_counter()
+    pdf_bytes = (legacy_pdf if mode == "legacy" else chunked_pdf)(fake_rows(size))
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"seconds": elapsed, "peak_mb": peak_mb, "pdf_bytes": pdf_bytes}))
+
+def main():
+    parser = argparse.ArgumentParser(description="Monthly PDF report benchmark.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 50_000, 200_000])
+    parser.add_argument("--legacy-max", type=int, default=20_000,
+                        help="Skip the legacy layout above this many rows (it is super-linear)")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_one(args.child[0], int(args.child[1]))
+        return
+
+    print(f"{'mode':<7} | {'rows':>8} | {'wall s':>8} | {'peak RSS MB':>11} | {'PDF KB':>8}")
+    print("-" * 55)
+    for size in args.sizes:
+        for mode in ("legacy", "chunked"):
+            if mode == "legacy" and size > args.legacy_max:
+                print(f"{mode:<7} | {size:>8} | {'skipped':>8} |")
+                continue
+            out = subprocess.run([sys.executable, __file__, "--child", mode, str(size)],
+                                 capture_output=True, text=True, check=True)
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{mode:<7} | {size:>8} | {r['seconds']:>8.2f} | {r['peak_mb']:>11.1f} | {r['pdf_bytes'] / 1024:>8.0f}")
+
+if __name__ == "__main__":
+    main()
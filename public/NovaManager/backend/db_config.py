@@ -0,0 +1,151 @@
+"""
+Engine / connection pool configuration and pool instrumentation.
+
+Everything is read from the environment so the same code runs on a laptop (SQLite)
+and on the Postgres deployment:
+
+    DB_POOL_SIZE          Persistent connections per process        (default 5)
+    DB_MAX_OVERFLOW       Extra connections allowed under burst      (default 10)
+    DB_POOL_TIMEOUT       Seconds to wait for a free connection      (default 30)
+    DB_POOL_RECYCLE       Recycle connections older than N seconds   (default 1800, -1 = never)
+    DB_POOL_PRE_PING      Test connections on checkout (true/false)  (default true, Postgres only)
+    SQLITE_BUSY_TIMEOUT   Seconds SQLite waits on a locked database  (default 15)
+    SQLITE_MMAP_SIZE      PRAGMA mmap_size in bytes                  (default 256 MiB)
+    SQLITE_CACHE_SIZE     PRAGMA cache_size (negative = KiB)         (default -64000, ~64 MB)
+
+On SQLite every new connection gets WAL journaling and synchronous=NORMAL, so readers
+don't block the writer. Every pool records how long checkouts wait and how saturated
+it is; pool_metrics() returns a snapshot for the metrics endpoint.
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+# --- METRICS ---
+
+class PoolMetrics:
+    # Upper bounds (ms) of the checkout wait histogram; the last bucket is open-ended
+    BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.histogram = [0] * (len(self.BUCKETS_MS) + 1)
+        self._lock = threading.Lock()
+
+    def record_wait(self, waited_ms: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total_ms += waited_ms
+            self.wait_max_ms = max(self.wait_max_ms, waited_ms)
+            for i, bound in enumerate(self.BUCKETS_MS):
+                if waited_ms <= bound:
+                    self.histogram[i] += 1
+                    break
+            else:
+                self.histogram[-1] += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        size = pool.size() if pool is not None else 0
+        checked_out = pool.checkedout() if pool is not None else 0
+        capacity = size + max(getattr(pool, "_max_overflow", 0), 0)
+        labels = [f"<={b}ms" for b in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}ms"]
+        return {
+            "pool": self.name,
+            "size": size,
+            "checked_out": checked_out,
+            "overflow": max(pool.overflow(), 0) if pool is not None else 0,
+            "capacity": capacity,
+            "saturation": round(checked_out / capacity, 4) if capacity else 0.0,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(self.wait_total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.wait_max_ms, 3),
+            "wait_histogram": dict(zip(labels, self.histogram)),
+        }
+
+_registry = {}
+
+def _instrumented(base_pool, metrics: PoolMetrics):
+    """ Pool subclass that times how long each checkout waits for a connection. """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = base_pool._do_get(self)
+        except exc.TimeoutError:
+            metrics.record_timeout()
+            raise
+        metrics.record_wait((time.perf_counter() - start) * 1000)
+        return connection
+
+    # The metrics live on the class, so they survive pool.recreate() (engine.dispose())
+    return type(f"Instrumented{base_pool.__name__}", (base_pool,), {"_do_get": _do_get, "metrics": metrics})
+
+# --- ENGINE CONFIGURATION ---
+
+def engine_kwargs(url: str, name: str, is_async: bool = False) -> dict:
+    """ Keyword arguments for create_engine / create_async_engine. """
+    metrics = _registry.setdefault(name, PoolMetrics(name))
+    kwargs = {
+        "poolclass": _instrumented(AsyncAdaptedQueuePool if is_async else QueuePool, metrics),
+        "pool_size": _env_int("DB_POOL_SIZE", 5),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+    }
+    if is_sqlite(url):
+        kwargs["connect_args"] = {"timeout": _env_int("SQLITE_BUSY_TIMEOUT", 15)}
+        if not is_async:
+            kwargs["connect_args"]["check_same_thread"] = False
+    else:
+        kwargs["pool_pre_ping"] = _env_bool("DB_POOL_PRE_PING", True)
+    return kwargs
+
+def configure_engine(engine, url: str, name: str):
+    """ Hooks SQLite pragmas and links the engine's pool to its metrics. """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    _registry[name].pool = sync_engine.pool
+
+    @event.listens_for(sync_engine.pool, "checkin")
+    def _track_pool(*_):
+        # After engine.dispose() the pool object is replaced; keep metrics pointing at the live one
+        _registry[name].pool = sync_engine.pool
+
+    if is_sqlite(url) and ":memory:" not in url:
+        mmap_size = _env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+        cache_size = _env_int("SQLITE_CACHE_SIZE", -64000)
+
+        @event.listens_for(sync_engine, "connect")
+        def _sqlite_pragmas(dbapi_connection, _):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA mmap_size={mmap_size}")
+            cursor.execute(f"PRAGMA cache_size={cache_size}")
+            cursor.close()
+    return engine
+
+def pool_metrics() -> list:
+    return [metrics.snapshot() for metrics in _registry.values()]
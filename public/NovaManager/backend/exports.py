@@ -0,0 +1,177 @@
+"""
+Streaming CSV / Parquet exports of the ledgers, for BI tooling.
+
+Rows are read with yield_per (server-side cursor on Postgres), encoded one batch at a
+time and handed to StreamingResponse as byte chunks, so memory stays flat no matter
+how many rows are exported. Parquet needs pyarrow, which is optional: without it only
+CSV is available.
+
+    EXPORT_BATCH_SIZE   Rows per DB fetch / CSV chunk / Parquet row group  (default 5000)
+"""
+import csv
+import io
+import os
+
+from sqlalchemy import select
+
+import models
+from database import SessionLocal
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 5000))
+
+class _Dataset:
+    def __init__(self, columns, query, date_column):
+        self.columns = columns          # [(name, type)] type: int | float | str | bool | datetime
+        self.query = query              # select() producing the columns in order
+        self.date_column = date_column  # filtered by ?start= / ?end=
+
+def _transactions():
+    tx = models.Transaction
+    return _Dataset(
+        [("id", "int"), ("date", "datetime"), ("type", "str"), ("amount", "float"), ("description", "str"),
+         ("is_invoiced", "bool"), ("category_id", "int"), ("category", "str")],
+        select(tx.id, tx.date, tx.type, tx.amount, tx.description, tx.is_invoiced, tx.category_id, models.Category.name)
+        .outerjoin(models.Category, tx.category_id == models.Category.id)
+        .order_by(tx.id),
+        tx.date,
+    )
+
+def _trips():
+    # One row per assignment (trips without employees still get one row)
+    trip, te = models.WorkTrip, models.TripEmployee
+    return _Dataset(
+        [("trip_id", "int"), ("date", "datetime"), ("description", "str"), ("status", "str"), ("vehicle_id", "int"),
+         ("employee_id", "int"), ("employee", "str"), ("is_present", "bool"), ("meters_done", "float"),
+         ("historical_price", "float"), ("total_earned", "float")],
+        select(trip.id, trip.date, trip.description, trip.status, trip.vehicle_id,
+               te.employee_id, models.Employee.name, te.is_present, te.meters_done, te.historical_price, te.total_earned)
+        .outerjoin(te, te.trip_id == trip.id)
+        .outerjoin(models.Employee, te.employee_id == models.Employee.id)
+        .order_by(trip.id, te.id),
+        trip.date,
+    )
+
+def _material_usages():
+    mu = models.MaterialUsage
+    return _Dataset(
+        [("id", "int"), ("date", "datetime"), ("stock_item_id", "int"), ("stock_item", "str"), ("employee_id", "int"),
+         ("quantity", "float"), ("description", "str"), ("sale_price_total", "float"), ("sale_tx_id", "int")],
+        select(mu.id, mu.date, mu.stock_item_id, models.StockItem.name, mu.employee_id,
+               mu.quantity, mu.description, mu.sale_price_total, mu.sale_tx_id)
+        .outerjoin(models.StockItem, mu.stock_item_id == models.StockItem.id)
+        .order_by(mu.id),
+        mu.date,
+    )
+
+def _expenses():
+    exp = models.ExpenseDocument
+    return _Dataset(
+        [("id", "int"), ("date", "datetime"), ("type", "str"), ("description", "str"), ("amount", "float"),
+         ("file_path", "str"), ("file_type", "str"), ("transaction_id", "int")],
+        select(exp.id, exp.date, exp.type, exp.description, exp.amount, exp.file_path, exp.file_type, exp.transaction_id)
+        .order_by(exp.id),
+        exp.date,
+    )
+
+DATASETS = {
+    "transactions": _transactions,
+    "trips": _trips,
+    "material-usages": _material_usages,
+    "expenses": _expenses,
+}
+
+FORMATS = {
+    # format: (media type, file extension)
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+def parquet_available() -> bool:
+    return pa is not None
+
+def _batches(dataset: _Dataset, start=None, end=None, batch_size=EXPORT_BATCH_SIZE):
+    """ Yields lists of row tuples; the session lives exactly as long as the stream. """
+    query = dataset.query
+    if start is not None:
+        query = query.where(dataset.date_column >= start)
+    if end is not None:
+        query = query.where(dataset.date_column < end)
+
+    db = SessionLocal()
+    try:
+        result = db.execute(query.execution_options(yield_per=batch_size))
+        for partition in result.partitions():
+            yield partition
+    finally:
+        db.close()
+
+def _iter_csv(dataset, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in dataset.columns])
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    # Header-only export: still a valid CSV
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+class _ChunkSink(io.RawIOBase):
+    """ Write-only file that hands whatever ParquetWriter wrote back to the stream. """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def _arrow_schema(dataset):
+    types = {"int": pa.int64(), "float": pa.float64(), "str": pa.string(), "bool": pa.bool_(),
+             "datetime": pa.timestamp("us")}
+    return pa.schema([(name, types[kind]) for name, kind in dataset.columns])
+
+def _iter_parquet(dataset, batches):
+    schema = _arrow_schema(dataset)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    for rows in batches:
+        # Each DB batch becomes one row group
+        columns = list(zip(*rows))
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+        ))
+        chunk = sink.drain()
+        if chunk:
+            yield chunk
+    writer.close()
+    yield sink.drain()
+
+def stream_export(name: str, fmt: str, start=None, end=None, batch_size=EXPORT_BATCH_SIZE):
+    """ Byte-chunk iterator for StreamingResponse. """
+    dataset = DATASETS[name]()
+    batches = _batches(dataset, start, end, batch_size)
+    if fmt == "parquet":
+        return _iter_parquet(dataset, batches)
+    return _iter_csv(dataset, batches)
@@ -0,0 +1,123 @@
+"""
+Employee history: balances and cursor-paginated sections.
+
+Every section is read newest first with keyset pagination on (date, id), so any page
+(the first one included) is an index range scan of `limit` rows no matter how long the
+employee's history is. The cursor is opaque to clients: the (date, id) of the last row
+of the previous page.
+
+Balances come from the ledger (ledger.py) and cover the whole history; the optional date
+range only filters the listed rows.
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, literal, or_
+from sqlalchemy.orm import Session, contains_eager
+
+import models
+import schemas
+
+HISTORY_PAGE_SIZE = 60
+
+class InvalidCursor(ValueError):
+    pass
+
+class _Section:
+    def __init__(self, query, date_column, id_column, item, sort_key=None, range_column=None):
+        self.query = query              # (db, employee_id) -> Query
+        self.date_column = date_column  # sort key
+        self.id_column = id_column      # tie-breaker for rows with the same date
+        self.item = item                # row -> response item
+        self.sort_key = sort_key or (lambda row: (row.date, row.id))  # row -> cursor values
+        self.range_column = range_column if range_column is not None else date_column  # ?start= / ?end=
+
+def _trip_assignments(db: Session, employee_id: int):
+    # Only closed/confirmed trips; the trip comes in the same query (no lazy load per row)
+    return (
+        db.query(models.TripEmployee)
+        .join(models.TripEmployee.trip)
+        .options(contains_eager(models.TripEmployee.trip))
+        .filter(models.TripEmployee.employee_id == employee_id, models.WorkTrip.status == "CLOSED")
+    )
+
+def _trip_item(ta: models.TripEmployee):
+    return schemas.TripEmployeeHistory(
+        trip_id=ta.trip.id,
+        date=ta.trip.date,
+        trip_description=ta.trip.description,
+        meters_done=ta.meters_done,
+        historical_price=ta.historical_price,
+        total_earned=ta.total_earned,
+    )
+
+def _by_employee(model):
+    return lambda db, employee_id: db.query(model).filter(model.employee_id == employee_id)
+
+SECTIONS = {
+    "records": _Section(_by_employee(models.PayrollRecord), models.PayrollRecord.date,
+                        models.PayrollRecord.id, schemas.PayrollRecord.model_validate),
+    "advances": _Section(_by_employee(models.Advance), models.Advance.date,
+                         models.Advance.id, schemas.Advance.model_validate),
+    "material_usages": _Section(_by_employee(models.MaterialUsage), models.MaterialUsage.date,
+                                models.MaterialUsage.id, schemas.MaterialUsage.model_validate),
+    "trip_assignments": _Section(_trip_assignments, models.WorkTrip.date,
+                                 models.TripEmployee.id, _trip_item, lambda ta: (ta.trip.date, ta.id)),
+    # One row per day (unique employee_id, day), so `day` orders it like `date` and uses that index
+    "attendance_log": _Section(_by_employee(models.DailyAttendance), models.DailyAttendance.day,
+                               models.DailyAttendance.id, schemas.AttendanceHistory.model_validate,
+                               lambda row: (row.day, row.id), models.DailyAttendance.date),
+}
+
+# --- CURSORS ---
+
+def encode_cursor(value, row_id: int) -> str:
+    raw = json.dumps([value.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, row_id = json.loads(raw)
+        return datetime.fromisoformat(value), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+def _after(db: Session, spec: _Section, value, row_id: int):
+    """
+    Rows that sort after the cursor: (date, id) < (value, row_id).
+
+    SQLite compares dates as stored text. Python-written dates are stored with
+    microseconds but server-default CURRENT_TIMESTAMP ones are not, so a whole-second
+    cursor value has two spellings: compare against the short one and match both.
+    """
+    column = spec.date_column
+    if column.type.python_type is not datetime:
+        value = value.date()
+    elif value.microsecond == 0 and db.get_bind().dialect.name == "sqlite":
+        short = literal(value.strftime("%Y-%m-%d %H:%M:%S"))
+        return or_(column < short, and_(column.in_([short, value]), spec.id_column < row_id))
+    return or_(column < value, and_(column == value, spec.id_column < row_id))
+
+# --- QUERIES ---
+
+def get_page(db: Session, employee_id: int, section: str, cursor: str = None,
+             limit: int = HISTORY_PAGE_SIZE, start=None, end=None):
+    """ Returns (items, next_cursor); next_cursor is None on the last page. """
+    spec = SECTIONS[section]
+    query = spec.query(db, employee_id)
+    if start is not None:
+        query = query.filter(spec.range_column >= start)
+    if end is not None:
+        query = query.filter(spec.range_column < end)
+    if cursor is not None:
+        value, row_id = decode_cursor(cursor)
+        query = query.filter(_after(db, spec, value, row_id))
+
+    # One extra row tells whether there is a next page
+    rows = query.order_by(spec.date_column.desc(), spec.id_column.desc()).limit(limit + 1).all()
+    items = [spec.item(row) for row in rows[:limit]]
+    if len(rows) <= limit:
+        return items, None
+    return items, encode_cursor(*spec.sort_key(rows[limit - 1]))
@@ -0,0 +1,242 @@
+"""
+Bulk import of historical transactions and stock from CSV or JSONL.
+
+Rows are validated with the API schemas in chunks, categories are resolved once up
+front, and each chunk is written with a single executemany INSERT and its own commit.
+A bad row never aborts the import: it is reported with its line number and skipped.
+
+Used by POST /import/{kind} and from the command line:
+
+    python importer.py transactions movimientos_2024.csv --errors errores.csv
+    python importer.py stock stock.jsonl --dry-run
+
+Transaction columns: amount, description, type, [date], [is_invoiced], [category | category_id]
+Stock columns:       name, cost_amount, initial_quantity, [purchase_date]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+from itertools import islice
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+import models
+import periods
+import schemas
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 1000))
+STOCK_CATEGORY = "Insumos / Materiales"
+
+class RowError(ValueError):
+    pass
+
+# --- READERS ---
+
+def read_rows(stream, fmt: str):
+    """ Yields (line number, dict) from a text stream. Empty CSV cells are left out, so schema defaults apply. """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {k: v for k, v in row.items() if k and v not in ("", None)}
+    elif fmt == "jsonl":
+        for line_num, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    yield line_num, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_num, RowError(f"Invalid JSON: {e}")
+    else:
+        raise ValueError("format must be csv or jsonl")
+
+def detect_format(filename: str) -> str:
+    return "jsonl" if filename.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+def _insert_split(db: Session, stmt, rows, date_key: str):
+    """
+    Core executemany INSERT. Rows without a date go in a second batch so the server default
+    fills it in (an explicit None would store NULL). Returns RETURNING values in row order,
+    dated rows first.
+    """
+    returned = []
+    for group in ([r for r in rows if date_key in r], [r for r in rows if date_key not in r]):
+        if group:
+            result = db.connection().execute(stmt, group)
+            if result.returns_rows:
+                returned += result.scalars().all()
+    return returned
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+
+# --- IMPORTERS ---
+
+class _Importer:
+    def __init__(self, db: Session, dry_run: bool):
+        self.db = db
+        self.dry_run = dry_run
+        self.categories = {name: cat_id for cat_id, name in db.query(models.Category.id, models.Category.name)}
+        self.category_ids = set(self.categories.values())
+        self.closed_periods = {p for (p,) in db.query(models.PeriodSnapshot.period)}
+
+    def check_period(self, date):
+        if periods.PERIOD_LOCK_MODE == "reject" and date is not None \
+                and periods.period_key(date.year, date.month) in self.closed_periods:
+            raise RowError(f"Period {periods.period_key(date.year, date.month)} is closed")
+
+    def flush(self, records, touched_periods):
+        """ Writes one validated chunk. Core INSERTs skip the ORM hook, so versions are bumped here. """
+        if self.dry_run or not records:
+            return
+        self.insert(records)
+        periods.bump_versions(self.db, touched_periods)
+        self.db.commit()
+
+class _TransactionImporter(_Importer):
+    schema = schemas.TransactionImport
+
+    def prepare(self, row: schemas.TransactionImport):
+        if row.type not in ("INCOME", "EXPENSE"):
+            raise RowError("type must be INCOME or EXPENSE")
+        category_id = row.category_id
+        if row.category is not None:
+            if row.category not in self.categories:
+                raise RowError(f"Unknown category: {row.category}")
+            category_id = self.categories[row.category]
+        elif category_id is not None and category_id not in self.category_ids:
+            raise RowError(f"Unknown category_id: {category_id}")
+        self.check_period(row.date)
+
+        record = {"amount": row.amount, "description": row.description, "type": row.type,
+                  "is_invoiced": row.is_invoiced, "category_id": category_id}
+        if row.date is not None:
+            record["date"] = row.date
+        return record, row.date
+
+    def insert(self, records):
+        _insert_split(self.db, insert(models.Transaction), records, "date")
+
+class _StockImporter(_Importer):
+    schema = schemas.StockItemImport
+
+    def __init__(self, db: Session, dry_run: bool):
+        super().__init__(db, dry_run)
+        self.stock_category_id = self.categories.get(STOCK_CATEGORY)
+        if self.stock_category_id is None and not dry_run:
+            category = models.Category(name=STOCK_CATEGORY, type="EXPENSE")
+            db.add(category)
+            db.commit()
+            self.stock_category_id = self.categories[STOCK_CATEGORY] = category.id
+
+    def prepare(self, row: schemas.StockItemImport):
+        if row.initial_quantity < 0 or row.cost_amount < 0:
+            raise RowError("cost_amount and initial_quantity must be >= 0")
+        self.check_period(row.purchase_date)
+        return row, row.purchase_date
+
+    def insert(self, items):
+        # Same bookkeeping as POST /stock: one expense transaction per purchased batch.
+        # Dated items first, matching the order _insert_split returns the new ids in.
+        items = sorted(items, key=lambda item: item.purchase_date is None)
+        tx_rows, stock_rows = [], []
+        for item in items:
+            tx = {"amount": item.cost_amount, "description": f"Compra Stock: {item.name} ({item.initial_quantity}u)",
+                  "type": "EXPENSE", "category_id": self.stock_category_id, "is_invoiced": False}
+            stock = {"name": item.name, "cost_amount": item.cost_amount, "initial_quantity": item.initial_quantity,
+                     "quantity": item.initial_quantity, "status": "AVAILABLE",
+                     "unit_cost": item.cost_amount / item.initial_quantity if item.initial_quantity > 0 else 0}
+            if item.purchase_date is not None:
+                tx["date"] = stock["purchase_date"] = item.purchase_date
+            tx_rows.append(tx)
+            stock_rows.append(stock)
+
+        tx_ids = _insert_split(
+            self.db, insert(models.Transaction).returning(models.Transaction.id, sort_by_parameter_order=True),
+            tx_rows, "date",
+        )
+        for stock, tx_id in zip(stock_rows, tx_ids):
+            stock["purchase_tx_id"] = tx_id
+        _insert_split(self.db, insert(models.StockItem), stock_rows, "purchase_date")
+
+IMPORTERS = {
+    "transactions": _TransactionImporter,
+    "stock": _StockImporter,
+}
+
+def run_import(db: Session, kind: str, rows, dry_run: bool = False, chunk_size: int = IMPORT_CHUNK_SIZE) -> dict:
+    """ Imports (line, dict) rows chunk by chunk. Returns an ImportReport-shaped dict. """
+    importer = IMPORTERS[kind](db, dry_run)
+    report = {"kind": kind, "dry_run": dry_run, "total_rows": 0, "imported": 0, "failed": 0, "errors": []}
+
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        records, touched = [], set()
+        for line, raw in chunk:
+            report["total_rows"] += 1
+            try:
+                if isinstance(raw, Exception):
+                    raise raw
+                record, date = importer.prepare(importer.schema.model_validate(raw))
+            except ValidationError as e:
+                report["errors"].append({"line": line, "error": _validation_message(e)})
+                continue
+            except RowError as e:
+                report["errors"].append({"line": line, "error": str(e)})
+                continue
+            records.append(record)
+            touched |= periods.periods_of(date)
+
+        try:
+            importer.flush(records, touched)
+        except Exception as e:
+            # A database error fails this chunk only; earlier chunks are already committed
+            db.rollback()
+            first, last = chunk[0][0], chunk[-1][0]
+            report["errors"].append({"line": first, "error": f"Chunk (lines {first}-{last}) failed: {e}"})
+            continue
+        report["imported"] += len(records)
+
+    report["failed"] = report["total_rows"] - report["imported"]
+    return report
+
+def write_error_report(report: dict, path: str):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["line", "error"])
+        writer.writerows((err["line"], err["error"]) for err in report["errors"])
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import of transactions / stock from CSV or JSONL.")
+    parser.add_argument("kind", choices=sorted(IMPORTERS))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default=None, help="Defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Validate only, write nothing")
+    parser.add_argument("--errors", default=None, help="Write row errors to this CSV file")
+    args = parser.parse_args()
+
+    from database import SessionLocal, engine
+    models.Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        with io.open(args.path, encoding="utf-8-sig", newline="") as stream:
+            rows = read_rows(stream, args.format or detect_format(args.path))
+            report = run_import(db, args.kind, rows, dry_run=args.dry_run, chunk_size=args.chunk_size)
+    finally:
+        db.close()
+
+    print(f"{report['total_rows']} rows | {report['imported']} imported | {report['failed']} failed"
+          + (" (dry run)" if args.dry_run else ""))
+    if args.errors:
+        write_error_report(report, args.errors)
+        print(f"Errors written to {args.errors}")
+    else:
+        for err in report["errors"][:20]:
+            print(f"  line {err['line']}: {err['error']}")
+
+if __name__ == "__main__":
+    main()
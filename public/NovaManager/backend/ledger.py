@@ -0,0 +1,171 @@
+"""
+Per-employee balance ledger: an append-only journal plus a cached balance row.
+
+    employee_ledger     One entry per event that moves a balance (never updated)
+    employee_balances   Running totals per employee, the O(1) read path
+
+Balances follow the history screen's definitions:
+
+    earned      total_earned of the employee's CLOSED trip assignments
+    advances    amount of advances not yet settled
+    net         earned - advances
+
+Endpoints post entries with `post()` inside their own transaction, so the journal, the
+balance and the source rows commit (or roll back) together. Balance rows are updated
+with `earned = earned + delta` in the database, so concurrent posts don't lose updates.
+
+`reconcile()` recomputes every balance from the source tables and reports (optionally
+fixes, with an ADJUSTMENT entry) any drift:
+
+    python ledger.py reconcile [--fix]
+"""
+import argparse
+from collections import defaultdict
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+
+# Entry kinds
+TRIP_EARNED = "TRIP_EARNED"          # Trip closed: +earned
+ADVANCE = "ADVANCE"                  # Advance given: +advances
+ADVANCE_SETTLED = "ADVANCE_SETTLED"  # Advance covered by a payroll record: -advances
+ADJUSTMENT = "ADJUSTMENT"            # Correction written by reconcile(fix=True)
+
+# Cents are enough to call two balances equal
+TOLERANCE = 0.005
+
+def entry(employee_id: int, kind: str, earned: float = 0.0, advances: float = 0.0,
+          ref_id: int = None, description: str = None) -> dict:
+    return {"employee_id": employee_id, "kind": kind, "earned_delta": earned, "advances_delta": advances,
+            "ref_id": ref_id, "description": description}
+
+def post(db: Session, entries):
+    """
+    Appends journal entries and applies them to the cached balances: one executemany
+    INSERT plus one multi-row upsert. No commit; the caller's commit makes it durable.
+    """
+    entries = [e for e in entries if e["earned_delta"] or e["advances_delta"]]
+    if not entries:
+        return
+    deltas = defaultdict(lambda: [0.0, 0.0])
+    for e in entries:
+        deltas[e["employee_id"]][0] += e["earned_delta"]
+        deltas[e["employee_id"]][1] += e["advances_delta"]
+
+    conn = db.connection()
+    conn.execute(insert(models.EmployeeLedgerEntry), entries)
+
+    dialect = postgresql if conn.dialect.name == "postgresql" else sqlite
+    table = models.EmployeeBalance.__table__
+    stmt = dialect.insert(table).values([
+        {"employee_id": emp_id, "earned": earned, "advances": advances}
+        for emp_id, (earned, advances) in sorted(deltas.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.employee_id],
+        set_={
+            "earned": table.c.earned + stmt.excluded.earned,
+            "advances": table.c.advances + stmt.excluded.advances,
+            "updated_at": func.now(),
+        },
+    )
+    conn.execute(stmt)
+
+def get_balance(db: Session, employee_id: int):
+    """ (earned, advances) from the cached row; employees without entries are at zero. """
+    row = db.execute(
+        select(models.EmployeeBalance.earned, models.EmployeeBalance.advances)
+        .where(models.EmployeeBalance.employee_id == employee_id)
+    ).one_or_none()
+    return (row.earned, row.advances) if row else (0.0, 0.0)
+
+# --- RECONCILIATION ---
+
+def _source_balances(db: Session):
+    """ {employee_id: [earned, advances]} recomputed from trips and advances (two grouped queries). """
+    totals = defaultdict(lambda: [0.0, 0.0])
+    earned = (
+        db.query(models.TripEmployee.employee_id, func.sum(models.TripEmployee.total_earned))
+        .join(models.WorkTrip, models.TripEmployee.trip_id == models.WorkTrip.id)
+        .filter(models.WorkTrip.status == "CLOSED")
+        .group_by(models.TripEmployee.employee_id)
+    )
+    for emp_id, total in earned:
+        totals[emp_id][0] = total or 0.0
+    advances = (
+        db.query(models.Advance.employee_id, func.sum(models.Advance.amount))
+        .filter(models.Advance.is_settled.is_not(True))
+        .group_by(models.Advance.employee_id)
+    )
+    for emp_id, total in advances:
+        totals[emp_id][1] = total or 0.0
+    return totals
+
+def reconcile(db: Session, fix: bool = False, description: str = "Reconciliation") -> dict:
+    """
+    Compares every cached balance with the source tables. With fix=True each mismatch
+    gets an ADJUSTMENT entry for the difference (and is committed), so the journal still
+    explains the final balance.
+    """
+    employees = {emp_id for (emp_id,) in db.query(models.Employee.id)}
+    expected = _source_balances(db)
+    cached = {
+        emp_id: (earned, advances) for emp_id, earned, advances in db.execute(
+            select(models.EmployeeBalance.employee_id, models.EmployeeBalance.earned, models.EmployeeBalance.advances)
+        )
+    }
+
+    mismatches = []
+    for emp_id in sorted(employees):
+        want_earned, want_advances = expected.get(emp_id, (0.0, 0.0))
+        have_earned, have_advances = cached.get(emp_id, (0.0, 0.0))
+        if abs(want_earned - have_earned) > TOLERANCE or abs(want_advances - have_advances) > TOLERANCE:
+            mismatches.append({
+                "employee_id": emp_id,
+                "ledger_earned": have_earned, "expected_earned": want_earned,
+                "ledger_advances": have_advances, "expected_advances": want_advances,
+            })
+
+    if fix and mismatches:
+        post(db, [
+            entry(m["employee_id"], ADJUSTMENT,
+                  earned=m["expected_earned"] - m["ledger_earned"],
+                  advances=m["expected_advances"] - m["ledger_advances"],
+                  description=description)
+            for m in mismatches
+        ])
+        db.commit()
+
+    return {"checked": len(employees), "mismatches": mismatches, "fixed": fix and bool(mismatches)}
+
+def open_balances(db: Session):
+    """ First start with the ledger: seeds every balance from the existing data. """
+    if db.query(models.EmployeeBalance).first() is None:
+        reconcile(db, fix=True, description="Opening balance")
+
+def main():
+    parser = argparse.ArgumentParser(description="Employee balance ledger maintenance.")
+    parser.add_argument("command", choices=["reconcile"])
+    parser.add_argument("--fix", action="store_true", help="Write ADJUSTMENT entries for mismatches")
+    args = parser.parse_args()
+
+    from database import SessionLocal, engine
+    models.Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        result = reconcile(db, fix=args.fix)
+    finally:
+        db.close()
+
+    print(f"{result['checked']} employees checked | {len(result['mismatches'])} mismatches"
+          + (" (fixed)" if result["fixed"] else ""))
+    for m in result["mismatches"]:
+        print(f"  employee {m['employee_id']}: earned {m['ledger_earned']:.2f} -> {m['expected_earned']:.2f}, "
+              f"advances {m['ledger_advances']:.2f} -> {m['expected_advances']:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Live trip feed: small deltas (created / progress / closed) pushed to clients over SSE.
+
+Trip endpoints call `publish()` after their commit. The broker stamps each event with
+its id, serializes it to JSON and sends it through a channel; every worker's listener
+decodes it and hands it to that worker's hub, which fans it out to the open
+/trips/stream connections:
+
+    LIVE_BROKER=local   In-process channel (default). Enough for a single worker, and the
+                        stand-in used in development and tests.
+    LIVE_BROKER=redis   Redis pub/sub on LIVE_CHANNEL (needs the optional `redis`
+                        package and REDIS_URL), so an update made on any worker reaches
+                        clients connected to any other.
+
+Ids are assigned once, at publish time: Redis INCR (shared by every worker), or a
+boot-epoch prefix plus a counter in process. So every worker buffers the same ids, and
+an id from before a restart is simply unknown.
+
+Each subscriber has a bounded queue; a client that falls behind gets a single `resync`
+event (refetch the list) instead of unbounded memory. The last LIVE_REPLAY events are
+kept so a reconnecting EventSource resumes from its Last-Event-ID; an id that isn't in
+the buffer (restart, too old) gets `resync` too.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+import schemas
+
+LIVE_BROKER = os.getenv("LIVE_BROKER", "local")
+LIVE_CHANNEL = os.getenv("LIVE_CHANNEL", "novamanager:trips")
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", 256))
+LIVE_REPLAY = int(os.getenv("LIVE_REPLAY", 200))
+KEEPALIVE_SECONDS = 15
+
+logger = logging.getLogger(__name__)
+
+# --- HUB (fan-out inside this process) ---
+
+class _Subscriber:
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+
+    def offer(self, event):
+        # Runs on the subscriber's event loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"id": event["id"], "type": "resync"})
+
+class Hub:
+    def __init__(self, replay: int = LIVE_REPLAY):
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.recent = deque(maxlen=replay)
+
+    def subscribe(self, last_event_id: str = None):
+        """
+        New subscriber on the running loop, plus the events it missed after last_event_id
+        (or a single resync when that id isn't in the replay buffer).
+        """
+        subscriber = _Subscriber(asyncio.get_running_loop())
+        with self.lock:
+            self.subscribers.add(subscriber)
+            missed = []
+            if last_event_id is not None:
+                ids = [e["id"] for e in self.recent]
+                if last_event_id in ids:
+                    missed = list(self.recent)[ids.index(last_event_id) + 1:]
+                else:
+                    missed = [{"id": ids[-1] if ids else None, "type": "resync"}]
+        return subscriber, missed
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def dispatch(self, event: dict):
+        """ Thread-safe: buffers the (already numbered) event and hands it to every subscriber's loop. """
+        with self.lock:
+            self.recent.append(event)
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, event)
+            except RuntimeError:
+                # Loop already closed (worker shutting down)
+                self.unsubscribe(subscriber)
+
+hub = Hub()
+
+# --- CHANNELS (transport between workers) ---
+
+class MemoryChannel:
+    """
+    In-process channel with the same shape as the Redis one. Several brokers (one per
+    "worker", each with its own hub) can share an instance.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.listeners = []
+        self.epoch = f"{time.time_ns():x}"
+        self.sequence = 0
+
+    def next_id(self) -> str:
+        with self.lock:
+            self.sequence += 1
+            return f"{self.epoch}-{self.sequence}"
+
+    def send(self, raw: str):
+        with self.lock:
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener(raw)
+
+    def listen(self, listener):
+        with self.lock:
+            self.listeners.append(listener)
+
+    def close(self):
+        with self.lock:
+            self.listeners.clear()
+
+class RedisChannel:
+    """ Redis pub/sub; ids from INCR, so every worker sees the same ones. """
+
+    def __init__(self, url: str, channel: str = LIVE_CHANNEL):
+        if redis is None:
+            raise RuntimeError("LIVE_BROKER=redis needs the 'redis' package")
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self.thread = None
+
+    def next_id(self) -> str:
+        return str(self.client.incr(f"{self.channel}:seq"))
+
+    def send(self, raw: str):
+        self.client.publish(self.channel, raw)
+
+    def listen(self, listener):
+        self.pubsub.subscribe(**{self.channel: lambda message: listener(message["data"])})
+        self.thread = self.pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def close(self):
+        if self.thread is not None:
+            self.thread.stop()
+        self.pubsub.close()
+
+# --- BROKER ---
+
+class Broker:
+    """ publish: id -> JSON -> channel; listener: JSON -> this worker's hub. """
+
+    def __init__(self, channel, target: Hub = None):
+        self.channel = channel
+        self.hub = target if target is not None else hub
+        channel.listen(self._on_message)
+
+    def _on_message(self, raw):
+        try:
+            event = json.loads(raw)
+        except (ValueError, TypeError):
+            logger.warning("Ignoring malformed live event")
+            return
+        self.hub.dispatch(event)
+
+    def publish(self, event: dict):
+        self.channel.send(json.dumps({"id": self.channel.next_id(), **event}, default=str))
+
+    def close(self):
+        self.channel.close()
+
+def _make_broker():
+    if LIVE_BROKER == "redis":
+        return Broker(RedisChannel(os.getenv("REDIS_URL", "redis://localhost:6379/0")))
+    if LIVE_BROKER != "local":
+        raise ValueError(f"Invalid LIVE_BROKER: {LIVE_BROKER}")
+    return Broker(MemoryChannel())
+
+_broker = None
+_broker_lock = threading.Lock()
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = _make_broker()
+        return _broker
+
+def set_broker(broker):
+    """ Swaps the broker (e.g. a stand-in); returns the previous one. """
+    global _broker
+    with _broker_lock:
+        previous, _broker = _broker, broker
+    return previous
+
+def shutdown():
+    broker = set_broker(None)
+    if broker is not None:
+        broker.close()
+
+def publish(event: dict):
+    # A feed outage must never fail the write that already committed
+    try:
+        get_broker().publish(event)
+    except Exception:
+        logger.exception("Live event not published")
+
+# --- TRIP EVENTS ---
+
+def trip_created(trip):
+    # The whole trip (crew and materials are a few lines), so clients don't refetch it
+    publish({
+        "type": "created",
+        "trip_id": trip.id,
+        "trip": schemas.WorkTrip.model_validate(trip).model_dump(mode="json"),
+    })
+
+def trip_progress(trip_id: int, assignments):
+    # Only the assignments that changed
+    publish({
+        "type": "progress",
+        "trip_id": trip_id,
+        "assignments": [{"id": a.id, "meters_done": a.meters_done, "total_earned": a.total_earned} for a in assignments],
+    })
+
+def trip_closed(trip):
+    publish({"type": "closed", "trip_id": trip.id, "status": trip.status})
+
+# --- SSE ---
+
+def _format(event: dict) -> str:
+    id_line = f"id: {event['id']}\n" if event["id"] is not None else ""
+    return f"{id_line}event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+async def stream(request, last_event_id=None):
+    """ SSE body for StreamingResponse; ends when the client disconnects. """
+    subscriber, missed = hub.subscribe(last_event_id)
+    try:
+        # Reconnect delay hint for EventSource
+        yield "retry: 3000\n\n"
+        for event in missed:
+            yield _format(event)
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield _format(event)
+    finally:
+        hub.unsubscribe(subscriber)
@@ -1,16 +1,31 @@
-from fastapi import FastAPI, Depends, HTTPException, File, UploadFile
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, Depends, HTTPException, File, UploadFile, Query, Path, Header, Request, Response
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy.sql import func
-from typing import List
+from typing import List, Optional
 from datetime import datetime, timedelta
-import os
-import shutil
+import io
 
 import models, schemas
-import reports
-from database import SessionLocal, engine
+import report_jobs
+import payroll
+import periods
+import exports
+import history
+import trips
+import importer
+import ledger
+import live
+import storage
+import migrations
+import system_config
+import db_config
+from database import SessionLocal, AsyncSessionLocal, engine
 
 import logging
 
@@ -23,6 +38,11 @@ logger = logging.getLogger(__name__)
 
 # Create tables
 models.Base.metadata.create_all(bind=engine)
+migrations.upgrade(engine)
+# create_all skips existing tables, so indexes added later are created here
+for table in models.Base.metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
 
 app = FastAPI(title="NovaManager API")
 
@@ -37,6 +57,10 @@ origins = [
     "https://portfolio-hazel-five-14.vercel.app"
 ]
 
+# Oversized receipts are refused on Content-Length, or cut off while the body arrives,
+# before Starlette spools the multipart body to disk
+app.add_middleware(storage.UploadLimitMiddleware, paths=["/expenses/upload"])
+# Added last so it wraps everything (413s included) with CORS headers
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -45,6 +69,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(periods.PeriodClosedError)
+def period_closed_handler(request, exc: periods.PeriodClosedError):
+    # PERIOD_LOCK_MODE=reject: edits that touch a closed month
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+@app.on_event("shutdown")
+def shutdown_event():
+    report_jobs.shutdown()
+    live.shutdown()
+
 # Startup Event to Seed Categories
 @app.on_event("startup")
 def startup_event():
@@ -73,6 +107,8 @@ def startup_event():
                 db.add(db_cat)
             db.commit()
             logger.info("--- Database Seeded with Default Categories ---")
+        # Databases from before the balance ledger: seed it once from trips / advances
+        ledger.open_balances(db)
     finally:
         db.close()
 
@@ -83,6 +119,23 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    # Async session for read-heavy endpoints: relationships must be eager-loaded
+    # (selectinload) because lazy loads are not allowed under AsyncSession.
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# --- SYSTEM ---
+@app.get("/system/pool-metrics")
+def read_pool_metrics():
+    # Checkout wait times and saturation for the sync and async connection pools
+    return {"pools": db_config.pool_metrics()}
+
+@app.post("/system/ledger/reconcile", response_model=schemas.LedgerReconciliation)
+def reconcile_ledger(fix: bool = False, db: Session = Depends(get_db)):
+    # Verifies cached employee balances against trips / advances; ?fix=true writes ADJUSTMENT entries
+    return ledger.reconcile(db, fix=fix)
+
 # --- CATEGORIES ---
 @app.post("/categories", response_model=schemas.Category)
 def create_category(category: schemas.CategoryCreate, db: Session = Depends(get_db)):
@@ -101,6 +154,7 @@ def reset_database(db: Session = Depends(get_db)):
     # Drop all tables and recreate them
     models.Base.metadata.drop_all(bind=engine)
     models.Base.metadata.create_all(bind=engine)
+    system_config.invalidate()
     # Re-seed categories
     startup_event()
     return {"message": "Database reset successful"}
@@ -131,78 +185,80 @@ def delete_transaction(tx_id: int, db: Session = Depends(get_db)):
 
 # --- DASHBOARD ---
 @app.get("/dashboard-stats")
-def dashboard_stats(db: Session = Depends(get_db)):
-    now = datetime.now()
-    # Start of current month
-    start_of_month = datetime(now.year, now.month, 1)
-    
-    # Get all transactions for this month
-    txs = db.query(models.Transaction).filter(models.Transaction.date >= start_of_month).all()
-    
-    income = sum(t.amount for t in txs if t.type == "INCOME")
-    expenses = sum(t.amount for t in txs if t.type == "EXPENSE")
-    balance = income - expenses
-    
-    # Calculate daily data for chart
-    # Create a dict of days 1..31 initialized to 0
+async def dashboard_stats(year: Optional[int] = None, month: Optional[int] = Query(None, ge=1, le=12),
+                          db: AsyncSession = Depends(get_async_db)):
     import calendar
-    days_in_month = calendar.monthrange(now.year, now.month)[1]
-    daily_data = {day: {"day": day, "income": 0, "expense": 0} for day in range(1, days_in_month + 1)}
-    
-    for t in txs:
-        day = t.date.day
-        if t.type == "INCOME":
-            daily_data[day]["income"] += t.amount
-        elif t.type == "EXPENSE":
-            daily_data[day]["expense"] += t.amount
-            
-    # Convert to list sorted by day
-    chart_data = [daily_data[day] for day in sorted(daily_data.keys())]
+    now = datetime.now()
+    year = year or now.year
+    month = month or now.month
+    start_of_month = datetime(year, month, 1)
+    days_in_month = calendar.monthrange(year, month)[1]
+
+    # Closed months come straight from their snapshot
+    snapshot = await db.run_sync(periods.get_snapshot, year, month)
+    if snapshot:
+        income, expenses, chart_data = snapshot.income, snapshot.expenses, snapshot.daily
+    else:
+        # One row per (day, type) instead of every transaction of the month
+        result = await db.execute(periods.daily_totals_query(start_of_month, start_of_month + timedelta(days=days_in_month)))
+        income, expenses, chart_data = periods.fold_daily_totals(result.all(), days_in_month)
 
     return {
         "income": income,
         "expenses": expenses,
-        "balance": balance,
-        "month": now.strftime("%B"),
+        "balance": income - expenses,
+        "month": start_of_month.strftime("%B"),
         "chart_data": chart_data
     }
 
 # --- REPORTS ---
+# Rendering runs in report_jobs' process pool and finished files are cached per data version,
+# so these downloads only cost the queries (or nothing, on a cache hit).
+def _submit_report_job(report_type: str, year: int, month: int):
+    db = SessionLocal()
+    try:
+        return report_jobs.submit(db, report_type, year, month)
+    finally:
+        db.close()
+
+async def _serve_report(report_type: str, year: int, month: int):
+    # Waits REPORT_WAIT_SECONDS at most; a longer render answers 202 with the job,
+    # to be followed at /reports/jobs/{id} and fetched from its /download
+    job = await run_in_threadpool(_submit_report_job, report_type, year, month)
+    job = await report_jobs.wait(job["id"])
+    if job["status"] in report_jobs.UNFINISHED:
+        return JSONResponse(
+            status_code=202,
+            content=schemas.ReportJob.model_validate(job).model_dump(mode="json"),
+            headers={"Location": f"/reports/jobs/{job['id']}"},
+        )
+    if job["status"] != "done":
+        raise HTTPException(status_code=500, detail=f"Report generation failed: {job['error'] or job['status']}")
+    return FileResponse(job["path"], filename=job["filename"], media_type="application/pdf")
+
 @app.get("/reports/monthly")
-def download_monthly_report(year: int, month: int, db: Session = Depends(get_db)):
-    import calendar
-    # 1. Fetch transactions for the month
-    start_date = datetime(year, month, 1)
-    days_in_month = calendar.monthrange(year, month)[1]
-    end_date = datetime(year, month, days_in_month, 23, 59, 59)
-    
-    txs = db.query(models.Transaction).filter(
-        models.Transaction.date >= start_date, 
-        models.Transaction.date <= end_date
-    ).order_by(models.Transaction.date.asc()).all()
-    
-    # 2. Calculate stats
-    income = sum(t.amount for t in txs if t.type == "INCOME")
-    expenses = sum(t.amount for t in txs if t.type == "EXPENSE")
-    balance = income - expenses
-    
-    # Simple Spanish Month Mapping
-    spanish_months = {
-        1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril", 5: "Mayo", 6: "Junio",
-        7: "Julio", 8: "Agosto", 9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
-    }
-    month_str = f"{spanish_months.get(month, 'Desconocido')} {year}"
-    
-    # 3. Generate PDF
-    pdf_buffer = reports.generate_monthly_pdf(month_str, income, expenses, balance, txs)
-    
-    # 4. Return StreamingResponse
-    filename = f"Reporte_{month}_{year}.pdf"
-    return StreamingResponse(
-        pdf_buffer, 
-        media_type="application/pdf", 
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
+async def download_monthly_report(year: int, month: int = Query(..., ge=1, le=12)):
+    return await _serve_report("monthly", year, month)
+
+@app.post("/reports/jobs", response_model=schemas.ReportJob)
+def create_report_job(job: schemas.ReportJobCreate, db: Session = Depends(get_db)):
+    return report_jobs.submit(db, job.report_type, job.year, job.month)
+
+@app.get("/reports/jobs/{job_id}", response_model=schemas.ReportJob)
+def read_report_job(job_id: str):
+    job = report_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
+@app.get("/reports/jobs/{job_id}/download")
+def download_report_job(job_id: str):
+    job = report_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Report job is {job['status']}")
+    return FileResponse(job["path"], filename=job["filename"], media_type="application/pdf")
 
 # --- STOCK ---
 @app.post("/stock", response_model=schemas.StockItem)
@@ -245,8 +301,49 @@ def create_stock_item(item: schemas.StockItemCreate, db: Session = Depends(get_d
     return db_item
 
 @app.get("/stock", response_model=List[schemas.StockItem])
-def read_stock(db: Session = Depends(get_db)):
-    return db.query(models.StockItem).order_by(models.StockItem.purchase_date.desc()).all()
+async def read_stock(db: AsyncSession = Depends(get_async_db)):
+    # Full items with every usage; list views should prefer /stock/summary
+    result = await db.execute(
+        select(models.StockItem)
+        .options(selectinload(models.StockItem.usages))
+        .order_by(models.StockItem.purchase_date.desc())
+    )
+    return result.scalars().all()
+
+@app.get("/stock/summary", response_model=List[schemas.StockItemSummary])
+async def read_stock_summary(db: AsyncSession = Depends(get_async_db)):
+    # Column-only projection; usage history is reduced to count / quantity / last date in SQL
+    usage = (
+        select(models.MaterialUsage.stock_item_id,
+               func.count(models.MaterialUsage.id).label("usage_count"),
+               func.sum(models.MaterialUsage.quantity).label("used_quantity"),
+               func.max(models.MaterialUsage.date).label("last_used_at"))
+        .group_by(models.MaterialUsage.stock_item_id)
+        .subquery()
+    )
+    item = models.StockItem
+    result = await db.execute(
+        select(item.id, item.name, item.cost_amount, item.initial_quantity, item.quantity, item.unit_cost,
+               item.purchase_date, item.status,
+               func.coalesce(usage.c.usage_count, 0).label("usage_count"),
+               func.coalesce(usage.c.used_quantity, 0.0).label("used_quantity"),
+               usage.c.last_used_at)
+        .outerjoin(usage, usage.c.stock_item_id == item.id)
+        .order_by(item.purchase_date.desc())
+    )
+    return result.mappings().all()
+
+@app.get("/stock/{item_id}", response_model=schemas.StockItem)
+async def read_stock_item(item_id: int, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(
+        select(models.StockItem)
+        .options(selectinload(models.StockItem.usages))
+        .where(models.StockItem.id == item_id)
+    )
+    db_item = result.scalar()
+    if not db_item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return db_item
 
 @app.put("/stock/{item_id}/sell", response_model=schemas.StockItem)
 def sell_stock_item(item_id: int, sale_data: schemas.StockItemSell, db: Session = Depends(get_db)):
@@ -334,8 +431,15 @@ def create_employee_group(group: schemas.EmployeeGroupCreate, db: Session = Depe
     return db_group
 
 @app.get("/employee-groups", response_model=List[schemas.EmployeeGroup])
-def read_employee_groups(db: Session = Depends(get_db)):
-    return db.query(models.EmployeeGroup).all()
+async def read_employee_groups(db: AsyncSession = Depends(get_async_db)):
+    employees = selectinload(models.EmployeeGroup.employees)
+    result = await db.execute(
+        select(models.EmployeeGroup).options(
+            employees.selectinload(models.Employee.records),
+            employees.selectinload(models.Employee.advances),
+        )
+    )
+    return result.scalars().all()
 
 @app.post("/employees", response_model=schemas.Employee)
 def create_employee(emp: schemas.EmployeeCreate, db: Session = Depends(get_db)):
@@ -346,8 +450,13 @@ def create_employee(emp: schemas.EmployeeCreate, db: Session = Depends(get_db)):
     return db_emp
 
 @app.get("/employees", response_model=List[schemas.Employee])
-def read_employees(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return db.query(models.Employee).offset(skip).limit(limit).all()
+async def read_employees(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(
+        select(models.Employee)
+        .options(selectinload(models.Employee.records), selectinload(models.Employee.advances))
+        .offset(skip).limit(limit)
+    )
+    return result.scalars().all()
 
 
 @app.delete("/employees/{emp_id}")
@@ -366,32 +475,35 @@ def add_payroll_record(empid: int, rec: schemas.EmployeeRecordBase, db: Session
         raise HTTPException(status_code=404, detail="Employee not found")
     
     # 1. Calculate Gross Total (Production value)
-    # Get Current Price
-    price_config = db.query(models.SystemConfig).filter(models.SystemConfig.key == "meter_price").first()
-    try:
-        current_price = float(price_config.value) if price_config and price_config.value else 0.0
-    except ValueError:
-        current_price = 0.0
+    # Get Current Price (cached, see system_config.py)
+    current_price = system_config.meter_price(db)
 
     gross_total = rec.meters * current_price
     
     # 2. Settle advances based on production
-    pending_advances = sorted([a for a in db_emp.advances if not a.is_settled], key=lambda x: x.date)
-    total_pending = sum(a.amount for a in pending_advances)
+    # Pending total comes from the ledger; only unsettled advances are read, oldest first
+    _, total_pending = ledger.get_balance(db, empid)
+    pending_advances = db.query(models.Advance).filter(
+        models.Advance.employee_id == empid,
+        models.Advance.is_settled.is_not(True)
+    ).order_by(models.Advance.date, models.Advance.id)
     
     # Calculate Net Total (Cash that MUST be paid today)
     net_total = max(0, gross_total - total_pending)
     
     # Update advances to settled if they are covered by the work
     running_gross = gross_total
+    settled = []
     for a in pending_advances:
         if running_gross >= a.amount:
             a.is_settled = True
             running_gross -= a.amount
+            settled.append(ledger.entry(empid, ledger.ADVANCE_SETTLED, advances=-a.amount, ref_id=a.id))
         else:
             # Partial settlement not supported in current model
             # Advance stays pending if not fully covered
             break
+    ledger.post(db, settled)
     
     # 3. Create Payroll Record
     db_rec = models.PayrollRecord(
@@ -471,87 +583,145 @@ def add_employee_advance(empid: int, adv: schemas.AdvanceCreate, db: Session = D
     db.flush()
     
     db_adv.transaction_id = tx.id
+    ledger.post(db, [ledger.entry(empid, ledger.ADVANCE, advances=db_adv.amount, ref_id=db_adv.id)])
     db.commit()
     db.refresh(db_adv)
     return db_adv
 
 @app.get("/employees/{empid}/history", response_model=schemas.EmployeeHistory)
-def get_employee_history(empid: int, db: Session = Depends(get_db)):
+def get_employee_history(
+    empid: int,
+    limit: int = Query(history.HISTORY_PAGE_SIZE, ge=1, le=500),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Balances plus the newest page of each section (optionally within [start, end)).
+    Older rows: GET /employees/{empid}/history/{section}?cursor=<next_cursors[section]>
+    """
     db_emp = db.query(models.Employee).filter(models.Employee.id == empid).first()
     if not db_emp:
         raise HTTPException(status_code=404, detail="Employee not found")
-    
-    # 1. Fetch Trip Assignments (New System)
-    trip_assigns = db.query(models.TripEmployee).join(models.WorkTrip).filter(
-        models.TripEmployee.employee_id == empid,
-        models.WorkTrip.status == "CLOSED" # Only count closed/confirmed trips
-    ).all()
-    
-    history_trips = []
-    total_earned = 0.0
-    for ta in trip_assigns:
-        total_earned += ta.total_earned
-        history_trips.append({
-            "trip_id": ta.trip.id,
-            "date": ta.trip.date,
-            "trip_description": ta.trip.description,
-            "meters_done": ta.meters_done,
-            "historical_price": ta.historical_price,
-            "total_earned": ta.total_earned
-        })
-        
-    # 2. Fetch Attendance Log
-    attendance = db.query(models.DailyAttendance).filter(
-        models.DailyAttendance.employee_id == empid
-    ).order_by(models.DailyAttendance.date.desc()).limit(60).all() # Last 60 days
-    
-    # 3. Calculate Advances (Legacy + New)
-    total_advances = sum(a.amount for a in db_emp.advances if not a.is_settled)
-    
+
+    sections, next_cursors = {}, {}
+    for section in history.SECTIONS:
+        sections[section], next_cursors[section] = history.get_page(db, empid, section, limit=limit, start=start, end=end)
+
+    # Earned on closed trips and pending advances, from the cached ledger balance
+    total_earned, total_advances = ledger.get_balance(db, empid)
+
     return {
         "employee_id": db_emp.id,
         "name": db_emp.name,
-        "records": db_emp.records,
-        "advances": db_emp.advances,
-        "material_usages": db_emp.material_usages,
-        
-        "trip_assignments": history_trips,
-        "attendance_log": attendance,
-        
+        **sections,
         "balance_earned": total_earned,
         "balance_advances": total_advances,
-        "net_payable": total_earned - total_advances
+        "net_payable": total_earned - total_advances,
+        "next_cursors": next_cursors,
     }
 
+@app.get("/employees/{empid}/balance", response_model=schemas.EmployeeBalance)
+def get_employee_balance(empid: int, db: Session = Depends(get_db)):
+    if db.get(models.Employee, empid) is None:
+        raise HTTPException(status_code=404, detail="Employee not found")
+    earned, advances = ledger.get_balance(db, empid)
+    return {"employee_id": empid, "balance_earned": earned, "balance_advances": advances,
+            "net_payable": earned - advances}
+
+@app.get("/employees/{empid}/history/{section}", response_model=schemas.HistoryPage)
+def get_employee_history_page(
+    empid: int,
+    section: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(history.HISTORY_PAGE_SIZE, ge=1, le=500),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    if section not in history.SECTIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown section. Available: {', '.join(history.SECTIONS)}")
+    if db.get(models.Employee, empid) is None:
+        raise HTTPException(status_code=404, detail="Employee not found")
+    try:
+        items, next_cursor = history.get_page(db, empid, section, cursor=cursor, limit=limit, start=start, end=end)
+    except history.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"section": section, "items": items, "next_cursor": next_cursor}
+
 @app.get("/calendar/events")
-def get_calendar_events(month: int = None, year: int = None, db: Session = Depends(get_db)):
+def get_calendar_events(
+    request: Request,
+    response: Response,
+    month: Optional[int] = Query(None, ge=1, le=12),
+    year: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
     """
     Returns finalized trips formatted for calendar view.
+    Window: ?start=&end= (week / agenda views, end exclusive), else ?month=&year= or ?year=.
+    Without any of them, every closed trip (legacy behaviour).
     """
-    query = db.query(models.WorkTrip).filter(models.WorkTrip.status == "CLOSED")
-         
-    trips = query.all()
-    events = []
-    
-    for t in trips:
-        # Calculate totals for summary
-        total_meters = sum(a.meters_done for a in t.assignments)
-        total_materials = len(t.materials)
-        
-        events.append({
-            "id": t.id,
-            "title": t.description,
-            "start": t.date,
-            "end": t.date,
+    if start is None and end is None and (month or year):
+        year = year or datetime.now().year
+        start, end = periods.month_range(year, month) if month else (datetime(year, 1, 1), datetime(year + 1, 1, 1))
+
+    # Trips carry their period's data version, so unchanged months answer 304 without aggregating
+    etag = f'W/"cal-{periods.versions_fingerprint(db, start, end)[:20]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    window = [models.WorkTrip.status == "CLOSED"]
+    if start is not None:
+        window.append(models.WorkTrip.date >= start)
+    if end is not None:
+        window.append(models.WorkTrip.date < end)
+    trip_ids = select(models.WorkTrip.id).where(*window)
+
+    # Totals per trip from grouped subqueries, restricted to the window's trips
+    crew = (
+        select(models.TripEmployee.trip_id,
+               func.sum(models.TripEmployee.meters_done).label("meters"),
+               func.count(models.TripEmployee.id).label("driver_count"))
+        .where(models.TripEmployee.trip_id.in_(trip_ids))
+        .group_by(models.TripEmployee.trip_id)
+        .subquery()
+    )
+    materials = (
+        select(models.TripMaterial.trip_id, func.count(models.TripMaterial.id).label("materials_count"))
+        .where(models.TripMaterial.trip_id.in_(trip_ids))
+        .group_by(models.TripMaterial.trip_id)
+        .subquery()
+    )
+    rows = db.execute(
+        select(models.WorkTrip.id, models.WorkTrip.description, models.WorkTrip.date,
+               func.coalesce(crew.c.meters, 0.0), func.coalesce(crew.c.driver_count, 0),
+               func.coalesce(materials.c.materials_count, 0))
+        .outerjoin(crew, crew.c.trip_id == models.WorkTrip.id)
+        .outerjoin(materials, materials.c.trip_id == models.WorkTrip.id)
+        .where(*window)
+        .order_by(models.WorkTrip.date, models.WorkTrip.id)
+    )
+
+    return [
+        {
+            "id": trip_id,
+            "title": description,
+            "start": date,
+            "end": date,
             "allDay": True,
             "extendedProps": {
-                "meters": total_meters,
-                "driver_count": len(t.assignments),
-                "materials_count": total_materials
+                "meters": meters,
+                "driver_count": driver_count,
+                "materials_count": materials_count
             }
-        })
-        
-    return events
+        }
+        for trip_id, description, date, meters, driver_count, materials_count in rows
+    ]
 
 # --- NOVA MANAGER 2.0 ENDPOINTS ---
 
@@ -564,18 +734,21 @@ def get_system_config(key: str, db: Session = Depends(get_db)):
         return schemas.SystemConfig(key=key, value="0", updated_at=datetime.now())
     return config
 
+@app.get("/config/{key}/history", response_model=List[schemas.ConfigHistory])
+def get_system_config_history(key: str, db: Session = Depends(get_db)):
+    return db.query(models.ConfigHistory).filter(models.ConfigHistory.key == key).order_by(
+        models.ConfigHistory.valid_from.desc(), models.ConfigHistory.id.desc()
+    ).all()
+
+@app.get("/config/{key}/at")
+def get_system_config_at(key: str, date: datetime, db: Session = Depends(get_db)):
+    # Value in force on that date (e.g. the meter price of a past trip), from the cached history
+    return {"key": key, "date": date, "value": system_config.value_at(db, key, date)}
+
 @app.post("/config", response_model=schemas.SystemConfig)
 def set_system_config(config: schemas.SystemConfigBase, db: Session = Depends(get_db)):
-    db_config = db.query(models.SystemConfig).filter(models.SystemConfig.key == config.key).first()
-    if db_config:
-        db_config.value = config.value
-    else:
-        db_config = models.SystemConfig(key=config.key, value=config.value)
-        db.add(db_config)
-    
-    db.commit()
-    db.refresh(db_config)
-    return db_config
+    # Also records the change in the history and invalidates every worker's cached copy
+    return system_config.set_value(db, config.key, config.value)
 
 # 2. Daily Attendance
 @app.post("/attendance/bulk", response_model=List[schemas.DailyAttendance])
@@ -583,39 +756,34 @@ def save_daily_attendance(attendances: List[schemas.DailyAttendanceCreate], db:
     """
     Recibe una lista de estados (Presente/Ausente) para una fecha.
     Realiza UPSERT: Si ya existe registro para ese empleado y fecha, actualiza. Si no, crea.
+    Todo en un solo INSERT ... ON CONFLICT (employee_id, day) DO UPDATE ... RETURNING.
     """
-    saved_records = []
-    
+    # One row per (employee, day); if the list repeats one, the last state wins
+    rows = {}
     for item in attendances:
         # Default date to Today if not provided
         target_date = item.date or datetime.now()
-        start_of_day = datetime(target_date.year, target_date.month, target_date.day)
-        end_of_day = start_of_day + timedelta(days=1)
-        
-        # Check existing record for this day
-        existing = db.query(models.DailyAttendance).filter(
-            models.DailyAttendance.employee_id == item.employee_id,
-            models.DailyAttendance.date >= start_of_day,
-            models.DailyAttendance.date < end_of_day
-        ).first()
-        
-        if existing:
-            existing.is_present = item.is_present
-            saved_records.append(existing)
-        else:
-            new_record = models.DailyAttendance(
-                employee_id=item.employee_id,
-                is_present=item.is_present,
-                date=target_date
-            )
-            db.add(new_record)
-            saved_records.append(new_record)
-    
+        rows[(item.employee_id, target_date.date())] = {
+            "employee_id": item.employee_id,
+            "is_present": item.is_present,
+            "date": target_date,
+            "day": target_date.date(),
+        }
+    if not rows:
+        return []
+
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    table = models.DailyAttendance.__table__
+    stmt = dialect.insert(table).values(list(rows.values()))
+    # An existing record keeps its original timestamp, only the state changes
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.employee_id, table.c.day],
+        set_={"is_present": stmt.excluded.is_present},
+    ).returning(table.c.id, table.c.employee_id, table.c.is_present, table.c.date, table.c.day)
+
+    saved = {(r.employee_id, r.day): r for r in db.execute(stmt)}
     db.commit()
-    # Refresh all to get IDs
-    for r in saved_records:
-        db.refresh(r)
-    return saved_records
+    return [saved[key] for key in rows]
 
 @app.get("/attendance/{date_str}", response_model=List[schemas.DailyAttendance])
 def get_daily_attendance(date_str: str, db: Session = Depends(get_db)):
@@ -628,12 +796,8 @@ def get_daily_attendance(date_str: str, db: Session = Depends(get_db)):
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
         
-    start_of_day = datetime(target_date.year, target_date.month, target_date.day)
-    end_of_day = start_of_day + timedelta(days=1)
-    
     records = db.query(models.DailyAttendance).filter(
-        models.DailyAttendance.date >= start_of_day,
-        models.DailyAttendance.date < end_of_day
+        models.DailyAttendance.day == target_date.date()
     ).all()
     
     return records
@@ -682,114 +846,132 @@ def register_vehicle_service(vehicle_id: int, db: Session = Depends(get_db)):
 # 3. Work Trips (Salida)
 @app.post("/trips", response_model=schemas.WorkTrip)
 def create_work_trip(trip: schemas.WorkTripCreate, db: Session = Depends(get_db)):
-    # 1. Get Current Meter Price Global
-    price_config = db.query(models.SystemConfig).filter(models.SystemConfig.key == "meter_price").first()
-    try:
-        current_price = float(price_config.value) if price_config and price_config.value else 0.0
-    except ValueError:
-        current_price = 0.0
-    
-    # 2. Link Vehicle if provided
-    if trip.vehicle_id:
-        vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == trip.vehicle_id).first()
-        if vehicle and vehicle.status != "OPERATIONAL":
-            pass # Warning? For now allow but maybe visually flag
-    
-    # 3. Create the Trip Header
-    db_trip = models.WorkTrip(
-        date=trip.date or datetime.now(),
-        description=trip.description,
-        status="OPEN",
-        vehicle_id=trip.vehicle_id,
-        destination_lat=trip.destination_lat,
-        destination_lng=trip.destination_lng
-    )
-    db.add(db_trip)
-    db.flush() # Get ID
-    
-    # 3. Assign Assignments (People)
-    for emp in trip.employees:
-        db_assign = models.TripEmployee(
-            trip_id=db_trip.id,
-            employee_id=emp.employee_id,
-            is_present=emp.is_present,
-            historical_price=current_price, # Snapshot Price
-            meters_done=0.0,
-            total_earned=0.0
-        )
-        db.add(db_assign)
-        
-    # 4. Assign Materials (Logistics)
-    for mat in trip.materials:
-        # Check Stock availability (Optional: Allow negative if urgent?)
-        # For now, we just record "Llevado - quantity_out"
-        db_mat = models.TripMaterial(
-            trip_id=db_trip.id,
-            stock_item_id=mat.stock_item_id,
-            quantity_out=mat.quantity_out,
-            quantity_returned=0.0,
-            quantity_used=0.0 
-        )
-        db.add(db_mat)
-        
-        # Deduct temporary stock? 
-        # Strategy: We deduct it from Main Stock immediately. 
-        # When returning, we add back the *returned* amount. 
-        # Then the net result is correct (Main - Out + Returned = Main - Used).
-        stock_item = db.query(models.StockItem).filter(models.StockItem.id == mat.stock_item_id).first()
-        if stock_item:
-            stock_item.quantity -= mat.quantity_out
-    
+    # Crew and materials are inserted with the trip; loaded stock is deducted right away
+    # (Main - Out + Returned = Main - Used once the trip is closed)
+    db_trip, = trips.create_trips(db, [trip])
     db.commit()
-    db.refresh(db_trip)
+    db_trip = trips.load_trips(db, [db_trip.id])[db_trip.id]
+    live.trip_created(db_trip)
     return db_trip
 
 @app.get("/trips", response_model=List[schemas.WorkTrip])
-def get_work_trips(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    return db.query(models.WorkTrip).order_by(models.WorkTrip.date.desc()).offset(skip).limit(limit).all()
+async def get_work_trips(skip: int = 0, limit: int = 50, db: AsyncSession = Depends(get_async_db)):
+    # Full trips with crew and materials; list views should prefer /trips/summary
+    result = await db.execute(
+        select(models.WorkTrip)
+        .options(
+            selectinload(models.WorkTrip.vehicle),
+            selectinload(models.WorkTrip.assignments),
+            selectinload(models.WorkTrip.materials),
+        )
+        .order_by(models.WorkTrip.date.desc()).offset(skip).limit(limit)
+    )
+    return result.scalars().all()
+
+@app.get("/trips/summary", response_model=List[schemas.TripSummary])
+async def get_work_trips_summary(skip: int = 0, limit: int = 50, status: Optional[str] = None,
+                                 db: AsyncSession = Depends(get_async_db)):
+    # One row per trip: columns, vehicle name and crew / material aggregates, in one query
+    page = select(models.WorkTrip.id)
+    if status:
+        page = page.where(models.WorkTrip.status == status)
+    page = page.order_by(models.WorkTrip.date.desc(), models.WorkTrip.id.desc()).offset(skip).limit(limit)
+
+    crew = (
+        select(models.TripEmployee.trip_id,
+               func.count(models.TripEmployee.id).label("employee_count"),
+               func.sum(models.TripEmployee.meters_done).label("total_meters"),
+               func.sum(models.TripEmployee.total_earned).label("total_earned"))
+        .where(models.TripEmployee.trip_id.in_(page))
+        .group_by(models.TripEmployee.trip_id)
+        .subquery()
+    )
+    materials = (
+        select(models.TripMaterial.trip_id, func.count(models.TripMaterial.id).label("material_count"))
+        .where(models.TripMaterial.trip_id.in_(page))
+        .group_by(models.TripMaterial.trip_id)
+        .subquery()
+    )
+    trip = models.WorkTrip
+    result = await db.execute(
+        select(trip.id, trip.date, trip.description, trip.status, trip.vehicle_id,
+               models.Vehicle.name.label("vehicle_name"), trip.destination_lat, trip.destination_lng,
+               func.coalesce(crew.c.employee_count, 0).label("employee_count"),
+               func.coalesce(materials.c.material_count, 0).label("material_count"),
+               func.coalesce(crew.c.total_meters, 0.0).label("total_meters"),
+               func.coalesce(crew.c.total_earned, 0.0).label("total_earned"))
+        .outerjoin(models.Vehicle, trip.vehicle_id == models.Vehicle.id)
+        .outerjoin(crew, crew.c.trip_id == trip.id)
+        .outerjoin(materials, materials.c.trip_id == trip.id)
+        .where(trip.id.in_(page))
+        .order_by(trip.date.desc(), trip.id.desc())
+    )
+    return result.mappings().all()
+
+@app.get("/trips/stream")
+async def stream_trips(request: Request, last_event_id: Optional[str] = Header(None)):
+    """
+    Server-sent events with trip deltas: `created` (summary row), `progress` (changed
+    assignments), `closed`, and `resync` when the client should refetch /trips.
+    """
+    return StreamingResponse(
+        live.stream(request, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/trips/{trip_id}", response_model=schemas.WorkTrip)
+async def get_work_trip(trip_id: int, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(
+        select(models.WorkTrip)
+        .options(
+            selectinload(models.WorkTrip.vehicle),
+            selectinload(models.WorkTrip.assignments),
+            selectinload(models.WorkTrip.materials),
+        )
+        .where(models.WorkTrip.id == trip_id)
+    )
+    trip = result.scalar()
+    if not trip:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    return trip
 
 @app.post("/trips/{trip_id}/close", response_model=schemas.WorkTrip)
 def close_work_trip(trip_id: int, close_data: schemas.TripCloseRequest, db: Session = Depends(get_db)):
-    # 1. Get Trip
-    trip = db.query(models.WorkTrip).filter(models.WorkTrip.id == trip_id).first()
-    if not trip:
+    try:
+        trips.close_trips(db, [(trip_id, close_data)])
+    except trips.TripNotFound:
         raise HTTPException(status_code=404, detail="Trip not found")
-    if trip.status == "CLOSED":
+    except trips.TripAlreadyClosed:
         raise HTTPException(status_code=400, detail="Trip already closed")
-
-    # 2. Get Current Price for Snapshot
-    price_config = db.query(models.SystemConfig).filter(models.SystemConfig.key == "meter_price").first()
-    current_price = float(price_config.value) if price_config else 0.0
-
-    # 3. Process Materials (Logistics) - Add back returned stock
-    for mat_update in close_data.materials:
-        # Find the trip_material record
-        tm = next((m for m in trip.materials if m.id == mat_update.id), None)
-        if tm:
-            tm.quantity_returned = mat_update.quantity_returned
-            tm.quantity_used = max(0, tm.quantity_out - tm.quantity_returned)
-            
-            # Restore stock
-            if tm.stock_item:
-                 tm.stock_item.quantity += tm.quantity_returned
-    
-    # 4. Process Employees (Payroll) - Calculate earnings
-    for emp_update in close_data.employees:
-        te = next((e for e in trip.assignments if e.id == emp_update.id), None)
-        if te:
-            te.meters_done = emp_update.meters_done
-            te.historical_price = current_price
-            te.total_earned = te.meters_done * current_price
-            
-            # FUTURE: Here we could automatically create 'PayrollRecord' to sync with legacy system
-            # but for now we keep it separate as requested in architecture plan.
-
-    # 5. Close Trip
-    trip.status = "CLOSED"
     db.commit()
-    db.refresh(trip)
+    trip = trips.load_trips(db, [trip_id])[trip_id]
+    live.trip_closed(trip)
     return trip
 
+@app.post("/trips/batch", response_model=schemas.TripBatchResult)
+def batch_trips(batch: schemas.TripBatchRequest, db: Session = Depends(get_db)):
+    """
+    Creates and closes many trips in one transaction (end-of-day crew closes).
+    Any unknown or already closed trip rejects the whole batch.
+    """
+    try:
+        closed = trips.close_trips(db, [(c.trip_id, c) for c in batch.close])
+    except trips.TripNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except trips.TripAlreadyClosed as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    created = trips.create_trips(db, batch.create)
+    created_ids, closed_ids = [t.id for t in created], [t.id for t in closed]
+    db.commit()
+
+    loaded = trips.load_trips(db, created_ids + closed_ids)
+    for trip_id in closed_ids:
+        live.trip_closed(loaded[trip_id])
+    for trip_id in created_ids:
+        live.trip_created(loaded[trip_id])
+    return {"created": [loaded[i] for i in created_ids], "closed": [loaded[i] for i in closed_ids]}
+
 @app.put("/trips/{trip_id}/progress", response_model=schemas.WorkTrip)
 def update_trip_progress(trip_id: int, progress_data: schemas.TripCloseRequest, db: Session = Depends(get_db)):
     # 1. Get Trip
@@ -800,20 +982,25 @@ def update_trip_progress(trip_id: int, progress_data: schemas.TripCloseRequest,
         raise HTTPException(status_code=400, detail="Trip already closed")
 
     # 2. Get Current Price (for estimation display, though realized on close)
-    price_config = db.query(models.SystemConfig).filter(models.SystemConfig.key == "meter_price").first()
-    current_price = float(price_config.value) if price_config else 0.0
+    current_price = system_config.meter_price(db)
 
     # 3. Process Employees (Update Meters & Potential Earnings)
+    assignments = {te.id: te for te in trip.assignments}
+    changed = {}
     for emp_update in progress_data.employees:
-        te = next((e for e in trip.assignments if e.id == emp_update.id), None)
+        te = assignments.get(emp_update.id)
         if te:
             te.meters_done = emp_update.meters_done
             # We update the potential earnings display, but actual financial record is on Close
             te.total_earned = te.meters_done * current_price
+            changed[te.id] = te
 
     # 4. Save (Status remains OPEN)
     db.commit()
     db.refresh(trip)
+    # Live clients get only the assignments that moved
+    if changed:
+        live.trip_progress(trip.id, changed.values())
     return trip
 
 # --- ARCA - ADMINISTRATION & REPORTS ---
@@ -826,23 +1013,19 @@ async def upload_expense(
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
-    # 1. Create Directory Structure: storage/comprobantes/YYYY/MM
     expense_date = datetime.strptime(date, "%Y-%m-%d") if date else datetime.now()
-    year_str = expense_date.strftime("%Y")
-    month_str = expense_date.strftime("%m")
-    
-    upload_dir = f"storage/comprobantes/{year_str}/{month_str}"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    # 2. Save File
     file_ext = file.filename.split('.')[-1]
-    safe_filename = f"{int(datetime.now().timestamp())}_{file.filename.replace(' ', '_')}"
-    file_path = f"{upload_dir}/{safe_filename}"
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
-    # 3. Create DB Record
+
+    # 1. Stream to the content-addressed store (off the event loop; duplicates stored once)
+    try:
+        stored = await storage.save_upload(file)
+    except storage.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except storage.EmptyUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    file_path = stored.path
+
+    # 2. Create DB Record
     db_doc = models.ExpenseDocument(
         description=description,
         amount=amount,
@@ -872,6 +1055,67 @@ def get_expenses(month: int = None, year: int = None, db: Session = Depends(get_
         
     return query.order_by(models.ExpenseDocument.date.desc()).all()
 
+# --- BULK IMPORT ---
+@app.post("/import/{kind}", response_model=schemas.ImportReport)
+def bulk_import(kind: str, file: UploadFile = File(...), dry_run: bool = False, db: Session = Depends(get_db)):
+    # CSV or JSONL (by file extension); bad rows are reported, not fatal
+    if kind not in importer.IMPORTERS:
+        raise HTTPException(status_code=404, detail=f"Unknown import. Available: {', '.join(importer.IMPORTERS)}")
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    rows = importer.read_rows(stream, importer.detect_format(file.filename or ""))
+    return importer.run_import(db, kind, rows, dry_run=dry_run)
+
+# --- EXPORTS ---
+@app.get("/exports/{dataset}")
+def export_dataset(dataset: str, format: str = "csv", start: Optional[datetime] = None, end: Optional[datetime] = None):
+    # Streams the whole ledger (optionally a [start, end) date range) for BI tools
+    if dataset not in exports.DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset. Available: {', '.join(exports.DATASETS)}")
+    if format not in exports.FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or parquet")
+    if format == "parquet" and not exports.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+
+    media_type, extension = exports.FORMATS[format]
+    return StreamingResponse(
+        exports.stream_export(dataset, format, start, end),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={dataset}.{extension}"}
+    )
+
+# --- PERIOD CLOSE ---
+def _period_view(db: Session, snapshot: models.PeriodSnapshot) -> dict:
+    view = schemas.PeriodSnapshot.model_validate(snapshot).model_dump()
+    view["status"] = periods.snapshot_status(db, snapshot)
+    return view
+
+@app.get("/periods", response_model=List[schemas.PeriodSnapshot])
+def read_periods(db: Session = Depends(get_db)):
+    snapshots = db.query(models.PeriodSnapshot).order_by(models.PeriodSnapshot.period.desc()).all()
+    return [_period_view(db, snap) for snap in snapshots]
+
+@app.get("/periods/{year}/{month}", response_model=schemas.PeriodSnapshot)
+def read_period(year: int, month: int, db: Session = Depends(get_db)):
+    snapshot = db.get(models.PeriodSnapshot, periods.period_key(year, month))
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="Period is not closed")
+    return _period_view(db, snapshot)
+
+@app.post("/periods/{year}/{month}/close", response_model=schemas.PeriodSnapshot)
+def close_period(year: int, month: int = Path(..., ge=1, le=12), db: Session = Depends(get_db)):
+    # Closing an already closed (or stale) period refreshes its snapshot
+    try:
+        snapshot = periods.close_period(db, year, month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _period_view(db, snapshot)
+
+@app.delete("/periods/{year}/{month}/close")
+def reopen_period(year: int, month: int, db: Session = Depends(get_db)):
+    if not periods.reopen_period(db, year, month):
+        raise HTTPException(status_code=404, detail="Period is not closed")
+    return {"ok": True}
+
 @app.get("/finances/summary")
 def get_financial_summary(month: int = None, year: int = None, db: Session = Depends(get_db)):
     # Defaults to current month
@@ -886,21 +1130,15 @@ def get_financial_summary(month: int = None, year: int = None, db: Session = Dep
     else:
         end_date = datetime(year, month + 1, 1)
         
-    # 1. Labor Costs (From Closed Trips + Advances?? No, usually just Production Value)
-    # Strategy: Sum 'total_earned' from TripAssignments in Closed Trips this month
-    labor_query = db.query(func.sum(models.TripEmployee.total_earned)).join(models.WorkTrip).filter(
-        models.WorkTrip.status == "CLOSED",
-        models.WorkTrip.date >= start_date,
-        models.WorkTrip.date < end_date
-    )
-    labor_cost = labor_query.scalar() or 0.0
-    
-    # 2. Expenses
-    expense_query = db.query(func.sum(models.ExpenseDocument.amount)).filter(
-        models.ExpenseDocument.date >= start_date,
-        models.ExpenseDocument.date < end_date
-    )
-    expense_cost = expense_query.scalar() or 0.0
+    snapshot = periods.get_snapshot(db, year, month)
+    if snapshot:
+        labor_cost, expense_cost = snapshot.labor_cost, snapshot.expense_cost
+    else:
+        # 1. Labor Costs: 'total_earned' of trip assignments in Closed Trips this month
+        labor_cost = payroll.labor_cost(db, start_date, end_date)
+        
+        # 2. Expenses
+        expense_cost = payroll.expense_cost(db, start_date, end_date)
     
     return {
         "period": f"{month}/{year}",
@@ -910,107 +1148,5 @@ def get_financial_summary(month: int = None, year: int = None, db: Session = Dep
     }
 
 @app.get("/reports/accounting/pdf")
-def generate_accounting_report(month: int, year: int, db: Session = Depends(get_db)):
-    # Fetch Data
-    start_date = datetime(year, month, 1)
-    if month == 12:
-        end_date = datetime(year + 1, 1, 1)
-    else:
-        end_date = datetime(year, month + 1, 1)
-        
-    # Payroll Data (Grouped by Employee)
-    employees = db.query(models.Employee).all()
-    payroll_rows = []
-    total_payroll = 0.0
-    
-    for emp in employees:
-        # Get production for this month
-        prod = db.query(func.sum(models.TripEmployee.total_earned), func.sum(models.TripEmployee.meters_done)).join(models.WorkTrip).filter(
-            models.TripEmployee.employee_id == emp.id,
-            models.WorkTrip.status == "CLOSED",
-            models.WorkTrip.date >= start_date,
-            models.WorkTrip.date < end_date
-        ).first()
-        
-        earned = prod[0] or 0.0
-        meters = prod[1] or 0.0
-        
-        if earned > 0:
-            payroll_rows.append([emp.name, f"{meters:.2f}m", f"${earned:,.2f}"])
-            total_payroll += earned
-            
-    # Expenses Data
-    expenses = db.query(models.ExpenseDocument).filter(
-        models.ExpenseDocument.date >= start_date,
-        models.ExpenseDocument.date < end_date
-    ).order_by(models.ExpenseDocument.date).all()
-    
-    expense_rows = []
-    total_expenses = 0.0
-    for exp in expenses:
-        expense_rows.append([
-            exp.date.strftime("%d/%m/%Y"), 
-            exp.description[:40], 
-            f"${exp.amount:,.2f}"
-        ])
-        total_expenses += exp.amount
-
-    # --- PDF GENERATION ---
-    filename = f"Reporte_Contable_{year}_{month}.pdf"
-    filepath = f"storage/{filename}"
-    
-    doc = SimpleDocTemplate(filepath, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # Header
-    elements.append(Paragraph(f"<b>NovaManager - Reporte Contable</b>", styles['Title']))
-    elements.append(Paragraph(f"Período: {month}/{year}", styles['Normal']))
-    elements.append(Spacer(1, 20))
-    
-    # Section 1: Payroll
-    elements.append(Paragraph(f"<b>1. Nómina / Producción ({len(payroll_rows)} Empleados)</b>", styles['Heading2']))
-    if payroll_rows:
-        data = [["Empleado", "Producción", "A Pagar"]] + payroll_rows
-        t = Table(data, colWidths=[200, 100, 100])
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.grey),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0,0), (-1,0), 12),
-            ('GRID', (0,0), (-1,-1), 1, colors.black),
-        ]))
-        elements.append(t)
-        elements.append(Paragraph(f"<b>Total Nómina: ${total_payroll:,.2f}</b>", styles['Normal']))
-    else:
-         elements.append(Paragraph("Sin actividad registrada.", styles['Normal']))
-         
-    elements.append(Spacer(1, 20))
-    
-    # Section 2: Expenses
-    elements.append(Paragraph(f"<b>2. Gastos Operativos ({len(expenses)})</b>", styles['Heading2']))
-    if expense_rows:
-        data = [["Fecha", "Descripción", "Monto"]] + expense_rows
-        t = Table(data, colWidths=[80, 220, 100])
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.grey),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0,0), (-1,0), 12),
-            ('GRID', (0,0), (-1,-1), 1, colors.black),
-        ]))
-        elements.append(t)
-        elements.append(Paragraph(f"<b>Total Gastos: ${total_expenses:,.2f}</b>", styles['Normal']))
-    else:
-        elements.append(Paragraph("Sin gastos registrados.", styles['Normal']))
-        
-    elements.append(Spacer(1, 30))
-    
-    # Footer
-    elements.append(Paragraph(f"<b>TOTAL GENERAL DEL PERÍODO: ${(total_payroll + total_expenses):,.2f}</b>", styles['Heading1']))
-    
-    doc.build(elements)
-    
-    return FileResponse(filepath, filename=filename, media_type='application/pdf')
+async def generate_accounting_report(year: int, month: int = Query(..., ge=1, le=12)):
+    return await _serve_report("accounting", year, month)
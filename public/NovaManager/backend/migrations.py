@@ -0,0 +1,31 @@
+"""
+In-place schema upgrades for databases created before a column existed.
+
+create_all() only creates missing tables, so columns added to existing tables are
+migrated here on startup. Each step checks the live schema first and is a no-op
+once applied.
+"""
+from sqlalchemy import inspect, text
+
+def _add_attendance_day(conn):
+    """
+    daily_attendance.day: the calendar day of `date`, unique per employee so
+    /attendance/bulk can upsert with ON CONFLICT (employee_id, day).
+    """
+    columns = {c["name"] for c in inspect(conn).get_columns("daily_attendance")}
+    if "day" in columns:
+        return
+    conn.execute(text("ALTER TABLE daily_attendance ADD COLUMN day DATE"))
+    conn.execute(text("UPDATE daily_attendance SET day = DATE(date)"))
+    # The old check-then-insert could race into duplicates; keep the latest row per day
+    conn.execute(text(
+        "DELETE FROM daily_attendance WHERE id NOT IN "
+        "(SELECT MAX(id) FROM daily_attendance GROUP BY employee_id, day)"
+    ))
+
+def upgrade(engine):
+    """ Runs after create_all() and before the index sync in main.py. """
+    with engine.begin() as conn:
+        tables = set(inspect(conn).get_table_names())
+        if "daily_attendance" in tables:
+            _add_attendance_day(conn)
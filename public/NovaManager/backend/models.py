@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Boolean, Index, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -25,6 +25,9 @@ class Transaction(Base):
     category_id = Column(Integer, ForeignKey("categories.id"))
     category = relationship("Category", back_populates="transactions")
 
+    # Month range scans grouped by type (dashboard chart, reports)
+    __table_args__ = (Index("ix_transactions_date_type", "date", "type"),)
+
 class StockItem(Base):
     __tablename__ = "stock_items"
 
@@ -66,6 +69,11 @@ class MaterialUsage(Base):
     employee = relationship("Employee")
     sale_tx = relationship("Transaction")
 
+    __table_args__ = (
+        Index("ix_material_usages_employee_date", "employee_id", "date"),
+        Index("ix_material_usages_stock_item", "stock_item_id"),
+    )
+
 class EmployeeGroup(Base):
     __tablename__ = "employee_groups"
     id = Column(Integer, primary_key=True, index=True)
@@ -82,6 +90,8 @@ class Employee(Base):
     records = relationship("PayrollRecord", back_populates="employee", cascade="all, delete-orphan")
     advances = relationship("Advance", back_populates="employee", cascade="all, delete-orphan")
     material_usages = relationship("MaterialUsage", back_populates="employee", cascade="all, delete-orphan")
+    ledger_entries = relationship("EmployeeLedgerEntry", cascade="all, delete-orphan")
+    balance = relationship("EmployeeBalance", uselist=False, cascade="all, delete-orphan")
 
 class Advance(Base):
     __tablename__ = "advances"
@@ -97,6 +107,9 @@ class Advance(Base):
     employee = relationship("Employee", back_populates="advances")
     transaction = relationship("Transaction")
 
+    # Employee history pages: newest first per employee
+    __table_args__ = (Index("ix_advances_employee_date", "employee_id", "date"),)
+
 class PayrollRecord(Base):
     __tablename__ = "payroll_records"
     id = Column(Integer, primary_key=True, index=True)
@@ -112,6 +125,31 @@ class PayrollRecord(Base):
     employee = relationship("Employee", back_populates="records")
     transaction = relationship("Transaction")
 
+    __table_args__ = (Index("ix_payroll_records_employee_date", "employee_id", "date"),)
+
+class EmployeeLedgerEntry(Base):
+    """
+    Append-only journal of balance movements (see ledger.py). Deltas are signed:
+    a settled advance is advances_delta < 0.
+    """
+    __tablename__ = "employee_ledger"
+    id = Column(Integer, primary_key=True, index=True)
+    employee_id = Column(Integer, ForeignKey("employees.id"), index=True)
+    date = Column(DateTime(timezone=True), server_default=func.now())
+    kind = Column(String) # TRIP_EARNED, ADVANCE, ADVANCE_SETTLED, ADJUSTMENT
+    earned_delta = Column(Float, default=0.0)
+    advances_delta = Column(Float, default=0.0)
+    ref_id = Column(Integer, nullable=True) # trip_employees.id / advances.id, by kind
+    description = Column(String, nullable=True)
+
+class EmployeeBalance(Base):
+    """ Cached sum of an employee's ledger entries. """
+    __tablename__ = "employee_balances"
+    employee_id = Column(Integer, ForeignKey("employees.id"), primary_key=True)
+    earned = Column(Float, default=0.0, nullable=False)
+    advances = Column(Float, default=0.0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 # --- NUEVAS ENTIDADES PARA NOVA MANAGER 2.0 (ARQUITECTO DB) ---
 
 class SystemConfig(Base):
@@ -124,6 +162,19 @@ class SystemConfig(Base):
     value = Column(String)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+class ConfigHistory(Base):
+    """
+    Every value a config key has had, from `valid_from` on (see system_config.py).
+    Lets a date be resolved to the meter price in force that day.
+    """
+    __tablename__ = "system_config_history"
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String, nullable=False)
+    value = Column(String)
+    valid_from = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (Index("ix_system_config_history_key_valid_from", "key", "valid_from"),)
+
 class Vehicle(Base):
     """
     Fleet Command: Registro de vehiculos de la empresa.
@@ -170,6 +221,9 @@ class WorkTrip(Base):
     
     vehicle = relationship("Vehicle", back_populates="trips")
 
+    # Period payroll / summaries filter on CLOSED trips by date
+    __table_args__ = (Index("ix_work_trips_status_date", "status", "date"),)
+
 class TripEmployee(Base):
     """
     Relación Trabajador-Viaje (Producción).
@@ -196,6 +250,12 @@ class TripEmployee(Base):
     trip = relationship("WorkTrip", back_populates="assignments")
     employee = relationship("Employee")
 
+    # Join from trips to their assignments, grouped by employee; and an employee's trips (history)
+    __table_args__ = (
+        Index("ix_trip_employees_trip_employee", "trip_id", "employee_id"),
+        Index("ix_trip_employees_employee", "employee_id"),
+    )
+
 class TripMaterial(Base):
     """
     Logística de Materiales (Ida y Vuelta).
@@ -215,6 +275,9 @@ class TripMaterial(Base):
     trip = relationship("WorkTrip", back_populates="materials")
     stock_item = relationship("StockItem")
 
+    # Material counts per trip (calendar feed)
+    __table_args__ = (Index("ix_trip_materials_trip", "trip_id"),)
+
 class ExpenseDocument(Base):
     """
     Módulo ARCA. Registro documental.
@@ -246,7 +309,41 @@ class DailyAttendance(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     date = Column(DateTime(timezone=True), server_default=func.now())
+    day = Column(Date, nullable=False)  # Calendar day of `date`, the upsert key
     employee_id = Column(Integer, ForeignKey("employees.id"))
     is_present = Column(Boolean, default=False)
     
     employee = relationship("Employee")
+
+    # One row per employee and day (/attendance/bulk upserts on it)
+    __table_args__ = (Index("ux_daily_attendance_employee_day", "employee_id", "day", unique=True),)
+
+class ReportVersion(Base):
+    """
+    Data version per period ("YYYY-MM"). Bumped whenever transactions, trips or expenses
+    of that month change; generated report files are cached under this version.
+    """
+    __tablename__ = "report_versions"
+
+    period = Column(String, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+
+class PeriodSnapshot(Base):
+    """
+    Frozen totals of a closed month ("YYYY-MM"). Valid while `data_version` matches the
+    period's ReportVersion; any later change to the month's data makes it stale.
+    """
+    __tablename__ = "period_snapshots"
+
+    period = Column(String, primary_key=True)
+    closed_at = Column(DateTime(timezone=True), server_default=func.now())
+    data_version = Column(Integer, nullable=False)
+
+    income = Column(Float, default=0.0)
+    expenses = Column(Float, default=0.0)
+    labor_cost = Column(Float, default=0.0)
+    expense_cost = Column(Float, default=0.0) # ExpenseDocuments (ARCA)
+
+    by_category = Column(JSON) # [{"category", "type", "total"}]
+    by_employee = Column(JSON) # [{"employee_id", "name", "earned", "meters"}]
+    daily = Column(JSON)       # dashboard chart_data
@@ -0,0 +1,38 @@
+"""
+Payroll / production aggregates for a period, shared by the accounting report and
+/finances/summary. Production counts trips that are CLOSED and dated inside the period.
+"""
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import models
+
+def payroll_by_employee(db: Session, start_date, end_date):
+    """
+    One grouped query for the whole period instead of one SUM per employee.
+    Returns [(employee_id, name, total_earned, meters_done)] ordered by name. The name is
+    None for production of employees that were deleted afterwards.
+    """
+    return (
+        db.query(models.TripEmployee.employee_id, models.Employee.name,
+                 func.sum(models.TripEmployee.total_earned), func.sum(models.TripEmployee.meters_done))
+        .join(models.WorkTrip, models.TripEmployee.trip_id == models.WorkTrip.id)
+        .outerjoin(models.Employee, models.TripEmployee.employee_id == models.Employee.id)
+        .filter(
+            models.WorkTrip.status == "CLOSED",
+            models.WorkTrip.date >= start_date,
+            models.WorkTrip.date < end_date,
+        )
+        .group_by(models.TripEmployee.employee_id, models.Employee.name)
+        .order_by(models.Employee.name, models.TripEmployee.employee_id)
+        .all()
+    )
+
+def labor_cost(db: Session, start_date, end_date) -> float:
+    return sum(earned or 0.0 for _, _, earned, _ in payroll_by_employee(db, start_date, end_date))
+
+def expense_cost(db: Session, start_date, end_date) -> float:
+    return db.query(func.sum(models.ExpenseDocument.amount)).filter(
+        models.ExpenseDocument.date >= start_date,
+        models.ExpenseDocument.date < end_date
+    ).scalar() or 0.0
@@ -0,0 +1,208 @@
+"""
+Accounting periods (months): data versions and period close.
+
+Data versions: `report_versions` holds a counter per "YYYY-MM". A session hook bumps it
+inside the same DB transaction whenever a Transaction, WorkTrip, TripEmployee or
+ExpenseDocument of that month is inserted, updated or deleted. Cached reports
+(report_jobs.py) and snapshots are keyed on it.
+
+Period close freezes a finished month's totals into `period_snapshots`.
+
+Closed months are answered from the snapshot with two primary-key reads (snapshot and
+the period's data version) instead of re-aggregating raw rows. A snapshot is only used
+while its data_version equals the period's current version, so any later edit to the
+month makes it stale and reads fall back to live queries. Closing again refreshes it.
+
+PERIOD_LOCK_MODE=reject turns edits to closed months into errors (PeriodClosedError)
+instead; the default, "stale", accepts them and just invalidates the snapshot.
+"""
+import calendar
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event, extract, func, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+import payroll
+
+PERIOD_LOCK_MODE = os.getenv("PERIOD_LOCK_MODE", "stale")
+if PERIOD_LOCK_MODE not in ("stale", "reject"):
+    raise ValueError(f"Invalid PERIOD_LOCK_MODE: {PERIOD_LOCK_MODE}")
+
+class PeriodClosedError(ValueError):
+    pass
+
+# --- DATA VERSIONS ---
+
+def period_key(year: int, month: int) -> str:
+    return f"{year:04d}-{month:02d}"
+
+def month_range(year: int, month: int):
+    """ Half-open [start, end) range of a month. """
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+def get_version(db: Session, year: int, month: int) -> int:
+    version = db.execute(
+        select(models.ReportVersion.version).where(models.ReportVersion.period == period_key(year, month))
+    ).scalar()
+    return version or 0
+
+def bump_versions(db: Session, periods):
+    """ version += 1 for each period (INSERT ... ON CONFLICT DO UPDATE). No commit. """
+    if not periods:
+        return
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    table = models.ReportVersion.__table__
+    stmt = dialect.insert(table).values([{"period": p, "version": 1} for p in sorted(periods)])
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.period], set_={"version": table.c.version + 1})
+    db.connection().execute(stmt)
+
+def versions_fingerprint(db: Session, start=None, end=None) -> str:
+    """
+    Hash of the window and the data versions of every period overlapping [start, end)
+    (all periods when open-ended). Equal fingerprints mean none of those months changed:
+    an ETag source.
+    """
+    query = select(models.ReportVersion.period, models.ReportVersion.version).order_by(models.ReportVersion.period)
+    if start is not None:
+        query = query.where(models.ReportVersion.period >= period_key(start.year, start.month))
+    if end is not None:
+        last = end - timedelta(microseconds=1)
+        query = query.where(models.ReportVersion.period <= period_key(last.year, last.month))
+    rows = db.execute(query).all()
+    return hashlib.sha1(repr((start, end, rows)).encode()).hexdigest()
+
+_TRACKED = (models.Transaction, models.WorkTrip, models.TripEmployee, models.ExpenseDocument)
+
+def _affected_dates(obj):
+    if isinstance(obj, models.TripEmployee):
+        return _affected_dates(obj.trip) if obj.trip is not None else [None]
+    # Old and new date, so moving a row between months invalidates both.
+    # Touching obj.date first reloads it if the object was expired by a commit.
+    obj.date
+    history = inspect(obj).attrs.date.history
+    return [*history.added, *history.deleted, *history.unchanged] or [None]
+
+def periods_of(value):
+    if value is None:
+        # Date comes from the server default (now); local and UTC can be different months
+        return {period_key(d.year, d.month) for d in (datetime.now(), datetime.now(timezone.utc))}
+    return {period_key(value.year, value.month)}
+
+@event.listens_for(Session, "before_flush")
+def _collect_changed_periods(session, flush_context, instances):
+    periods = session.info.setdefault("report_periods", set())
+    for obj in (*session.new, *session.deleted, *session.dirty):
+        if not isinstance(obj, _TRACKED):
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        for value in _affected_dates(obj):
+            periods |= periods_of(value)
+
+@event.listens_for(Session, "after_flush")
+def _bump_changed_periods(session, flush_context):
+    periods = session.info.pop("report_periods", None)
+    if periods:
+        bump_versions(session, periods)
+
+# --- SHARED AGGREGATES ---
+
+def daily_totals_query(start, end):
+    """ SUM(amount) per (day, type) for [start, end); at most 31 x 2 rows. """
+    day = extract("day", models.Transaction.date)
+    return (
+        select(day, models.Transaction.type, func.sum(models.Transaction.amount))
+        .where(models.Transaction.date >= start, models.Transaction.date < end)
+        .group_by(day, models.Transaction.type)
+    )
+
+def fold_daily_totals(rows, days_in_month: int):
+    """ Returns (income, expenses, chart_data) from daily_totals_query rows. """
+    daily_data = {d: {"day": d, "income": 0, "expense": 0} for d in range(1, days_in_month + 1)}
+    income = expenses = 0
+    for tx_day, tx_type, total in rows:
+        if tx_type == "INCOME":
+            daily_data[int(tx_day)]["income"] += total
+            income += total
+        elif tx_type == "EXPENSE":
+            daily_data[int(tx_day)]["expense"] += total
+            expenses += total
+    return income, expenses, list(daily_data.values())
+
+# --- SNAPSHOTS ---
+
+def get_snapshot(db: Session, year: int, month: int):
+    """ The period's snapshot if it is closed and still current, else None. """
+    snapshot = db.get(models.PeriodSnapshot, period_key(year, month))
+    if snapshot is None or snapshot.data_version != get_version(db, year, month):
+        return None
+    return snapshot
+
+def close_period(db: Session, year: int, month: int) -> models.PeriodSnapshot:
+    """ Computes and stores (or refreshes) the snapshot of a finished month. Commits. """
+    start, end = month_range(year, month)
+    if end > datetime.now():
+        raise ValueError("Only finished months can be closed")
+
+    income, expenses, daily = fold_daily_totals(db.execute(daily_totals_query(start, end)).all(),
+                                                 calendar.monthrange(year, month)[1])
+    by_category = [
+        {"category": name or "-", "type": tx_type, "total": total}
+        for name, tx_type, total in db.query(models.Category.name, models.Transaction.type, func.sum(models.Transaction.amount))
+        .outerjoin(models.Category, models.Transaction.category_id == models.Category.id)
+        .filter(models.Transaction.date >= start, models.Transaction.date < end)
+        .group_by(models.Category.name, models.Transaction.type)
+        .order_by(models.Category.name)
+    ]
+    by_employee = [
+        {"employee_id": emp_id, "name": name, "earned": earned or 0.0, "meters": meters or 0.0}
+        for emp_id, name, earned, meters in payroll.payroll_by_employee(db, start, end)
+    ]
+
+    snapshot = db.get(models.PeriodSnapshot, period_key(year, month)) \
+        or models.PeriodSnapshot(period=period_key(year, month))
+    snapshot.closed_at = datetime.now()
+    snapshot.data_version = get_version(db, year, month)
+    snapshot.income = income
+    snapshot.expenses = expenses
+    snapshot.labor_cost = sum(row["earned"] for row in by_employee)
+    snapshot.expense_cost = payroll.expense_cost(db, start, end)
+    snapshot.by_category = by_category
+    snapshot.by_employee = by_employee
+    snapshot.daily = daily
+    db.add(snapshot)
+    db.commit()
+    db.refresh(snapshot)
+    return snapshot
+
+def reopen_period(db: Session, year: int, month: int) -> bool:
+    deleted = db.query(models.PeriodSnapshot).filter(
+        models.PeriodSnapshot.period == period_key(year, month)
+    ).delete()
+    db.commit()
+    return bool(deleted)
+
+def snapshot_status(db: Session, snapshot: models.PeriodSnapshot) -> str:
+    year, month = map(int, snapshot.period.split("-"))
+    return "closed" if snapshot.data_version == get_version(db, year, month) else "stale"
+
+# Registered after _collect_changed_periods, so this flush's periods are already collected
+@event.listens_for(Session, "before_flush")
+def _reject_closed_period_edits(session, flush_context, instances):
+    if PERIOD_LOCK_MODE != "reject":
+        return
+    periods = session.info.get("report_periods")
+    if not periods:
+        return
+    closed = session.execute(
+        select(models.PeriodSnapshot.period).where(models.PeriodSnapshot.period.in_(periods))
+    ).scalars().all()
+    if closed:
+        session.info.pop("report_periods", None)
+        raise PeriodClosedError(f"Period(s) {', '.join(sorted(closed))} are closed")
@@ -0,0 +1,386 @@
+"""
+Background report jobs and the on-disk report cache.
+
+PDFs are rendered in a process pool, so a month-end rush of downloads doesn't pin the
+API workers. The request only reads the period's data version and ships (type, year,
+month) to a worker; the worker opens its own session and streams the rows (yield_per)
+straight into the PDF, so a big month is never materialised or pickled.
+Finished files are cached on disk keyed by (report type, period, data version):
+
+    storage/reports/{type}_{YYYY-MM}_v{version}.pdf
+
+The data version of a period (see periods.py) is bumped inside the same DB transaction
+whenever that month's data changes, so stale files are simply never looked up again
+(and are pruned when the new version is rendered).
+
+Job state lives on disk too, so any API worker (gunicorn) can answer for any job:
+
+    storage/reports/jobs/{job id}.json                   status of each job
+    storage/reports/{type}_{YYYY-MM}_v{version}.pdf.job  claim: id of the job rendering it
+
+The claim is created atomically (link), so identical requests on different workers join
+one render. A claim whose job is still unfinished after REPORT_JOB_TIMEOUT is treated
+as abandoned (its worker died) and taken over.
+
+    REPORT_CACHE_DIR    Where rendered reports are kept   (default storage/reports)
+    REPORT_WORKERS      Render processes                  (default 2)
+    REPORT_JOB_TIMEOUT  Seconds before a render counts as abandoned (default 900)
+    REPORT_WAIT_SECONDS How long a download request waits for its render (default 20);
+                        past that it gets the job to poll instead of the file
+"""
+import asyncio
+import glob
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import models
+import payroll
+import periods
+import reports
+from periods import month_range, period_key
+
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", "storage/reports")
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", 2))
+REPORT_JOB_TIMEOUT = int(os.getenv("REPORT_JOB_TIMEOUT", 900))
+REPORT_WAIT_SECONDS = float(os.getenv("REPORT_WAIT_SECONDS", 20))
+JOB_RETENTION_SECONDS = 24 * 3600
+JOB_POLL_SECONDS = 0.5
+
+SPANISH_MONTHS = {
+    1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril", 5: "Mayo", 6: "Junio",
+    7: "Julio", 8: "Agosto", 9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
+}
+
+# --- REPORT DATA ---
+
+def load_monthly(db: Session, year: int, month: int) -> dict:
+    start, end = month_range(year, month)
+    in_month = (models.Transaction.date >= start, models.Transaction.date < end)
+
+    snapshot = periods.get_snapshot(db, year, month)
+    if snapshot:
+        income, expenses = snapshot.income, snapshot.expenses
+    else:
+        totals = dict(db.query(models.Transaction.type, func.sum(models.Transaction.amount))
+                      .filter(*in_month).group_by(models.Transaction.type).all())
+        income = totals.get("INCOME") or 0
+        expenses = totals.get("EXPENSE") or 0
+
+    # Consumed lazily by the renderer, while the worker's session is open
+    rows = db.execute(
+        select(models.Transaction.date, models.Transaction.type, models.Transaction.description,
+               models.Transaction.amount, models.Category.name.label("category_name"))
+        .outerjoin(models.Category, models.Transaction.category_id == models.Category.id)
+        .where(*in_month)
+        .order_by(models.Transaction.date.asc())
+        .execution_options(yield_per=1000)
+    )
+    return {
+        "month_str": f"{SPANISH_MONTHS.get(month, 'Desconocido')} {year}",
+        "income": income,
+        "expenses": expenses,
+        "balance": income - expenses,
+        "transactions": (reports.TxRow(*row) for row in rows),
+    }
+
+def load_accounting(db: Session, year: int, month: int) -> dict:
+    start_date, end_date = month_range(year, month)
+
+    # Payroll Data (Grouped by Employee, single query)
+    payroll_rows = []
+    total_payroll = 0.0
+
+    snapshot = periods.get_snapshot(db, year, month)
+    if snapshot:
+        production = [(e["employee_id"], e["name"], e["earned"], e["meters"]) for e in snapshot.by_employee]
+    else:
+        production = payroll.payroll_by_employee(db, start_date, end_date)
+
+    for emp_id, name, earned, meters in production:
+        earned = earned or 0.0
+        meters = meters or 0.0
+
+        if earned > 0:
+            payroll_rows.append([name or f"Empleado #{emp_id}", f"{meters:.2f}m", f"${earned:,.2f}"])
+            total_payroll += earned
+
+    # Expenses Data
+    expenses = db.query(models.ExpenseDocument).filter(
+        models.ExpenseDocument.date >= start_date,
+        models.ExpenseDocument.date < end_date
+    ).order_by(models.ExpenseDocument.date).all()
+
+    expense_rows = []
+    total_expenses = 0.0
+    for exp in expenses:
+        expense_rows.append([
+            exp.date.strftime("%d/%m/%Y"),
+            exp.description[:40],
+            f"${exp.amount:,.2f}"
+        ])
+        total_expenses += exp.amount
+
+    return {
+        "month": month,
+        "year": year,
+        "payroll_rows": payroll_rows,
+        "total_payroll": total_payroll,
+        "expense_rows": expense_rows,
+        "total_expenses": total_expenses,
+    }
+
+REPORT_TYPES = {
+    # type: (data loader, download file name)
+    "monthly": (load_monthly, "Reporte_{month}_{year}.pdf"),
+    "accounting": (load_accounting, "Reporte_Contable_{year}_{month}.pdf"),
+}
+
+# --- ARTIFACT CACHE ---
+
+def artifact_path(report_type: str, year: int, month: int, version: int) -> str:
+    return os.path.join(REPORT_CACHE_DIR, f"{report_type}_{period_key(year, month)}_v{version}.pdf")
+
+def _prune_stale(report_type: str, year: int, month: int, keep: str):
+    for path in glob.glob(os.path.join(REPORT_CACHE_DIR, f"{report_type}_{period_key(year, month)}_v*.pdf")):
+        if path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+# --- JOBS ---
+
+_executor = None
+_futures = {}           # job id -> Future, for jobs rendering in this process' pool
+_lock = threading.Lock()
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+UNFINISHED = ("queued", "running")
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # spawn: workers don't inherit the API's DB connections or event loop
+            _executor = ProcessPoolExecutor(max_workers=REPORT_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+def _jobs_dir() -> str:
+    return os.path.join(REPORT_CACHE_DIR, "jobs")
+
+def _job_path(job_id: str) -> str:
+    return os.path.join(_jobs_dir(), f"{job_id}.json")
+
+def _claim_path(path: str) -> str:
+    return f"{path}.job"
+
+def _write_atomic(path: str, text: str):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def _save_job(job: dict):
+    os.makedirs(_jobs_dir(), exist_ok=True)
+    _write_atomic(_job_path(job["id"]), json.dumps(job, default=str))
+
+def _load_job(job_id: str):
+    if not _JOB_ID.fullmatch(job_id or ""):
+        return None
+    try:
+        with open(_job_path(job_id)) as f:
+            job = json.load(f)
+    except (OSError, ValueError):
+        return None
+    for field in ("created_at", "finished_at"):
+        if job[field]:
+            job[field] = datetime.fromisoformat(job[field])
+    return job
+
+def _update_job(job_id: str, **changes):
+    job = _load_job(job_id)
+    if job is not None:
+        job.update(changes)
+        _save_job(job)
+    return job
+
+def _is_abandoned(job: dict) -> bool:
+    return (datetime.now() - job["created_at"]).total_seconds() > REPORT_JOB_TIMEOUT
+
+def _claim(path: str, job_id: str):
+    """
+    Claims the render of `path` for job_id. Returns None when claimed, or the unfinished
+    job that already holds the claim (to join it).
+    """
+    claim = _claim_path(path)
+    for _ in range(2):
+        tmp_path = f"{claim}.{job_id}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(job_id)
+        try:
+            # link() fails if the claim exists: exactly one worker wins
+            os.link(tmp_path, claim)
+            return None
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+        try:
+            with open(claim) as f:
+                holder = _load_job(f.read().strip())
+        except OSError:
+            continue  # Released in between; try again
+        if holder is not None and holder["status"] in UNFINISHED and not _is_abandoned(holder):
+            return holder
+        _release(path, holder["id"] if holder else None, force=True)
+    # Still contended: render anyway (same output, and render_report renames atomically)
+    return None
+
+def _release(path: str, job_id, force: bool = False):
+    """ Removes the claim if job_id still holds it (or unconditionally with force). """
+    claim = _claim_path(path)
+    try:
+        if not force:
+            with open(claim) as f:
+                if f.read().strip() != job_id:
+                    return
+        os.remove(claim)
+    except OSError:
+        pass
+
+def _prune_jobs():
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    for job_file in glob.glob(os.path.join(_jobs_dir(), "*.json")):
+        try:
+            if os.path.getmtime(job_file) < cutoff:
+                os.remove(job_file)
+        except OSError:
+            pass
+
+def _run_job(job_id: str, report_type: str, year: int, month: int, path: str):
+    """ Runs in a pool process: own session, rows streamed into the renderer. """
+    from database import SessionLocal
+
+    _update_job(job_id, status="running")
+    loader = REPORT_TYPES[report_type][0]
+    db = SessionLocal()
+    try:
+        reports.render_report(report_type, path, loader(db, year, month))
+    except Exception as e:
+        _update_job(job_id, status="failed", error=str(e), finished_at=datetime.now())
+        _release(path, job_id)
+        raise
+    finally:
+        db.close()
+    _update_job(job_id, status="done", finished_at=datetime.now())
+    _release(path, job_id)
+    _prune_stale(report_type, year, month, keep=path)
+    _prune_jobs()
+    return path
+
+def _finish(job_id: str, path: str, future):
+    # The pool process records its own outcome; this covers a cancelled or crashed one
+    with _lock:
+        _futures.pop(job_id, None)
+    if future.cancelled() or future.exception() is not None:
+        job = _load_job(job_id)
+        if job is not None and job["status"] in UNFINISHED:
+            error = "cancelled" if future.cancelled() else str(future.exception())
+            _update_job(job_id, status="failed", error=error, finished_at=datetime.now())
+        _release(path, job_id)
+
+def submit(db: Session, report_type: str, year: int, month: int) -> dict:
+    """
+    Returns a job for the report. Served from the cache when the file for the current
+    data version exists; joins an identical job that is already rendering (on any
+    worker); otherwise queues the render.
+    """
+    _, filename = REPORT_TYPES[report_type]
+    version = periods.get_version(db, year, month)
+    path = artifact_path(report_type, year, month, version)
+
+    job = {
+        "id": uuid.uuid4().hex,
+        "report_type": report_type,
+        "year": year,
+        "month": month,
+        "version": version,
+        "status": "queued",
+        "error": None,
+        "cached": False,
+        "created_at": datetime.now(),
+        "finished_at": None,
+        "path": path,
+        "filename": filename.format(year=year, month=month),
+    }
+    os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+    if os.path.exists(path):
+        job.update(status="done", cached=True, finished_at=job["created_at"])
+        _save_job(job)
+        return job
+
+    # Saved before claiming, so a worker that finds our claim can read the job
+    _save_job(job)
+    holder = _claim(path, job["id"])
+    if holder is not None:
+        os.remove(_job_path(job["id"]))
+        return holder
+    if os.path.exists(path):
+        # Finished by another worker between the check and the claim
+        _release(path, job["id"])
+        job.update(status="done", cached=True, finished_at=datetime.now())
+        _save_job(job)
+        return job
+
+    try:
+        future = _get_executor().submit(_run_job, job["id"], report_type, year, month, path)
+    except Exception as e:
+        job.update(status="failed", error=str(e), finished_at=datetime.now())
+        _save_job(job)
+        _release(path, job["id"])
+        raise
+    with _lock:
+        _futures[job["id"]] = future
+    future.add_done_callback(lambda f: _finish(job["id"], path, f))
+    return job
+
+def get_job(job_id: str):
+    return _load_job(job_id)
+
+async def wait(job_id: str, timeout: float = REPORT_WAIT_SECONDS):
+    """
+    Waits up to `timeout` seconds for a job without blocking the event loop: on the local
+    future when this worker renders it, otherwise by polling the job file. Returns the
+    job as it stands then (still unfinished on timeout); errors are reported on the job.
+    """
+    deadline = time.monotonic() + timeout
+    future = _futures.get(job_id)
+    if future is not None:
+        # _finish was registered first, so the job is updated by the time this resumes.
+        # shield: giving up on the wait must not cancel a render that is still queued.
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except Exception:
+            pass
+    job = get_job(job_id)
+    while job is not None and job["status"] in UNFINISHED and time.monotonic() < deadline:
+        await asyncio.sleep(JOB_POLL_SECONDS)
+        job = get_job(job_id)
+    return job
+
+def shutdown():
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
@@ -3,31 +3,80 @@ from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import cm
-from io import BytesIO
+from collections import namedtuple
+import os
 
-def generate_monthly_pdf(month_str, income, expenses, balance, transactions):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=2*cm, leftMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm)
+# Rows per sub-table. Small tables are laid out in O(rows) total; one giant table gets
+# re-split on every page break, which is what made big months explode.
+ROWS_PER_TABLE = 40
+
+# Plain row used when transactions are shipped to a render worker process
+TxRow = namedtuple("TxRow", "date type description amount category_name")
+
+TX_HEADER = ["Fecha", "Tipo", "Categoría", "Descripción", "Monto"]
+TX_COL_WIDTHS = [2.5*cm, 2*cm, 4*cm, 5.5*cm, 3*cm]
+TX_BASE_STYLE = [
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+]
+
+def _category_name(tx):
+    # Accepts ORM Transactions or lightweight rows carrying a `category_name` column
+    if hasattr(tx, "category_name"):
+        return tx.category_name or "-"
+    return tx.category.name if tx.category else "-"
+
+def _transaction_tables(transactions, rows_per_table=ROWS_PER_TABLE):
+    """ Yields fixed-size sub-tables, each with its own header row and a single style list. """
+    rows, amount_colors = [], []
+    emitted = False
+
+    def flush():
+        style = list(TX_BASE_STYLE)
+        # All per-row colour commands go into one list, applied once at construction
+        style.extend(('TEXTCOLOR', (4, i), (4, i), color) for i, color in enumerate(amount_colors, start=1))
+        return Table([TX_HEADER] + rows, colWidths=TX_COL_WIDTHS, repeatRows=1, style=TableStyle(style))
+
+    for tx in transactions:
+        rows.append([
+            tx.date.strftime("%d/%m/%Y"),
+            "Ingreso" if tx.type == "INCOME" else "Gasto",
+            _category_name(tx),
+            tx.description[:30] if tx.description else "-", # Truncate description properly
+            f"$ {tx.amount:,.2f}"
+        ])
+        amount_colors.append(colors.green if tx.type == "INCOME" else colors.red)
+        if len(rows) == rows_per_table:
+            yield flush()
+            rows, amount_colors, emitted = [], [], True
+    # Remaining rows; an empty month still gets the header-only table
+    if rows or not emitted:
+        yield flush()
+
+def _build_monthly_pdf(output, month_str, income, expenses, balance, transactions):
+    doc = SimpleDocTemplate(output, pagesize=A4, rightMargin=2*cm, leftMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm)
     story = []
-    
+
     styles = getSampleStyleSheet()
     title_style = styles["Title"]
-    
+
     # Title
     story.append(Paragraph(f"Reporte Mensual: {month_str}", title_style))
     story.append(Spacer(1, 1*cm))
-    
+
     # Summary Table
     story.append(Paragraph("Resumen Financiero", styles["Heading2"]))
     story.append(Spacer(1, 0.5*cm))
-    
+
     summary_data = [
         ["Concepto", "Monto"],
         ["Total Ingresos", f"$ {income:,.2f}"],
         ["Total Gastos", f"$ {expenses:,.2f}"],
         ["Balance Final", f"$ {balance:,.2f}"]
     ]
-    
+
     t_summary = Table(summary_data, colWidths=[10*cm, 5*cm])
     t_summary.setStyle(TableStyle([
         ('BACKGROUND', (0, 0), (1, 0), colors.grey),
@@ -41,39 +90,84 @@ def generate_monthly_pdf(month_str, income, expenses, balance, transactions):
     ]))
     story.append(t_summary)
     story.append(Spacer(1, 1*cm))
-    
+
     # Transactions List
     story.append(Paragraph("Detalle de Movimientos", styles["Heading2"]))
     story.append(Spacer(1, 0.5*cm))
+    story.extend(_transaction_tables(transactions))
+
+    doc.build(story)
+
+def _build_accounting_pdf(output, month, year, payroll_rows, total_payroll, expense_rows, total_expenses):
+    doc = SimpleDocTemplate(output, pagesize=A4)
+    elements = []
+    styles = getSampleStyleSheet()
     
-    tx_data = [["Fecha", "Tipo", "Categoría", "Descripción", "Monto"]]
-    for tx in transactions:
-        tx_data.append([
-            tx.date.strftime("%d/%m/%Y"),
-            "Ingreso" if tx.type == "INCOME" else "Gasto",
-            tx.category.name if tx.category else "-",
-            tx.description[:30] if tx.description else "-", # Truncate description properly
-            f"$ {tx.amount:,.2f}"
-        ])
-        
-    t_tx = Table(tx_data, colWidths=[2.5*cm, 2*cm, 4*cm, 5.5*cm, 3*cm])
-    t_tx.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-    ]))
+    # Header
+    elements.append(Paragraph(f"<b>NovaManager - Reporte Contable</b>", styles['Title']))
+    elements.append(Paragraph(f"Período: {month}/{year}", styles['Normal']))
+    elements.append(Spacer(1, 20))
     
-    # Colorize amounts
-    for i, tx in enumerate(transactions):
-        row_idx = i + 1
-        color = colors.green if tx.type == "INCOME" else colors.red
-        t_tx.setStyle(TableStyle([
-            ('TEXTCOLOR', (4, row_idx), (4, row_idx), color)
+    # Section 1: Payroll
+    elements.append(Paragraph(f"<b>1. Nómina / Producción ({len(payroll_rows)} Empleados)</b>", styles['Heading2']))
+    if payroll_rows:
+        data = [["Empleado", "Producción", "A Pagar"]] + payroll_rows
+        t = Table(data, colWidths=[200, 100, 100])
+        t.setStyle(TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), colors.grey),
+            ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('BOTTOMPADDING', (0,0), (-1,0), 12),
+            ('GRID', (0,0), (-1,-1), 1, colors.black),
         ]))
-
-    story.append(t_tx)
+        elements.append(t)
+        elements.append(Paragraph(f"<b>Total Nómina: ${total_payroll:,.2f}</b>", styles['Normal']))
+    else:
+         elements.append(Paragraph("Sin actividad registrada.", styles['Normal']))
+         
+    elements.append(Spacer(1, 20))
     
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+    # Section 2: Expenses
+    elements.append(Paragraph(f"<b>2. Gastos Operativos ({len(expense_rows)})</b>", styles['Heading2']))
+    if expense_rows:
+        data = [["Fecha", "Descripción", "Monto"]] + expense_rows
+        t = Table(data, colWidths=[80, 220, 100])
+        t.setStyle(TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), colors.grey),
+            ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('BOTTOMPADDING', (0,0), (-1,0), 12),
+            ('GRID', (0,0), (-1,-1), 1, colors.black),
+        ]))
+        elements.append(t)
+        elements.append(Paragraph(f"<b>Total Gastos: ${total_expenses:,.2f}</b>", styles['Normal']))
+    else:
+        elements.append(Paragraph("Sin gastos registrados.", styles['Normal']))
+        
+    elements.append(Spacer(1, 30))
+    
+    # Footer
+    elements.append(Paragraph(f"<b>TOTAL GENERAL DEL PERÍODO: ${(total_payroll + total_expenses):,.2f}</b>", styles['Heading1']))
+    
+    doc.build(elements)
+
+_RENDERERS = {
+    "monthly": _build_monthly_pdf,
+    "accounting": _build_accounting_pdf,
+}
+
+def render_report(report_type, path, payload):
+    """
+    Entry point for the report worker processes (see report_jobs.py). Renders to a temp
+    name and renames, so a half-written file is never served from the cache.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        _RENDERERS[report_type](tmp_path, **payload)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Optional, List, Literal
 from datetime import datetime
 
 class CategoryBase(BaseModel):
@@ -75,6 +75,19 @@ class StockItem(StockItemBase):
     class Config:
         from_attributes = True
 
+# List view: columns plus usage aggregates, no nested usages (detail: GET /stock/{id})
+class StockItemSummary(StockItemBase):
+    id: int
+    cost_amount: float
+    initial_quantity: float
+    quantity: float
+    unit_cost: float
+    purchase_date: datetime
+    status: str
+    usage_count: int = 0
+    used_quantity: float = 0.0
+    last_used_at: Optional[datetime] = None
+
 # --- EMPLOYEES ---
 class AdvanceBase(BaseModel):
     amount: float
@@ -163,9 +176,35 @@ class EmployeeHistory(BaseModel):
     balance_advances: float = 0.0 # Total Advances
     net_payable: float = 0.0 # Earned - Advances
 
+    # Sections hold their newest page; None = nothing older (GET .../history/{section}?cursor=)
+    next_cursors: Dict[str, Optional[str]] = {}
+
     class Config:
         from_attributes = True
 
+class EmployeeBalance(BaseModel):
+    employee_id: int
+    balance_earned: float
+    balance_advances: float
+    net_payable: float
+
+class LedgerMismatch(BaseModel):
+    employee_id: int
+    ledger_earned: float
+    expected_earned: float
+    ledger_advances: float
+    expected_advances: float
+
+class LedgerReconciliation(BaseModel):
+    checked: int
+    mismatches: List[LedgerMismatch] = []
+    fixed: bool
+
+class HistoryPage(BaseModel):
+    section: str
+    items: List[Any] = []
+    next_cursor: Optional[str] = None
+
 # --- NOVA MANAGER 2.0 SCHEMAS ---
 
 class SystemConfigBase(BaseModel):
@@ -177,6 +216,11 @@ class SystemConfig(SystemConfigBase):
     class Config:
         from_attributes = True
 
+class ConfigHistory(SystemConfigBase):
+    valid_from: datetime
+    class Config:
+        from_attributes = True
+
 class DailyAttendanceCreate(BaseModel):
     employee_id: int
     is_present: bool
@@ -258,6 +302,21 @@ class WorkTrip(BaseModel):
     class Config:
         from_attributes = True
 
+# List view: trip columns plus crew / material aggregates (detail: GET /trips/{id})
+class TripSummary(BaseModel):
+    id: int
+    date: datetime
+    description: str
+    status: str
+    vehicle_id: Optional[int] = None
+    vehicle_name: Optional[str] = None
+    destination_lat: Optional[float] = None
+    destination_lng: Optional[float] = None
+    employee_count: int = 0
+    material_count: int = 0
+    total_meters: float = 0.0
+    total_earned: float = 0.0
+
 class TripEmployeeUpdate(BaseModel):
     id: int
     meters_done: float
@@ -273,6 +332,18 @@ class TripCloseRequest(BaseModel):
     class Config:
         from_attributes = True
 
+# End-of-day batch: create and/or close many trips in one transaction
+class TripBatchClose(TripCloseRequest):
+    trip_id: int
+
+class TripBatchRequest(BaseModel):
+    create: List[WorkTripCreate] = []
+    close: List[TripBatchClose] = []
+
+class TripBatchResult(BaseModel):
+    created: List[WorkTrip] = []
+    closed: List[WorkTrip] = []
+
 # --- EXPENSES (ARCA) ---
 class ExpenseDocumentBase(BaseModel):
     description: str
@@ -288,3 +359,58 @@ class ExpenseDocument(ExpenseDocumentBase):
     file_type: str
     class Config:
         from_attributes = True
+
+# Report jobs (background PDF rendering)
+class ReportJobCreate(BaseModel):
+    report_type: Literal["monthly", "accounting"]
+    year: int
+    month: int = Field(..., ge=1, le=12)
+
+class ReportJob(BaseModel):
+    id: str
+    report_type: str
+    year: int
+    month: int
+    version: int
+    status: str # queued, running, done, failed
+    error: Optional[str] = None
+    cached: bool = False
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+# Period close (frozen monthly totals)
+class PeriodSnapshot(BaseModel):
+    period: str
+    status: str = "closed" # closed, stale
+    closed_at: Optional[datetime] = None
+    data_version: int
+    income: float
+    expenses: float
+    labor_cost: float
+    expense_cost: float
+    by_category: List[dict] = []
+    by_employee: List[dict] = []
+    daily: List[dict] = []
+    class Config:
+        from_attributes = True
+
+# Bulk import rows (CSV / JSONL). Historical rows may carry their own date and a
+# category name instead of an id.
+class TransactionImport(TransactionCreate):
+    date: Optional[datetime] = None
+    category: Optional[str] = None
+
+class StockItemImport(StockItemCreate):
+    purchase_date: Optional[datetime] = None
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportReport(BaseModel):
+    kind: str
+    dry_run: bool
+    total_rows: int
+    imported: int
+    failed: int
+    errors: List[ImportRowError] = []
@@ -0,0 +1,135 @@
+"""
+Content-addressed storage for uploaded receipts.
+
+Uploads are streamed in chunks: each chunk is hashed (SHA-256) and written to a temp
+file off the event loop, so a large scan never blocks other requests and is never held
+in memory whole. The finished file is renamed to its digest:
+
+    storage/comprobantes/{sha[:2]}/{sha}.{ext}
+
+so the same receipt uploaded twice is stored once (the second temp file is dropped and
+both records point at the same path). Uploads over UPLOAD_MAX_BYTES are cut off while
+streaming and removed.
+
+Starlette parses (and spools) the whole multipart body before the endpoint runs, so
+UploadLimitMiddleware guards the upload routes in front of it: a Content-Length over the
+limit gets 413 without reading the body, and a body without one (chunked) is counted as
+it arrives and aborted with 413 as soon as it passes the limit.
+
+    UPLOAD_DIR          Root of the receipt store          (default storage/comprobantes)
+    UPLOAD_MAX_BYTES    Largest accepted upload            (default 20 MB)
+"""
+import hashlib
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "storage/comprobantes")
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", 20 * 1024 * 1024))
+CHUNK_SIZE = 1024 * 1024
+# Room for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+class UploadTooLarge(ValueError):
+    pass
+
+class EmptyUpload(ValueError):
+    pass
+
+@dataclass
+class StoredFile:
+    path: str        # Relative to the working dir, as saved in expense_documents.file_path
+    sha256: str
+    size: int
+    extension: str
+    duplicate: bool  # Same content was already stored
+
+def _extension(filename: str) -> str:
+    # Only a short alphanumeric suffix reaches the path
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    return ext if re.fullmatch(r"[a-z0-9]{1,10}", ext) else "bin"
+
+def _open_temp():
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    # Same filesystem as the final path, so the rename below is atomic
+    return tempfile.NamedTemporaryFile(dir=UPLOAD_DIR, prefix=".upload_", delete=False)
+
+def _commit(temp_path: str, final_path: str) -> bool:
+    """ Moves the temp file into place; returns True if the content was already there. """
+    if os.path.exists(final_path):
+        os.remove(temp_path)
+        return True
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(temp_path, final_path)
+    return False
+
+def _discard(temp_path: str):
+    try:
+        os.remove(temp_path)
+    except OSError:
+        pass
+
+async def save_upload(file: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES) -> StoredFile:
+    """ Streams `file` into the store. Raises UploadTooLarge / EmptyUpload (nothing is kept). """
+    digest = hashlib.sha256()
+    size = 0
+    temp = await run_in_threadpool(_open_temp)
+    try:
+        while chunk := await file.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"File exceeds {max_bytes // (1024 * 1024)} MB")
+            digest.update(chunk)
+            await run_in_threadpool(temp.write, chunk)
+        await run_in_threadpool(temp.close)
+        if size == 0:
+            raise EmptyUpload("Empty file")
+    except BaseException:
+        await run_in_threadpool(temp.close)
+        await run_in_threadpool(_discard, temp.name)
+        raise
+
+    sha = digest.hexdigest()
+    ext = _extension(file.filename or "")
+    path = f"{UPLOAD_DIR}/{sha[:2]}/{sha}.{ext}"
+    duplicate = await run_in_threadpool(_commit, temp.name, path)
+    return StoredFile(path=path, sha256=sha, size=size, extension=ext, duplicate=duplicate)
+
+class UploadLimitMiddleware:
+    """ ASGI middleware: caps the request body of `paths` at max_bytes (+ multipart overhead). """
+
+    def __init__(self, app, paths, max_bytes: int = UPLOAD_MAX_BYTES):
+        self.app = app
+        self.paths = set(paths)
+        self.limit = max_bytes + MULTIPART_OVERHEAD
+        self.detail = f"File exceeds {max_bytes // (1024 * 1024)} MB"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.limit:
+            response = JSONResponse({"detail": self.detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.limit:
+                    # Raised inside body parsing: FastAPI passes HTTPException through
+                    raise HTTPException(status_code=413, detail=self.detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,132 @@
+"""
+Typed, cached reader for `system_config` (meter price and friends).
+
+Every worker keeps the whole table, and its change history, in memory. Write paths read
+the meter price from there instead of querying and parsing the row on every call.
+
+Invalidation is a version stamp: set_value() touches CONFIG_STAMP_PATH after the commit,
+and readers compare the file's mtime (one stat, no query) before using their copy, so
+other workers on the same storage reload on their next read. CONFIG_CACHE_TTL bounds
+staleness where workers don't share a disk.
+
+Each change is also appended to `system_config_history`, so the value in force on a
+given date is a bisect over the cached history, without a query.
+
+    CONFIG_STAMP_PATH   Shared version stamp file        (default storage/config.version)
+    CONFIG_CACHE_TTL    Max seconds between reloads      (default 30)
+"""
+import os
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import models
+
+CONFIG_STAMP_PATH = os.getenv("CONFIG_STAMP_PATH", "storage/config.version")
+CONFIG_CACHE_TTL = float(os.getenv("CONFIG_CACHE_TTL", 30))
+
+METER_PRICE = "meter_price"
+# valid_from of values set before the history existed (a date every backend can store)
+SINCE_ALWAYS = datetime(1900, 1, 1)
+
+def _parse_float(raw) -> float:
+    try:
+        return float(raw) if raw else 0.0
+    except ValueError:
+        return 0.0
+
+# Typed keys; anything else is returned as the stored string
+PARSERS = {
+    METER_PRICE: _parse_float,
+}
+
+def _parse(key: str, raw):
+    parser = PARSERS.get(key)
+    return parser(raw) if parser else raw
+
+class _Cache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = None    # {key: typed value}
+        self.history = {}     # {key: ([valid_from...], [typed value...])} oldest first
+        self.stamp = None
+        self.loaded_at = 0.0
+
+_cache = _Cache()
+
+def _read_stamp():
+    try:
+        return os.stat(CONFIG_STAMP_PATH).st_mtime_ns
+    except OSError:
+        return None
+
+def invalidate():
+    """ Drops this worker's copy and bumps the shared stamp so the others reload too. """
+    with _cache.lock:
+        _cache.values = None
+    os.makedirs(os.path.dirname(CONFIG_STAMP_PATH) or ".", exist_ok=True)
+    with open(CONFIG_STAMP_PATH, "w") as f:
+        f.write(str(time.time_ns()))
+
+def _load(db: Session):
+    values = {row.key: _parse(row.key, row.value) for row in db.query(models.SystemConfig)}
+    history = {}
+    for key, value, valid_from in db.execute(
+        select(models.ConfigHistory.key, models.ConfigHistory.value, models.ConfigHistory.valid_from)
+        .order_by(models.ConfigHistory.key, models.ConfigHistory.valid_from, models.ConfigHistory.id)
+    ):
+        dates, typed = history.setdefault(key, ([], []))
+        dates.append(valid_from.replace(tzinfo=None))
+        typed.append(_parse(key, value))
+    # Values set before the history existed count as in force since forever
+    for key, value in values.items():
+        if key not in history:
+            history[key] = ([datetime.min], [value])
+    return values, history
+
+def _snapshot(db: Session):
+    stamp = _read_stamp()
+    with _cache.lock:
+        if _cache.values is None or stamp != _cache.stamp or time.monotonic() - _cache.loaded_at > CONFIG_CACHE_TTL:
+            _cache.values, _cache.history = _load(db)
+            _cache.stamp = stamp
+            _cache.loaded_at = time.monotonic()
+        return _cache.values, _cache.history
+
+def get(db: Session, key: str, default=None):
+    values, _ = _snapshot(db)
+    return values.get(key, default)
+
+def value_at(db: Session, key: str, when: datetime, default=None):
+    """ Value that was in force at `when` (naive local time), from the cached history. """
+    _, history = _snapshot(db)
+    dates, typed = history.get(key, ([], []))
+    index = bisect_right(dates, when.replace(tzinfo=None)) - 1
+    return typed[index] if index >= 0 else default
+
+def meter_price(db: Session) -> float:
+    return get(db, METER_PRICE, 0.0)
+
+def set_value(db: Session, key: str, value: str) -> models.SystemConfig:
+    """ Upserts the row, appends to the history and invalidates every worker's cache. Commits. """
+    db_config = db.query(models.SystemConfig).filter(models.SystemConfig.key == key).first()
+    if db_config:
+        # First change since the history existed: keep the old value in force for the past
+        has_history = db.query(models.ConfigHistory.id).filter(models.ConfigHistory.key == key).first()
+        if has_history is None:
+            db.add(models.ConfigHistory(key=key, value=db_config.value, valid_from=SINCE_ALWAYS))
+        db_config.value = value
+    else:
+        db_config = models.SystemConfig(key=key, value=value)
+        db.add(db_config)
+    db.add(models.ConfigHistory(key=key, value=value, valid_from=datetime.now()))
+
+    db.commit()
+    # After the commit, so no worker can reload the old value under the new stamp
+    invalidate()
+    db.refresh(db_config)
+    return db_config
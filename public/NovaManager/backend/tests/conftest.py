@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# Backend modules are imported by name (as main.py does), against a throwaway database
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='nova_tests_')}/test.db")
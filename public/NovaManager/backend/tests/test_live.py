@@ -0,0 +1,137 @@
+"""
+Live feed through the local stand-in: brokers for two "workers", each with its own hub,
+sharing one MemoryChannel (the same publish -> JSON -> listener -> dispatch path as Redis).
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import live
+
+@pytest.fixture
+def workers():
+    channel = live.MemoryChannel()
+    hubs = live.Hub(replay=10), live.Hub(replay=10)
+    brokers = [live.Broker(channel, target=h) for h in hubs]
+    yield hubs, brokers
+    channel.close()
+
+def _drain(subscriber):
+    events = []
+    while not subscriber.queue.empty():
+        events.append(subscriber.queue.get_nowait())
+    return events
+
+async def _subscribe(hub, last_event_id):
+    sub, missed = hub.subscribe(last_event_id)
+    hub.unsubscribe(sub)
+    return missed
+
+def test_fan_out_to_every_worker(workers):
+    (hub_a, hub_b), (broker_a, _) = workers
+
+    async def scenario():
+        sub_a, _ = hub_a.subscribe()
+        sub_b, _ = hub_b.subscribe()
+        broker_a.publish({"type": "closed", "trip_id": 7, "at": datetime(2026, 1, 2)})
+        await asyncio.sleep(0)
+        return _drain(sub_a), _drain(sub_b)
+
+    got_a, got_b = asyncio.run(scenario())
+    assert got_a == got_b
+    event, = got_a
+    # Went through JSON: same id on both workers, datetime serialized
+    assert event["type"] == "closed" and event["trip_id"] == 7
+    assert event["at"] == "2026-01-02 00:00:00"
+
+def test_ids_are_assigned_once_at_publish(workers):
+    (hub_a, hub_b), (broker_a, broker_b) = workers
+    broker_a.publish({"type": "closed", "trip_id": 1})
+    broker_b.publish({"type": "closed", "trip_id": 2})
+    ids_a = [e["id"] for e in hub_a.recent]
+    assert ids_a == [e["id"] for e in hub_b.recent]
+    assert len(set(ids_a)) == 2
+
+def test_overflow_sends_single_resync(workers, monkeypatch):
+    (hub_a, _), (broker_a, _) = workers
+    monkeypatch.setattr(live, "LIVE_QUEUE_SIZE", 3)
+
+    async def scenario():
+        sub, _ = hub_a.subscribe()
+        for trip_id in range(5):
+            broker_a.publish({"type": "closed", "trip_id": trip_id})
+        await asyncio.sleep(0)
+        return _drain(sub)
+
+    events = asyncio.run(scenario())
+    # Queue overflowed on the 4th event: dropped, replaced by a resync, then the 5th
+    assert [e["type"] for e in events] == ["resync", "closed"]
+    assert events[0]["id"] == hub_a.recent[3]["id"]
+    assert events[1]["trip_id"] == 4
+
+def test_replay_after_last_event_id(workers):
+    (hub_a, hub_b), (broker_a, _) = workers
+    for trip_id in range(3):
+        broker_a.publish({"type": "closed", "trip_id": trip_id})
+    first_id = hub_a.recent[0]["id"]
+
+    missed = asyncio.run(_subscribe(hub_a, first_id))
+    assert [e["trip_id"] for e in missed] == [1, 2]
+    # Reconnecting to the other worker replays the same range
+    assert asyncio.run(_subscribe(hub_b, first_id)) == missed
+    assert asyncio.run(_subscribe(hub_a, hub_a.recent[-1]["id"])) == []
+
+def test_unknown_last_event_id_resyncs(workers):
+    (hub_a, _), (broker_a, _) = workers
+    # Fresh hub (e.g. after a restart): nothing to replay, the client must refetch
+    missed = asyncio.run(_subscribe(live.Hub(), "500"))
+    assert missed == [{"id": None, "type": "resync"}]
+
+    broker_a.publish({"type": "closed", "trip_id": 1})
+    missed = asyncio.run(_subscribe(hub_a, "old-epoch-500"))
+    assert missed == [{"id": hub_a.recent[-1]["id"], "type": "resync"}]
+
+def test_replay_evicted_from_buffer_resyncs(workers):
+    (hub_a, _), (broker_a, _) = workers
+    for trip_id in range(12):
+        broker_a.publish({"type": "closed", "trip_id": trip_id})
+    evicted = f"{broker_a.channel.epoch}-1"
+    assert asyncio.run(_subscribe(hub_a, evicted))[0]["type"] == "resync"
+
+def test_malformed_message_is_ignored(workers):
+    (hub_a, _), (broker_a, _) = workers
+    broker_a.channel.send("not json")
+    assert len(hub_a.recent) == 0
+
+def test_publish_uses_installed_broker():
+    channel = live.MemoryChannel()
+    target = live.Hub()
+    previous = live.set_broker(live.Broker(channel, target=target))
+    try:
+        live.publish({"type": "closed", "trip_id": 3})
+    finally:
+        live.set_broker(previous)
+    assert [e["trip_id"] for e in target.recent] == [3]
+
+def test_stream_formats_replayed_events(workers):
+    (hub_a, _), (broker_a, _) = workers
+    broker_a.publish({"type": "closed", "trip_id": 1})
+    broker_a.publish({"type": "closed", "trip_id": 2})
+    first_id = hub_a.recent[0]["id"]
+
+    class Request:
+        async def is_disconnected(self):
+            return True
+
+    async def collect():
+        previous, live.hub = live.hub, hub_a
+        try:
+            return [chunk async for chunk in live.stream(Request(), first_id)]
+        finally:
+            live.hub = previous
+
+    chunks = asyncio.run(collect())
+    assert chunks[0] == "retry: 3000\n\n"
+    assert chunks[1].startswith(f"id: {hub_a.recent[1]['id']}\nevent: closed\ndata: ")
+    assert not hub_a.subscribers
@@ -0,0 +1,146 @@
+"""
+Set-based trip engine: create and close any number of trips in one transaction.
+
+All trips of a batch are loaded with one query, updates are matched through dicts keyed
+by id, and stock movements are summed per item and written with a single
+
+    UPDATE stock_items SET quantity = quantity + CASE id WHEN ... END WHERE id IN (...)
+
+instead of one SELECT / UPDATE per material line. Nothing here commits: the endpoint
+commits once, so a batch is all-or-nothing.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import case, update
+from sqlalchemy.orm import Session, selectinload
+
+import ledger
+import models
+import system_config
+
+class TripNotFound(LookupError):
+    pass
+
+class TripAlreadyClosed(ValueError):
+    pass
+
+def apply_stock_deltas(db: Session, deltas):
+    """ quantity += delta for every {stock_item_id: delta} in one UPDATE. Unknown ids are skipped. """
+    deltas = {item_id: delta for item_id, delta in deltas.items() if item_id is not None and delta}
+    if not deltas:
+        return
+    table = models.StockItem.__table__
+    db.execute(
+        update(table)
+        .where(table.c.id.in_(deltas))
+        .values(quantity=table.c.quantity + case(deltas, value=table.c.id, else_=0.0))
+    )
+
+def load_trips(db: Session, trip_ids):
+    """ {id: trip} with assignments, materials and vehicle, in four queries whatever the count. """
+    trips = (
+        db.query(models.WorkTrip)
+        .options(
+            selectinload(models.WorkTrip.vehicle),
+            selectinload(models.WorkTrip.assignments),
+            selectinload(models.WorkTrip.materials),
+        )
+        .filter(models.WorkTrip.id.in_(trip_ids))
+        .all()
+    )
+    return {trip.id: trip for trip in trips}
+
+def create_trips(db: Session, payloads):
+    """ Creates OPEN trips from WorkTripCreate payloads. Returns them in payload order. """
+    current_price = system_config.meter_price(db)
+    stock_deltas = defaultdict(float)
+    created = []
+    for trip in payloads:
+        db_trip = models.WorkTrip(
+            date=trip.date or datetime.now(),
+            description=trip.description,
+            status="OPEN",
+            vehicle_id=trip.vehicle_id,
+            destination_lat=trip.destination_lat,
+            destination_lng=trip.destination_lng,
+            assignments=[
+                models.TripEmployee(
+                    employee_id=emp.employee_id,
+                    is_present=emp.is_present,
+                    historical_price=current_price, # Snapshot Price
+                    meters_done=0.0,
+                    total_earned=0.0,
+                )
+                for emp in trip.employees
+            ],
+            materials=[
+                models.TripMaterial(
+                    stock_item_id=mat.stock_item_id,
+                    quantity_out=mat.quantity_out,
+                    quantity_returned=0.0,
+                    quantity_used=0.0,
+                )
+                for mat in trip.materials
+            ],
+        )
+        db.add(db_trip)
+        created.append(db_trip)
+        # Loaded material leaves main stock now; what comes back is added on close
+        for mat in trip.materials:
+            stock_deltas[mat.stock_item_id] -= mat.quantity_out
+
+    db.flush()
+    apply_stock_deltas(db, stock_deltas)
+    return created
+
+def close_trips(db: Session, closes):
+    """
+    Closes trips from (trip_id, TripCloseRequest) pairs: returned material goes back to
+    stock, earnings are priced at today's meter price and posted to the ledger. Raises
+    TripNotFound / TripAlreadyClosed before changing anything.
+    """
+    trips = load_trips(db, [trip_id for trip_id, _ in closes])
+    for trip_id, _ in closes:
+        if trip_id not in trips:
+            raise TripNotFound(f"Trip {trip_id} not found")
+        if trips[trip_id].status == "CLOSED":
+            raise TripAlreadyClosed(f"Trip {trip_id} already closed")
+    if len({trip_id for trip_id, _ in closes}) != len(closes):
+        raise TripAlreadyClosed("A trip appears more than once in the batch")
+
+    current_price = system_config.meter_price(db)
+    stock_deltas = defaultdict(float)
+    entries = []
+    for trip_id, close_data in closes:
+        trip = trips[trip_id]
+        # Updates only apply to lines of this trip; unknown ids are ignored
+        materials = {m.id: m for m in trip.materials}
+        assignments = {a.id: a for a in trip.assignments}
+
+        for mat_update in close_data.materials:
+            tm = materials.get(mat_update.id)
+            if tm:
+                tm.quantity_returned = mat_update.quantity_returned
+                tm.quantity_used = max(0, tm.quantity_out - tm.quantity_returned)
+                stock_deltas[tm.stock_item_id] += tm.quantity_returned
+
+        for emp_update in close_data.employees:
+            te = assignments.get(emp_update.id)
+            if te:
+                te.meters_done = emp_update.meters_done
+                te.historical_price = current_price
+                te.total_earned = te.meters_done * current_price
+
+        trip.status = "CLOSED"
+        # Earnings become payable: one ledger entry per assignment, same transaction
+        entries += [
+            ledger.entry(te.employee_id, ledger.TRIP_EARNED, earned=te.total_earned or 0.0, ref_id=te.id,
+                         description=trip.description)
+            for te in trip.assignments if te.employee_id is not None
+        ]
+
+    db.flush()
+    apply_stock_deltas(db, stock_deltas)
+    ledger.post(db, entries)
+    return [trips[trip_id] for trip_id, _ in closes]
@@ -31,6 +31,36 @@ const ActiveTrips = () => {
         loadData();
     }, []);
 
+    // Live deltas from other users (created / progress / closed) instead of refetching
+    useEffect(() => {
+        const source = new EventSource(`${API_URL}/trips/stream`);
+
+        // The event carries the whole trip (crew and materials), no refetch needed
+        source.addEventListener('created', (e) => {
+            const { trip } = JSON.parse(e.data);
+            setAllTrips(prev => [trip, ...prev.filter(t => t.id !== trip.id)]);
+        });
+
+        source.addEventListener('progress', (e) => {
+            const { trip_id, assignments } = JSON.parse(e.data);
+            const changed = Object.fromEntries(assignments.map(a => [a.id, a]));
+            setAllTrips(prev => prev.map(t => t.id !== trip_id ? t : {
+                ...t,
+                assignments: t.assignments.map(a => changed[a.id] ? { ...a, ...changed[a.id] } : a)
+            }));
+        });
+
+        source.addEventListener('closed', (e) => {
+            const { trip_id, status } = JSON.parse(e.data);
+            setAllTrips(prev => prev.map(t => t.id === trip_id ? { ...t, status } : t));
+        });
+
+        // Fell behind or reconnected past the replay buffer
+        source.addEventListener('resync', () => loadData());
+
+        return () => source.close();
+    }, []);
+
     const loadData = async () => {
         setLoading(true);
         try {
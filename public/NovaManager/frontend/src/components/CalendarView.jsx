@@ -14,7 +14,7 @@ const CalendarView = () => {
 
     const fetchEvents = async () => {
         try {
-            const res = await fetch(`${API_URL}/calendar/events`);
+            const res = await fetch(`${API_URL}/calendar/events?month=${currentDate.getMonth() + 1}&year=${currentDate.getFullYear()}`);
             if (res.ok) {
                 const data = await res.json();
                 setEvents(data);
@@ -28,9 +28,9 @@ const Dashboard = () => {
 
             const [statsRes, tripsRes, attRes, stockRes, empsRes] = await Promise.all([
                 fetch(`${API_URL}/dashboard-stats`),
-                fetch(`${API_URL}/trips`),
+                fetch(`${API_URL}/trips/summary`),
                 fetch(`${API_URL}/attendance/${today}`),
-                fetch(`${API_URL}/stock`),
+                fetch(`${API_URL}/stock/summary`),
                 fetch(`${API_URL}/employees`)
             ]);
 
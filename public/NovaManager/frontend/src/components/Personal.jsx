@@ -49,7 +49,7 @@ const Personal = () => {
     };
 
     const fetchStock = () => {
-        fetch(`${API_URL}/stock`)
+        fetch(`${API_URL}/stock/summary`)
             .then(res => res.json())
             .then(data => setStock(data.filter(i => i.quantity > 0)))
             .catch(err => console.error("Error stock:", err));
@@ -83,7 +83,31 @@ const Reportes = () => {
     const downloadPDF = async () => {
         const month = date.getMonth() + 1;
         const year = date.getFullYear();
-        window.open(`${API_URL}/reports/monthly?month=${month}&year=${year}`, '_blank');
+        try {
+            // The PDF renders in the background: submit the job and poll it until it's done
+            const res = await fetch(`${API_URL}/reports/jobs`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ report_type: 'monthly', year, month })
+            });
+            if (!res.ok) throw new Error(`HTTP ${res.status}`);
+            let job = await res.json();
+            while (job.status === 'queued' || job.status === 'running') {
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                const jobRes = await fetch(`${API_URL}/reports/jobs/${job.id}`);
+                if (!jobRes.ok) throw new Error(`HTTP ${jobRes.status}`);
+                job = await jobRes.json();
+            }
+            if (job.status !== 'done') {
+                showAlert("Error al generar el reporte", "error");
+                return;
+            }
+            // Served as an attachment, so the page stays where it is
+            window.location.href = `${API_URL}/reports/jobs/${job.id}/download`;
+        } catch (err) {
+            console.error(err);
+            showAlert("Error de conexión", "error");
+        }
     };
 
     const changeMonth = (delta) => {
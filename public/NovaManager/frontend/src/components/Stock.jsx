@@ -28,7 +28,7 @@ const Stock = () => {
 
     const fetchStock = () => {
         setLoading(true);
-        fetch(`${API_URL}/stock`)
+        fetch(`${API_URL}/stock/summary`)
             .then(res => res.json())
             .then(data => {
                 setItems(Array.isArray(data) ? data : []);
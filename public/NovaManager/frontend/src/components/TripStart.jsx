@@ -51,7 +51,7 @@ const TripStart = ({ onSuccess }) => {
             setEmployees(mergedEmps);
 
             // 2. Get Stock (Available only)
-            const stockRes = await fetch(`${API_URL}/stock`);
+            const stockRes = await fetch(`${API_URL}/stock/summary`);
             const stockData = await stockRes.json();
             // Filter only AVAILABLE items
             setStockItems(stockData.filter(s => s.status === 'AVAILABLE' && s.quantity > 0));